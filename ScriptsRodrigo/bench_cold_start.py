@@ -0,0 +1,144 @@
+# bench_cold_start.py
+# Mede o cold start do servidor (cada amostra num processo novo):
+#   - boot do worker: import de webapp.asgi (django.setup + apps)
+#   - 1ª requisição: GET / pelo ASGI (carrega URLconf → simulador_web.views)
+# e o perfil de imports (-X importtime) do boot + 1ª requisição, comparado
+# com o baseline salvo em importtime_baseline.json.
+#
+# Uso:
+#   python ScriptsRodrigo/bench_cold_start.py [amostras]
+#   python ScriptsRodrigo/bench_cold_start.py --salvar-baseline
+#
+# DJANGO_SETTINGS_MODULE do ambiente (padrão webapp.settings); não chama a
+# OPLAB nem toca o banco (a landing é só template).
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "importtime_baseline.json")
+
+# roda no processo filho; imprime "boot_ms req_ms status"
+FILHO = r"""
+import asyncio, os, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "webapp.settings")
+t0 = time.perf_counter()
+from webapp.asgi import application
+t1 = time.perf_counter()
+
+async def _get():
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "https", "path": "/", "raw_path": b"/",
+        "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 1), "server": ("localhost", 443),
+    }
+    status, corpo = [], [{"type": "http.request", "body": b"", "more_body": False}]
+    async def receive():
+        if corpo:
+            return corpo.pop()
+        await asyncio.Event().wait()  # conexão aberta até o fim da resposta
+    async def send(msg):
+        if msg["type"] == "http.response.start":
+            status.append(msg["status"])
+    await application(scope, receive, send)
+    return status[0] if status else 0
+
+st = asyncio.run(_get())
+t2 = time.perf_counter()
+print(f"{(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f} {st}")
+"""
+
+
+def _rodar(importtime: bool = False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", FILHO]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ, os.environ.get("PYTHONPATH")])))
+    p = subprocess.run(cmd, cwd=RAIZ, env=env, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr[-2000:])
+    return p
+
+
+PROJETO = ("webapp", "simulador_web", "simulacoes", "services", "core", "viz", "payments", "ui_flet")
+PESADOS = ("matplotlib", "numpy", "scipy", "pandas", "pytz", "requests", "flet")
+
+
+def _perfil_imports():
+    """
+    Tempo cumulativo (ms) por módulo, a partir do -X importtime.
+    Retorna (total dos imports de primeiro nível, {módulo: ms}).
+    """
+    p = _rodar(importtime=True)
+    total_us, por_modulo = 0, {}
+    for linha in p.stderr.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, cum_us, nome = linha[len("import time:"):].split("|")
+        if not nome.startswith("  "):
+            total_us += int(cum_us)  # primeiro nível (sem indentação extra)
+        por_modulo.setdefault(nome.strip(), round(int(cum_us) / 1000.0, 1))
+    return round(total_us / 1000.0, 1), por_modulo
+
+
+def main():
+    salvar = "--salvar-baseline" in sys.argv
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n = int(args[0]) if args else 7
+
+    _rodar()  # aquece o cache de bytecode (.pyc)
+    boots, reqs, status = [], [], None
+    for _ in range(n):
+        b, r, status = _rodar().stdout.split()
+        boots.append(float(b))
+        reqs.append(float(r))
+
+    total, perfil = _perfil_imports()
+    nossos = {m: ms for m, ms in perfil.items() if m.split(".")[0] in PROJETO or m in PESADOS}
+    resultado = {
+        "amostras": n,
+        "python": sys.version.split()[0],
+        "settings": os.environ.get("DJANGO_SETTINGS_MODULE", "webapp.settings"),
+        "boot_ms": round(statistics.median(boots), 1),
+        "primeira_req_ms": round(statistics.median(reqs), 1),
+        "status_primeira_req": int(status),
+        "imports_total_ms": total,
+        "imports_top": dict(sorted(nossos.items(), key=lambda kv: -kv[1])[:20]),
+        "pesados": {m: (m in perfil) for m in PESADOS},
+    }
+
+    base = None
+    if os.path.exists(BASELINE):
+        with open(BASELINE, encoding="utf-8") as f:
+            base = json.load(f)
+
+    def _delta(chave):
+        if not base or chave not in base:
+            return ""
+        return f"  (baseline {base[chave]:.1f} ms, {resultado[chave] - base[chave]:+.1f})"
+
+    print(f"Amostras: {n} (mediana)")
+    print(f"Boot do worker      : {resultado['boot_ms']:8.1f} ms{_delta('boot_ms')}")
+    print(f"1ª requisição (GET /): {resultado['primeira_req_ms']:7.1f} ms{_delta('primeira_req_ms')}  HTTP {status}")
+    print(f"Imports (total)     : {resultado['imports_total_ms']:8.1f} ms{_delta('imports_total_ms')}")
+    print("\nMódulos pesados carregados:", ", ".join(m for m, v in resultado["pesados"].items() if v) or "nenhum")
+    print("\nTop imports do projeto + pesados (cumulativo, ms):")
+    for m, ms in resultado["imports_top"].items():
+        antes = (base or {}).get("imports_top", {}).get(m)
+        extra = f"  (baseline {antes:.1f})" if antes is not None else ""
+        print(f"  {m:<45} {ms:8.1f}{extra}")
+
+    if salvar:
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ Baseline salvo em: {BASELINE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# bench_monte_carlo.py
+# Mede caminhos/segundo por núcleo do simulacoes.monte_carlo
+# (GBM terminal, GBM dia a dia e bootstrap), sem API e sem banco.
+#
+# Uso: python ScriptsRodrigo/bench_monte_carlo.py [n_caminhos] [chunk]
+
+import os
+import sys
+
+# 1 thread por processo: o número medido é "por núcleo"
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from simulacoes.base import OptionLeg
+from simulacoes.monte_carlo import simular_mc
+
+
+def _pernas(dias: int):
+    return [
+        OptionLeg("CALL", "CALL", 30.0, bid=1.10, ask=1.30, spot_price=30.0, days_to_maturity=dias),
+        OptionLeg("PUT", "PUT", 30.0, bid=0.90, ask=1.10, spot_price=30.0, days_to_maturity=dias),
+    ]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    chunk = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    retornos = np.random.default_rng(0).normal(0.0, 0.02, 504)
+
+    casos = [
+        ("GBM terminal", dict(modelo="gbm", trajetoria=False)),
+        ("GBM dia a dia", dict(modelo="gbm", trajetoria=True)),
+        ("Bootstrap dia a dia", dict(modelo="bootstrap", retornos=retornos, trajetoria=True)),
+    ]
+
+    print(f"Caminhos: {n:,} | chunk: {chunk:,}\n")
+    for dias in (5, 21):
+        for nome, kw in casos:
+            res = simular_mc(_pernas(dias), n_caminhos=n, chunk=chunk, seed=42, **kw)
+            print(
+                f"{nome:<20} | {dias:>2} pregões | {res.segundos:7.3f}s | "
+                f"{res.caminhos_por_segundo:>12,.0f} caminhos/s/núcleo | "
+                f"PoP={res.prob_lucro:.3f} E[P&L]={res.pnl_esperado:8.2f}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
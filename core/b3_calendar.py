@@ -0,0 +1,180 @@
+# core/b3_calendar.py
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+TZ_B3 = ZoneInfo("America/Sao_Paulo")
+_TZ_NY = ZoneInfo("America/New_York")
+
+# Horários da sessão (Brasília). O fechamento acompanha o horário de verão
+# americano: 18:00 com DST nos EUA, 17:00 sem; o call de fechamento ocupa
+# os 5 minutos finais.
+PRE_ABERTURA = time(9, 45)
+ABERTURA = time(10, 0)
+FECHAMENTO_DST_EUA = time(18, 0)
+FECHAMENTO_PADRAO = time(17, 0)
+MINUTOS_CALL_FECHAMENTO = 5
+
+FASE_FECHADO = "fechado"
+FASE_PRE_ABERTURA = "pre_abertura"
+FASE_PREGAO = "pregao"
+FASE_CALL_FECHAMENTO = "call_fechamento"
+
+
+# ------------------------------------------------------------
+# Feriados B3
+# ------------------------------------------------------------
+def _pascoa(ano: int) -> date:
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)."""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = (h + l - 7 * m + 114) % 31 + 1
+    return date(ano, mes, dia)
+
+
+@lru_cache(maxsize=64)
+def feriados_b3(ano: int) -> frozenset:
+    """
+    Dias sem pregão na B3 (além de sábados e domingos).
+
+    - Feriados nacionais fixos e móveis (Carnaval, Sexta-feira Santa, Corpus Christi)
+    - 24/12 e 31/12 (sem pregão)
+    - Até 2021: feriados municipais de SP (25/01, 09/07, 20/11)
+    - A partir de 2024: 20/11 é feriado nacional
+    """
+    p = _pascoa(ano)
+    dias = {
+        date(ano, 1, 1),
+        p - timedelta(days=48),  # Carnaval (segunda)
+        p - timedelta(days=47),  # Carnaval (terça)
+        p - timedelta(days=2),   # Sexta-feira Santa
+        date(ano, 4, 21),
+        date(ano, 5, 1),
+        p + timedelta(days=60),  # Corpus Christi
+        date(ano, 9, 7),
+        date(ano, 10, 12),
+        date(ano, 11, 2),
+        date(ano, 11, 15),
+        date(ano, 12, 24),
+        date(ano, 12, 25),
+        date(ano, 12, 31),
+    }
+    if ano <= 2021:
+        dias |= {date(ano, 1, 25), date(ano, 7, 9), date(ano, 11, 20)}
+    if ano >= 2024:
+        dias.add(date(ano, 11, 20))
+    return frozenset(dias)
+
+
+# ------------------------------------------------------------
+# Pregões
+# ------------------------------------------------------------
+def eh_pregao(d: date) -> bool:
+    return d.weekday() < 5 and d not in feriados_b3(d.year)
+
+
+def pregoes_entre(ini: date, fim: date) -> list[date]:
+    """Pregões em [ini, fim], inclusivo."""
+    out = []
+    d = ini
+    while d <= fim:
+        if eh_pregao(d):
+            out.append(d)
+        d += timedelta(days=1)
+    return out
+
+
+def proximo_pregao(d: date) -> date:
+    """Primeiro pregão estritamente depois de d."""
+    d += timedelta(days=1)
+    while not eh_pregao(d):
+        d += timedelta(days=1)
+    return d
+
+
+def pregao_anterior(d: date) -> date:
+    """Último pregão estritamente antes de d."""
+    d -= timedelta(days=1)
+    while not eh_pregao(d):
+        d -= timedelta(days=1)
+    return d
+
+
+# ------------------------------------------------------------
+# Sessão (horário)
+# ------------------------------------------------------------
+@dataclass(frozen=True)
+class SessaoB3:
+    pre_abertura: datetime
+    abertura: datetime
+    call_fechamento: datetime
+    fechamento: datetime
+
+
+def agora_b3() -> datetime:
+    return datetime.now(TZ_B3)
+
+
+def horario_fechamento(d: date) -> time:
+    meio_dia_ny = datetime.combine(d, time(12, 0), tzinfo=_TZ_NY)
+    return FECHAMENTO_DST_EUA if meio_dia_ny.dst() else FECHAMENTO_PADRAO
+
+
+@lru_cache(maxsize=32)
+def sessao_b3(d: date) -> SessaoB3 | None:
+    """Horários da sessão de `d` (aware, TZ_B3); None se não houver pregão."""
+    if not eh_pregao(d):
+        return None
+    em = lambda h: datetime.combine(d, h, tzinfo=TZ_B3)
+    fechamento = em(horario_fechamento(d))
+    return SessaoB3(
+        pre_abertura=em(PRE_ABERTURA),
+        abertura=em(ABERTURA),
+        call_fechamento=fechamento - timedelta(minutes=MINUTOS_CALL_FECHAMENTO),
+        fechamento=fechamento,
+    )
+
+
+def fase_sessao(agora: datetime | None = None) -> str:
+    """FASE_PRE_ABERTURA, FASE_PREGAO, FASE_CALL_FECHAMENTO ou FASE_FECHADO."""
+    agora = (agora or agora_b3()).astimezone(TZ_B3)
+    s = sessao_b3(agora.date())
+    if s is None or agora < s.pre_abertura or agora >= s.fechamento:
+        return FASE_FECHADO
+    if agora < s.abertura:
+        return FASE_PRE_ABERTURA
+    if agora < s.call_fechamento:
+        return FASE_PREGAO
+    return FASE_CALL_FECHAMENTO
+
+
+def em_pregao(agora: datetime | None = None) -> bool:
+    """True da abertura ao fechamento (inclui o call de fechamento)."""
+    return fase_sessao(agora) in (FASE_PREGAO, FASE_CALL_FECHAMENTO)
+
+
+def proxima_pre_abertura(agora: datetime | None = None) -> datetime:
+    """Próxima PRE_ABERTURA estritamente depois de `agora` (aware, TZ_B3)."""
+    agora = (agora or agora_b3()).astimezone(TZ_B3)
+    s = sessao_b3(agora.date())
+    if s is not None and agora < s.pre_abertura:
+        return s.pre_abertura
+    return sessao_b3(proximo_pregao(agora.date())).pre_abertura
+
+
+def proxima_abertura(agora: datetime | None = None) -> datetime:
+    """Próxima ABERTURA estritamente depois de `agora` (aware, TZ_B3)."""
+    agora = (agora or agora_b3()).astimezone(TZ_B3)
+    s = sessao_b3(agora.date())
+    if s is not None and agora < s.abertura:
+        return s.abertura
+    return sessao_b3(proximo_pregao(agora.date())).abertura
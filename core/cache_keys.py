@@ -13,11 +13,20 @@ def ls_cache_key(ativo, horizonte, num_vencimentos, plan):
     return f"ls:{plan}:{ativo}:{horizonte}:{num_vencimentos}"
 
 
-def screener_cache_key(ticker, v1, v2, horizonte, crush_iv):
+def screener_cache_key(ticker, dia, horizonte):
     """
     Gera chave unificada para o screener ATM de 2 vencimentos.
+    Sem spot nem vencimentos: a entrada é carimbada com a versão dos dados
+    (ver screener_atm_dois_vencimentos) e revalidada por ela.
     """
     ticker = (ticker or "").upper().strip()
     horizonte = (horizonte or "VENC").upper().strip()
-    crush_iv = float(crush_iv or 0.0)
-    return f"screener:{ticker}:{v1}:{v2}:{horizonte}:{crush_iv}"
+    return f"screener:{ticker}:{dia}:{horizonte}"
+
+
+def iv_decisao_cache_key(ticker):
+    """
+    Chave da decisão LS por IV (IV atual de mercado × percentis históricos).
+    """
+    ticker = (ticker or "").upper().strip()
+    return f"iv_decisao:{ticker}"
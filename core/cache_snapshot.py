@@ -0,0 +1,396 @@
+# core/cache_snapshot.py
+"""
+Snapshot do cache quente em disco, para sobreviver a restart/deploy.
+
+LocMemCache, `ls_cache` (domain.ls_linhas) e o cache de respostas da OPLAB
+(services.api) vivem na memória do processo: cada deploy do Render ou
+reciclagem de worker zera tudo e o primeiro usuário de cada ativo paga o
+caminho frio ao mesmo tempo. Aqui o processo grava as entradas quentes num
+arquivo (JSON + zlib) periodicamente e no encerramento; o worker novo
+carrega no boot.
+
+Formato: JSON com marcação de tipo só para o que as entradas usam (date,
+datetime, Decimal, tuple, arrays numpy numéricos e as dataclasses
+registradas com `registrar_tipo`). Ler o arquivo nunca executa código
+(diferente de pickle); entradas com outros tipos ficam fora do snapshot.
+
+Fontes:
+- "cache": chaves do cache do Django gravadas via `cache_set` (screener
+  versionado, decisão de IV)
+- dicts registrados com `registrar_dict` (ex.: "ls" = `ls_linhas.ls_cache`,
+  "oplab" = respostas da cadeia/spot)
+
+No boot, entradas vencidas (prazo do TTL/retenção) são descartadas; as que
+passaram do frescor mas estão na retenção voltam e são revalidadas pela
+versão dos dados no 1º uso (core.cache_ttl / screener). Locks (core.lock)
+não entram: não fazem sentido em outro processo.
+
+Config (env):
+- CACHE_SNAPSHOT=1 liga (ver SimuladorWebConfig)
+- CACHE_SNAPSHOT_PATH: arquivo, obrigatório (sem padrão no tempdir
+  compartilhado). A pasta precisa ser do usuário do processo e fechada
+  (0700); é criada assim se não existir. Para sobreviver a deploy no
+  Render precisa estar num disco persistente
+- CACHE_SNAPSHOT_INTERVALO: segundos entre gravações (padrão 300)
+"""
+import atexit
+import dataclasses
+import importlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional
+
+FORMATO = 2
+CAMINHO = os.getenv("CACHE_SNAPSHOT_PATH") or None
+INTERVALO = int(os.getenv("CACHE_SNAPSHOT_INTERVALO", "300"))
+MAX_CHAVES_CACHE = 2048
+
+# chave do cache do Django -> epoch de expiração
+_chaves: Dict[str, float] = {}
+_chaves_lock = threading.Lock()
+
+# nome -> (dict vivo, função que devolve o epoch de expiração de um valor)
+_dicts: Dict[str, tuple] = {}
+# entradas lidas do disco para dicts ainda não registrados (import tardio)
+_pendentes: Dict[str, Dict[str, tuple]] = {}
+# dataclasses aceitas no snapshot ("modulo.Classe"); importadas só ao ler
+_tipos: set = set()
+
+_parar = threading.Event()
+_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
+
+
+def _log(msg: str):
+    print(f"[SNAPSHOT] {msg}", flush=True)
+
+
+# ------------------------------------------------------------
+# Registro das fontes
+# ------------------------------------------------------------
+def cache_set(chave: str, valor: Any, timeout: int):
+    """cache.set do Django + registro da chave para o snapshot."""
+    from django.core.cache import cache
+
+    cache.set(chave, valor, timeout=timeout)
+    agora = time.time()
+    with _chaves_lock:
+        _chaves[chave] = agora + timeout
+        if len(_chaves) > MAX_CHAVES_CACHE:
+            for k in [k for k, exp in _chaves.items() if exp <= agora]:
+                del _chaves[k]
+            while len(_chaves) > MAX_CHAVES_CACHE:
+                _chaves.pop(next(iter(_chaves)))
+
+
+def registrar_dict(nome: str, dados: dict, expira: Callable[[Any], float]):
+    """
+    Inclui um dict em memória no snapshot. `expira(valor)` devolve o epoch
+    de expiração de cada entrada. Se o boot já carregou entradas desse
+    nome, elas entram no dict agora.
+    """
+    _dicts[nome] = (dados, expira)
+    pendentes = _pendentes.pop(nome, None)
+    if pendentes:
+        agora = time.time()
+        for k, (exp, v) in pendentes.items():
+            if exp > agora:
+                dados.setdefault(k, v)
+
+
+def registrar_tipo(nome: str):
+    """Aceita a dataclass `nome` ("modulo.Classe") nas entradas do snapshot."""
+    _tipos.add(nome)
+
+
+# ------------------------------------------------------------
+# Codificação (JSON com tipos marcados)
+# ------------------------------------------------------------
+_T = "__t"
+
+
+def _codificar(v):
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, dict):
+        if all(isinstance(k, str) for k in v) and _T not in v:
+            return {k: _codificar(x) for k, x in v.items()}
+        return {_T: "dict", "v": [[_codificar(k), _codificar(x)] for k, x in v.items()]}
+    if isinstance(v, list):
+        return [_codificar(x) for x in v]
+    if isinstance(v, tuple):
+        return {_T: "tuple", "v": [_codificar(x) for x in v]}
+    if isinstance(v, datetime):
+        return {_T: "datetime", "v": v.isoformat()}
+    if isinstance(v, date):
+        return {_T: "date", "v": v.isoformat()}
+    if isinstance(v, Decimal):
+        return {_T: "decimal", "v": str(v)}
+
+    tipo = type(v)
+    if tipo.__module__ == "numpy":
+        import numpy as np
+
+        if isinstance(v, np.generic):
+            return _codificar(v.item())
+        if isinstance(v, np.ndarray) and v.dtype.kind in "biuf":
+            return {_T: "nd", "dtype": v.dtype.str, "shape": list(v.shape), "v": v.ravel().tolist()}
+
+    nome = f"{tipo.__module__}.{tipo.__qualname__}"
+    if dataclasses.is_dataclass(v) and nome in _tipos:
+        campos = {f.name: _codificar(getattr(v, f.name)) for f in dataclasses.fields(v)}
+        return {_T: "dc", "tipo": nome, "v": campos}
+
+    raise TypeError(f"tipo fora do snapshot: {nome}")
+
+
+def _decodificar(v):
+    if isinstance(v, list):
+        return [_decodificar(x) for x in v]
+    if not isinstance(v, dict):
+        return v
+    t = v.get(_T)
+    if t is None:
+        return {k: _decodificar(x) for k, x in v.items()}
+    if t == "dict":
+        return {_decodificar(k): _decodificar(x) for k, x in v["v"]}
+    if t == "tuple":
+        return tuple(_decodificar(x) for x in v["v"])
+    if t == "datetime":
+        return datetime.fromisoformat(v["v"])
+    if t == "date":
+        return date.fromisoformat(v["v"])
+    if t == "decimal":
+        return Decimal(v["v"])
+    if t == "nd":
+        import numpy as np
+
+        dtype = np.dtype(v["dtype"])
+        if dtype.kind not in "biuf":
+            raise ValueError(f"dtype fora do snapshot: {dtype}")
+        return np.array(v["v"], dtype=dtype).reshape(v["shape"])
+    if t == "dc" and v["tipo"] in _tipos:
+        modulo, classe = v["tipo"].rsplit(".", 1)
+        cls = getattr(importlib.import_module(modulo), classe)
+        return cls(**{k: _decodificar(x) for k, x in v["v"].items()})
+    raise ValueError(f"tipo desconhecido no snapshot: {t!r}")
+
+
+def _codificar_fontes(fontes: Dict[str, Dict[str, tuple]]) -> tuple:
+    """{nome: {chave: [exp, valor codificado]}} + nº de entradas descartadas."""
+    saida, fora = {}, 0
+    for nome, itens in fontes.items():
+        cod = {}
+        for k, (exp, v) in itens.items():
+            try:
+                cod[k] = [exp, _codificar(v)]
+            except TypeError:
+                fora += 1
+        saida[nome] = cod
+    return saida, fora
+
+
+# ------------------------------------------------------------
+# Coleta / aplicação
+# ------------------------------------------------------------
+def _coletar() -> Dict[str, Dict[str, tuple]]:
+    from django.core.cache import cache
+
+    agora = time.time()
+    fontes: Dict[str, Dict[str, tuple]] = {}
+
+    with _chaves_lock:
+        vivas = {k: exp for k, exp in _chaves.items() if exp > agora}
+    valores = cache.get_many(list(vivas))
+    fontes["cache"] = {k: (vivas[k], v) for k, v in valores.items()}
+
+    for nome, (dados, expira) in list(_dicts.items()):
+        itens = {}
+        for k, v in list(dados.items()):
+            try:
+                exp = float(expira(v))
+            except Exception:
+                continue
+            if exp > agora:
+                itens[k] = (exp, v)
+        fontes[nome] = itens
+
+    return fontes
+
+
+def _aplicar(fontes: Dict[str, Dict[str, tuple]]) -> Dict[str, int]:
+    from django.core.cache import cache
+
+    agora = time.time()
+    contagem = {}
+    for nome, itens in fontes.items():
+        vivos = {k: (exp, v) for k, (exp, v) in itens.items() if exp > agora}
+        contagem[nome] = len(vivos)
+        if nome == "cache":
+            for k, (exp, v) in vivos.items():
+                if cache.add(k, v, timeout=int(exp - agora)):
+                    with _chaves_lock:
+                        _chaves[k] = exp
+        elif nome in _dicts:
+            dados, _ = _dicts[nome]
+            for k, (_, v) in vivos.items():
+                dados.setdefault(k, v)
+        else:
+            _pendentes[nome] = vivos
+    return contagem
+
+
+# ------------------------------------------------------------
+# Disco
+# ------------------------------------------------------------
+def _caminho(caminho: Optional[str]) -> str:
+    caminho = caminho or CAMINHO
+    if not caminho:
+        raise ValueError("CACHE_SNAPSHOT_PATH não definido")
+    return os.path.abspath(caminho)
+
+
+def _pasta_privada(caminho: str) -> str:
+    """
+    Pasta do snapshot: criada 0700 se não existir; se existir, precisa ser
+    do usuário do processo e sem acesso de grupo/outros.
+    """
+    pasta = os.path.dirname(caminho)
+    os.makedirs(pasta, mode=0o700, exist_ok=True)
+    st = os.stat(pasta)
+    if hasattr(os, "getuid"):
+        if st.st_uid != os.getuid():
+            raise PermissionError(f"{pasta} não pertence ao usuário do processo")
+        if stat.S_IMODE(st.st_mode) & 0o077:
+            raise PermissionError(f"{pasta} precisa ser 0700 (está {stat.S_IMODE(st.st_mode):o})")
+    return pasta
+
+
+def _ler(caminho: str) -> Dict[str, Dict[str, tuple]]:
+    """Entradas do arquivo, já decodificadas ({nome: {chave: (exp, valor)}})."""
+    _pasta_privada(caminho)
+    try:
+        with open(caminho, "rb") as f:
+            if hasattr(os, "getuid") and os.fstat(f.fileno()).st_uid != os.getuid():
+                raise PermissionError("arquivo não pertence ao usuário do processo")
+            doc = json.loads(zlib.decompress(f.read()))
+        if not isinstance(doc, dict) or doc.get("formato") != FORMATO:
+            return {}
+        return {
+            nome: {k: (float(exp), _decodificar(v)) for k, (exp, v) in itens.items()}
+            for nome, itens in (doc.get("fontes") or {}).items()
+        }
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        _log(f"⚠ snapshot ilegível, ignorado: {e}")
+        return {}
+
+
+def salvar(caminho: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Grava o snapshot (atômico: arquivo temporário + rename). Junta com o
+    que outros workers já gravaram, ficando com a entrada que expira depois.
+    """
+    caminho = _caminho(caminho)
+    t0 = time.perf_counter()
+    fontes = _coletar()
+
+    agora = time.time()
+    for nome, itens in _ler(caminho).items():
+        atuais = fontes.setdefault(nome, {})
+        for k, (exp, v) in itens.items():
+            if exp > agora and (k not in atuais or atuais[k][0] < exp):
+                atuais[k] = (exp, v)
+
+    codificadas, fora = _codificar_fontes(fontes)
+    doc = {"formato": FORMATO, "salvo_em": agora, "pid": os.getpid(), "fontes": codificadas}
+    blob = zlib.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"), 6)
+
+    pasta = _pasta_privada(caminho)
+    fd, tmp = tempfile.mkstemp(prefix=".snapshot-", dir=pasta)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, caminho)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+    resumo = {
+        "entradas": {nome: len(itens) for nome, itens in codificadas.items()},
+        "fora": fora,
+        "bytes": len(blob),
+        "segundos": round(time.perf_counter() - t0, 3),
+    }
+    _log(f"salvo em {caminho}: {resumo}")
+    return resumo
+
+
+def carregar(caminho: Optional[str] = None) -> Dict[str, int]:
+    """Lê o snapshot e repõe as entradas ainda válidas. Devolve a contagem por fonte."""
+    caminho = _caminho(caminho)
+    t0 = time.perf_counter()
+    contagem = _aplicar(_ler(caminho))
+    if contagem:
+        _log(f"carregado de {caminho}: {contagem} | {time.perf_counter() - t0:.3f}s")
+    return contagem
+
+
+# ------------------------------------------------------------
+# Ciclo de vida
+# ------------------------------------------------------------
+def _salvar_seguro():
+    try:
+        salvar()
+    except Exception as e:
+        _log(f"❌ falha ao salvar: {e}")
+
+
+def _loop(intervalo: int):
+    while not _parar.wait(intervalo):
+        _salvar_seguro()
+
+
+def iniciar(intervalo: int = INTERVALO) -> bool:
+    """
+    Carrega o snapshot, agenda gravações periódicas numa thread daemon e
+    uma última no encerramento do processo. False se já estava ativo ou
+    se o caminho não está configurado / a pasta não é privada.
+    """
+    global _thread
+    try:
+        _pasta_privada(_caminho(None))
+    except Exception as e:
+        _log(f"❌ snapshot desligado: {e}")
+        return False
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return False
+        try:
+            carregar()
+        except Exception as e:
+            _log(f"❌ falha ao carregar: {e}")
+        _parar.clear()
+        _thread = threading.Thread(target=_loop, args=(intervalo,), name="cache-snapshot", daemon=True)
+        _thread.start()
+    atexit.register(parar)
+    return True
+
+
+def parar():
+    """Para o ciclo e grava uma última vez."""
+    if _parar.is_set():
+        return
+    _parar.set()
+    _salvar_seguro()
@@ -0,0 +1,71 @@
+# core/cache_ttl.py
+"""
+Política de TTL dos caches conforme a sessão da B3 (core.b3_calendar).
+
+- pregão: TTL curto (dados mudam a todo instante)
+- leilões (pré-abertura e call de fechamento): mais curto ainda — o preço
+  teórico muda até o fechamento do leilão
+- fechado (noite, fim de semana, feriado): válido até a próxima
+  pré-abertura; nada muda até lá
+
+Categorias: "screener", "ls", "iv_decisao", "oplab". Todos os caches do
+projeto pedem o TTL aqui em vez de usar um número fixo.
+
+Entradas versionadas (carimbadas com a versão dos dados, ver
+services.api.versao_cadeia) ficam guardadas por `retencao()`: depois do TTL
+deixam de ser frescas, mas ainda podem ser revalidadas sem recalcular.
+"""
+from datetime import datetime
+from typing import Optional
+
+from core.b3_calendar import (
+    FASE_CALL_FECHAMENTO,
+    FASE_FECHADO,
+    FASE_PRE_ABERTURA,
+    TZ_B3,
+    agora_b3,
+    fase_sessao,
+    proxima_pre_abertura,
+)
+
+# segundos por categoria em cada fase aberta
+TTL_PREGAO = {
+    "screener": 120,
+    "ls": 120,
+    "iv_decisao": 300,
+    "oplab": 30,
+}
+TTL_LEILAO = {
+    "screener": 30,
+    "ls": 30,
+    "iv_decisao": 60,
+    "oplab": 15,
+}
+
+TTL_MIN_FECHADO = 60  # margem para não expirar "agora" perto da pré-abertura
+RETENCAO_VERSIONADA = 6 * 3600
+
+
+def ttl(categoria: str, agora: Optional[datetime] = None) -> int:
+    """TTL em segundos para `categoria` no instante `agora` (padrão: agora)."""
+    if categoria not in TTL_PREGAO:
+        raise ValueError(f"Categoria de cache inválida: {categoria!r}")
+
+    agora = agora or agora_b3()
+    fase = fase_sessao(agora)
+    if fase == FASE_FECHADO:
+        ate = (proxima_pre_abertura(agora) - agora).total_seconds()
+        return max(TTL_MIN_FECHADO, int(ate))
+    if fase in (FASE_PRE_ABERTURA, FASE_CALL_FECHAMENTO):
+        return TTL_LEILAO[categoria]
+    return TTL_PREGAO[categoria]
+
+
+def retencao(categoria: str, agora: Optional[datetime] = None) -> int:
+    """Por quanto tempo guardar uma entrada versionada (revalidável)."""
+    return max(ttl(categoria, agora), RETENCAO_VERSIONADA)
+
+
+def expira_em(categoria: str, agora_ts: float) -> float:
+    """Epoch de expiração para um valor gravado em `agora_ts` (time.time())."""
+    return agora_ts + ttl(categoria, datetime.fromtimestamp(agora_ts, tz=TZ_B3))
@@ -0,0 +1,306 @@
+# core/cache_warmer.py
+"""
+Aquecimento do cache do screener e da base da tela LS para os ativos de
+todos os planos.
+
+Sem isso, o primeiro usuário depois de cada TTL paga o fan-out inteiro da
+OPLAB. O warmer roda o screener de cada ativo do PlanAssetList e monta a
+base do LS (`ls_cache` de simulador_web.domain.ls_linhas: por ativo e a lista de cada plano, no
+horizonte Vencimento) num ciclo alinhado à sessão da B3 (core.b3_calendar
+/ core.cache_ttl):
+
+- sessão aberta (pré-abertura, pregão, call): uma rodada a cada 80% do TTL
+  vigente do screener (± 10%), para a entrada nunca expirar;
+  CACHE_WARMER_INTERVALO / CACHE_WARMER_JITTER fixam valores em segundos
+- uma rodada logo depois do fechamento (fica válida até a pré-abertura)
+- fora da sessão: dorme até a próxima pré-abertura
+
+Cada rodada limita as chamadas simultâneas (CONCORRENCIA) e espaça o início
+de cada ativo (JITTER_ATIVO) para não disparar tudo no mesmo segundo.
+
+Um warmer por host: cada worker com CACHE_WARMER=1 sobe a thread, mas só
+quem pega o flock de LOCK_PATH roda as rodadas (os outros tentam de novo a
+cada ciclo; se o eleito morrer, o lock é liberado). Assim as chamadas à
+OPLAB não se multiplicam pelo nº de workers.
+
+Limites (LocMemCache é por processo):
+- só a memória do worker eleito fica quente; os outros aproveitam as
+  cadeias compartilhadas (CHAIN_SHARED=1, services.chain_shared) e o
+  snapshot em disco (CACHE_SNAPSHOT=1) e calculam o resto no 1º acesso.
+  Para todos os workers quentes, use um backend de cache compartilhado
+- horizonte D+1 não é aquecido (busca detalhes por opção na OPLAB)
+
+Dois modos:
+- thread no próprio processo web (CACHE_WARMER=1, ver SimuladorWebConfig)
+- `manage.py warm_cache` (uma rodada com --once, ou em loop), útil com
+  backend de cache compartilhado ou para aquecer sob demanda; em loop ele
+  também disputa o flock
+"""
+import concurrent.futures as cf
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem eleição, cada processo aquece
+    fcntl = None
+
+from core.b3_calendar import FASE_FECHADO, agora_b3, em_pregao, fase_sessao, proxima_pre_abertura
+from core.cache_ttl import ttl
+
+INTERVALO_PREGAO = int(os.getenv("CACHE_WARMER_INTERVALO", "0"))    # s; 0 = 80% do TTL do screener
+JITTER = int(os.getenv("CACHE_WARMER_JITTER", "0"))                 # s; 0 = 10% do intervalo
+JITTER_ATIVO = float(os.getenv("CACHE_WARMER_JITTER_ATIVO", "2"))   # s, antes de cada ativo
+CONCORRENCIA = int(os.getenv("CACHE_WARMER_CONCORRENCIA", "3"))
+INTERVALO_MIN = 30
+LOCK_PATH = os.getenv(
+    "CACHE_WARMER_LOCK",
+    os.path.join(tempfile.gettempdir(), "simulador_cache_warmer.lock"),
+)
+
+_estado: Dict[str, Dict[str, Any]] = {}
+_estado_lock = threading.Lock()
+_ciclo: Dict[str, Any] = {"rodadas": 0, "ultima_rodada": None, "proxima_rodada": None}
+
+_parar = threading.Event()
+_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
+_lock_eleicao = None  # arquivo com o flock, aberto enquanto o processo for o eleito
+
+
+def _log(msg: str):
+    print(f"[WARMER] {msg}", flush=True)
+
+
+def _eleito() -> bool:
+    """Tenta (sem bloquear) o flock do warmer do host; True se este processo o tem."""
+    global _lock_eleicao
+    if fcntl is None or _lock_eleicao is not None:
+        return True
+    f = open(LOCK_PATH, "a+")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return False
+    _lock_eleicao = f
+    _log(f"eleito warmer do host (pid={os.getpid()})")
+    return True
+
+
+# ------------------------------------------------------------
+# Ativos
+# ------------------------------------------------------------
+def ativos_por_plano() -> Dict[str, List[str]]:
+    """{plano: ativos} do PlanAssetList (na ordem da lista, sem repetição)."""
+    from simulador_web.models import PlanAssetList
+
+    planos: Dict[str, List[str]] = {}
+    for plan, assets in PlanAssetList.objects.values_list("plan", "assets"):
+        lista = planos.setdefault(plan, [])
+        for t in assets or []:
+            t = str(t or "").upper().strip()
+            if t and t not in lista:
+                lista.append(t)
+    return planos
+
+
+def tickers_planos() -> List[str]:
+    """União dos ativos de todos os PlanAssetList, sem repetição, na ordem."""
+    vistos: List[str] = []
+    for lista in ativos_por_plano().values():
+        for t in lista:
+            if t not in vistos:
+                vistos.append(t)
+    return vistos
+
+
+# ------------------------------------------------------------
+# Rodada
+# ------------------------------------------------------------
+def _aquecer_ticker(ticker: str, jitter_ativo: float, planos: Iterable[str] = ()) -> bool:
+    from core.app_core import atualizar_e_screener_atm_2venc
+    from simulador_web.domain.ls_linhas import aquecer_base_ls
+
+    if jitter_ativo > 0 and _parar.wait(random.uniform(0.0, jitter_ativo)):
+        return False
+
+    t0 = time.perf_counter()
+    try:
+        res = atualizar_e_screener_atm_2venc(ticker, False)
+        linhas = len((res or {}).get("atm") or [])
+        erro = None if linhas else "screener sem linhas"
+        # base do LS do ativo (screener já quente: só spot + montagem)
+        if linhas and planos:
+            aquecer_base_ls(planos, ticker, [ticker])
+    except Exception as e:
+        linhas, erro = 0, str(e)
+    dur = time.perf_counter() - t0
+
+    with _estado_lock:
+        st = _estado.setdefault(ticker, {"ultimo_ok": None, "falhas_seguidas": 0})
+        st["ultima_tentativa"] = time.time()
+        st["duracao_s"] = round(dur, 3)
+        st["linhas"] = linhas
+        st["ultimo_erro"] = erro
+        if erro:
+            st["falhas_seguidas"] += 1
+        else:
+            st["ultimo_ok"] = st["ultima_tentativa"]
+            st["falhas_seguidas"] = 0
+    return erro is None
+
+
+def aquecer(
+    tickers: Optional[Iterable[str]] = None,
+    *,
+    concorrencia: int = CONCORRENCIA,
+    jitter_ativo: float = JITTER_ATIVO,
+) -> Dict[str, Any]:
+    """
+    Uma rodada sobre `tickers` (padrão: todos os planos): screener e base do
+    LS de cada ativo e, sem `tickers`, a base da lista de cada plano.
+    Devolve o resumo.
+    """
+    from django.db import close_old_connections
+    from simulador_web.domain.ls_linhas import aquecer_base_ls
+
+    t0 = time.perf_counter()
+    try:
+        planos = ativos_por_plano()
+    finally:
+        close_old_connections()
+    listas = planos if tickers is None else {}
+    tickers = tickers_planos() if tickers is None else [t.upper().strip() for t in tickers]
+    random.shuffle(tickers)
+
+    ok = 0
+    with cf.ThreadPoolExecutor(max_workers=max(1, concorrencia), thread_name_prefix="warmer") as ex:
+        tarefas = lambda t: _aquecer_ticker(t, jitter_ativo, [p for p, l in planos.items() if t in l])
+        for r in ex.map(tarefas, tickers):
+            ok += int(r)
+
+    # lista padrão de cada plano (página sem ativo): screeners já quentes
+    for plan, lista in listas.items():
+        if lista and not _parar.is_set():
+            try:
+                aquecer_base_ls([plan], "", lista)
+            except Exception as e:
+                _log(f"❌ base LS do plano {plan}: {e}")
+
+    resumo = {"tickers": len(tickers), "ok": ok, "falhas": len(tickers) - ok,
+              "segundos": round(time.perf_counter() - t0, 3)}
+    with _estado_lock:
+        _ciclo["rodadas"] += 1
+        _ciclo["ultima_rodada"] = time.time()
+    _log(f"rodada: {resumo}")
+    return resumo
+
+
+# ------------------------------------------------------------
+# Agenda (pregão B3)
+# ------------------------------------------------------------
+def _aberto(agora) -> bool:
+    return fase_sessao(agora) != FASE_FECHADO
+
+
+def _espera(agora, aberto: bool, intervalo: int, jitter: int) -> float:
+    if aberto:
+        vigente = ttl("screener", agora)
+        intervalo = intervalo or int(vigente * 0.8)
+        jitter = jitter or intervalo * 0.1
+        # nos leilões o TTL (30 s) não comporta INTERVALO_MIN + jitter: o piso
+        # fica abaixo do TTL, senão a entrada expira entre duas rodadas
+        piso = min(INTERVALO_MIN, vigente * 0.7)
+        return max(piso, intervalo + random.uniform(-jitter, jitter))
+    ate = (proxima_pre_abertura(agora) - agora).total_seconds()
+    return max(INTERVALO_MIN, ate + random.uniform(0, jitter or 60))
+
+
+def rodar_loop(
+    *,
+    intervalo: int = INTERVALO_PREGAO,
+    jitter: int = JITTER,
+    concorrencia: int = CONCORRENCIA,
+    tickers: Optional[Iterable[str]] = None,
+    atraso_inicial: float = 0.0,
+):
+    """
+    Laço do warmer até parar(): aquece no boot, com a sessão aberta e uma
+    vez após o fechamento; fora disso dorme até a próxima pré-abertura.
+    """
+    tickers = list(tickers) if tickers else None
+    if atraso_inicial > 0 and _parar.wait(atraso_inicial):
+        return
+    estava_aberto = None
+    while not _parar.is_set():
+        agora = agora_b3()
+        aberto = _aberto(agora)
+        if not _eleito():
+            pass  # outro processo do host é o warmer; tenta de novo no próximo ciclo
+        elif aberto or estava_aberto is None or estava_aberto:
+            try:
+                aquecer(tickers, concorrencia=concorrencia)
+            except Exception as e:
+                _log(f"❌ rodada falhou: {e}")
+        estava_aberto = aberto
+
+        espera = _espera(agora_b3(), aberto, intervalo, jitter)
+        with _estado_lock:
+            _ciclo["proxima_rodada"] = time.time() + espera
+        _parar.wait(espera)
+
+
+def iniciar_em_thread(**kwargs) -> bool:
+    """Sobe o laço numa thread daemon (uma por processo). False se já rodava."""
+    global _thread
+    # deixa o Django terminar o boot e espalha workers que sobem juntos
+    kwargs.setdefault("atraso_inicial", 10.0 + random.uniform(0, JITTER or 60))
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return False
+        _parar.clear()
+        _thread = threading.Thread(target=rodar_loop, kwargs=kwargs, name="cache-warmer", daemon=True)
+        _thread.start()
+    _log(f"thread iniciada (pid={os.getpid()})")
+    return True
+
+
+def parar():
+    _parar.set()
+
+
+# ------------------------------------------------------------
+# Estado
+# ------------------------------------------------------------
+def estado_warmer() -> Dict[str, Any]:
+    """Idade do último refresh por ativo (segundos), agenda do ciclo e se este processo é o eleito."""
+    agora = time.time()
+    idade = lambda ts: None if ts is None else round(agora - ts, 1)
+    with _estado_lock:
+        tickers = {
+            t: {
+                "idade_s": idade(st.get("ultimo_ok")),
+                "ultima_tentativa_s": idade(st.get("ultima_tentativa")),
+                "duracao_s": st.get("duracao_s"),
+                "linhas": st.get("linhas"),
+                "ultimo_erro": st.get("ultimo_erro"),
+                "falhas_seguidas": st.get("falhas_seguidas", 0),
+            }
+            for t, st in sorted(_estado.items())
+        }
+        ciclo = dict(_ciclo)
+    return {
+        "pid": os.getpid(),
+        "thread_ativa": _thread is not None and _thread.is_alive(),
+        "eleito": fcntl is None or _lock_eleicao is not None,
+        "em_pregao": em_pregao(),
+        "rodadas": ciclo["rodadas"],
+        "ultima_rodada_s": idade(ciclo["ultima_rodada"]),
+        "proxima_rodada_em_s": None if ciclo["proxima_rodada"] is None else round(ciclo["proxima_rodada"] - agora, 1),
+        "tickers": tickers,
+    }
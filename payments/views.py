@@ -1,5 +1,4 @@
 import json
-import requests
 from django.conf import settings
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -38,6 +37,8 @@ def criar_assinatura(request):
         "Content-Type": "application/json",
     }
 
+    import requests  # só quando há chamada (o URLconf carrega este módulo no 1º request)
+
     resp = requests.get(
         f"{MP_API_BASE}/preapproval_plan/{plan_id}",
         headers=headers,
@@ -2,7 +2,6 @@ import json
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from .models import Assinatura
-import requests
 import os
 
 MP_TOKEN = os.getenv("MP_ACCESS_TOKEN")
@@ -15,6 +14,8 @@ def mercadopago_webhook(request):
     if not preapproval_id:
         return HttpResponse(status=200)
 
+    import requests  # só quando há chamada (o URLconf carrega este módulo no 1º request)
+
     resp = requests.get(
         f"https://api.mercadopago.com/preapproval/{preapproval_id}",
         headers={"Authorization": f"Bearer {MP_TOKEN}"},
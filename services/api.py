@@ -1,18 +1,78 @@
 # services/api.py
 import os
 import json
-import requests
+import threading
+import time
+
+from core import cache_snapshot
+from core.cache_ttl import ttl
 
 # --------------------------------------------------
 # Token Oplab via .env (NUNCA hardcoded)
+# Validado no 1º uso (não no import): o worker sobe e serve páginas que não
+# dependem da OPLAB; `manage.py check` avisa se faltar (simulador_web.checks).
+# `requests` também é importado só quando há chamada.
+# --------------------------------------------------
+_HEADERS = None
+
+
+def get_headers() -> dict:
+    global _HEADERS
+    if _HEADERS is None:
+        token = os.getenv("OPLAB_TOKEN")
+        if not token:
+            raise RuntimeError("Defina OPLAB_TOKEN no .env ou nas variáveis de ambiente.")
+        _HEADERS = {"Access-Token": token}
+    return _HEADERS
+
+
+def __getattr__(nome):
+    # compatibilidade: services.api.HEADERS / ACCESS_TOKEN
+    if nome == "HEADERS":
+        return get_headers()
+    if nome == "ACCESS_TOKEN":
+        return get_headers()["Access-Token"]
+    raise AttributeError(f"module 'services.api' has no attribute {nome!r}")
+
+
+# --------------------------------------------------
+# Cache das respostas OPLAB (por URL, em memória do processo)
+# TTL pela política de pregão (core.cache_ttl, categoria "oplab"): segundos
+# com mercado aberto, até a pré-abertura com ele fechado. O screener, o
+# warmer e a view pedem a mesma cadeia/spot várias vezes por rodada.
+# Só respostas válidas entram; os objetos devolvidos são compartilhados
+# (somente leitura).
 # --------------------------------------------------
-ACCESS_TOKEN = os.getenv("OPLAB_TOKEN")
-if not ACCESS_TOKEN:
-    raise RuntimeError("Defina OPLAB_TOKEN no .env ou nas variáveis de ambiente.")
+MAX_RESPOSTAS = 512
+_respostas = {}
+_respostas_lock = threading.Lock()
+cache_snapshot.registrar_dict("oplab", _respostas, expira=lambda item: item[0])
+
+
+def _resposta_cache(url):
+    with _respostas_lock:
+        item = _respostas.get(url)
+        if item and time.time() < item[0]:
+            return item[1]
+    return None
+
+
+def _guardar_resposta(url, dados):
+    agora = time.time()
+    with _respostas_lock:
+        if len(_respostas) >= MAX_RESPOSTAS:
+            for k in [k for k, (exp, _) in _respostas.items() if exp <= agora]:
+                del _respostas[k]
+            while len(_respostas) >= MAX_RESPOSTAS:
+                _respostas.pop(next(iter(_respostas)))
+        _respostas[url] = (agora + ttl("oplab"), dados)
+    return dados
+
+
+def limpar_cache_respostas():
+    with _respostas_lock:
+        _respostas.clear()
 
-HEADERS = {
-    "Access-Token": ACCESS_TOKEN
-}
 
 BASE_URL = "https://api.oplab.com.br/v3/market/options"
 
@@ -22,11 +82,17 @@ def buscar_opcoes_ativo(ativo_base):
     Retorna uma lista de opções (CALL e PUT) do ativo informado.
     Com timeout e tratamento de erro.
     """
+    import requests
+
     url = f"{BASE_URL}/{ativo_base}"
+    cached = _resposta_cache(url)
+    if cached is not None:
+        return cached
+    headers = get_headers()
     try:
-        response = requests.get(url, headers=HEADERS, timeout=4.0)
+        response = requests.get(url, headers=headers, timeout=4.0)
         if response.status_code == 200:
-            return response.json()
+            return _guardar_resposta(url, response.json())
         raise Exception(f"Erro ao buscar opções de {ativo_base}: {response.status_code} - {response.text}")
     except requests.Timeout:
         raise Exception(f"Timeout ao buscar opções de {ativo_base}.")
@@ -39,11 +105,17 @@ def buscar_detalhes_opcao(symbol_opcao):
     Retorna os detalhes de uma opção específica pelo símbolo.
     Com timeout e tratamento de erro.
     """
+    import requests
+
     url = f"{BASE_URL}/details/{symbol_opcao}"
+    cached = _resposta_cache(url)
+    if cached is not None:
+        return cached
+    headers = get_headers()
     try:
-        response = requests.get(url, headers=HEADERS, timeout=4.0)
+        response = requests.get(url, headers=headers, timeout=4.0)
         if response.status_code == 200:
-            return response.json()
+            return _guardar_resposta(url, response.json())
         raise Exception(
             f"Erro ao buscar detalhes da opção {symbol_opcao}: {response.status_code} - {response.text}"
         )
@@ -65,48 +137,90 @@ def salvar_json_em_arquivo(dados, nome_arquivo):
     print(f"✅ JSON salvo em: {caminho}")
 
 
+# --------------------------------------------------
+# Versão dos dados
+# Cada linha da cadeia traz `time` (epoch ms da última cotação). O maior
+# `time` identifica a "versão" da cadeia: se não mudou, nada do que o
+# screener calcula a partir dela mudou.
+# --------------------------------------------------
+def versao_cadeia(ops) -> str:
+    """Versão da cadeia = maior `time` das linhas; sem `time`, hash das cotações."""
+    tempos = []
+    for o in ops or []:
+        try:
+            tempos.append(int(o.get("time")))
+        except (TypeError, ValueError):
+            pass
+    if tempos:
+        return str(max(tempos))
+
+    import hashlib
+    h = hashlib.blake2b(digest_size=8)
+    for o in ops or []:
+        h.update(repr((o.get("symbol"), o.get("bid"), o.get("ask"), o.get("close"))).encode())
+    return "h" + h.hexdigest()
+
+
 # --- Spot oficial do ativo (Oplab) ---
 STOCK_URL = "https://api.oplab.com.br/v3/market/stocks/{symbol}?with_financials=false"
 
+_CHAVES_PRECO = ("lastPrice", "last", "price", "regularMarketPrice", "close", "spot")
+_CHAVES_TEMPO = ("time", "updated_at", "last_trade_at")
 
-def get_spot_ativo_oficial(ticker: str) -> float | None:
+
+def _primeiro_preco(d: dict):
+    for k in _CHAVES_PRECO:
+        try:
+            v = float(d.get(k))
+            if v > 0:
+                return v
+        except Exception:
+            pass
+    return None
+
+
+def cotacao_ativo_oficial(ticker: str) -> dict | None:
     """
-    Retorna o último preço do ATIVO (spot) pela API oficial (Oplab) usando o mesmo HEADERS.
-    Ex.: PETR4 -> 29.98
+    Cotação do ATIVO pela Oplab: {"preco": 29.98, "versao": "..."}.
+    `versao` vem do horário da última negociação (ou do preço, se a API não
+    mandar horário) — é a sonda barata para revalidar caches versionados.
     """
     if not ticker:
         return None
+    import requests
+
     url = STOCK_URL.format(symbol=ticker.upper().strip())
+    cached = _resposta_cache(url)
+    if cached is not None:
+        return cached
+    headers = get_headers()
     try:
-        r = requests.get(url, headers=HEADERS, timeout=4.0)
+        r = requests.get(url, headers=headers, timeout=4.0)
         if r.status_code != 200:
             return None
         data = r.json() or {}
 
-        # tenta várias chaves no nível raiz
-        candidates = []
-        for k in ("lastPrice", "last", "price", "regularMarketPrice", "close", "spot"):
-            v = data.get(k)
-            try:
-                v = float(v)
-                if v > 0:
-                    candidates.append(v)
-            except Exception:
-                pass
-
-        # ou dentro de data["data"]
-        if not candidates and isinstance(data.get("data"), dict):
-            for k in ("lastPrice", "last", "price", "regularMarketPrice", "close", "spot"):
-                v = data["data"].get(k)
-                try:
-                    v = float(v)
-                    if v > 0:
-                        candidates.append(v)
-                except Exception:
-                    pass
-
-        if not candidates:
+        # tenta no nível raiz, ou dentro de data["data"]
+        fonte = data
+        preco = _primeiro_preco(data)
+        if preco is None and isinstance(data.get("data"), dict):
+            fonte = data["data"]
+            preco = _primeiro_preco(fonte)
+        if preco is None:
             return None
-        return round(candidates[0], 2)
+
+        preco = round(preco, 2)
+        tempo = next((fonte.get(k) for k in _CHAVES_TEMPO if fonte.get(k)), None)
+        versao = f"{tempo}|{preco}" if tempo else str(preco)
+        return _guardar_resposta(url, {"preco": preco, "versao": versao})
     except Exception:
         return None
+
+
+def get_spot_ativo_oficial(ticker: str) -> float | None:
+    """
+    Retorna o último preço do ATIVO (spot) pela API oficial (Oplab) usando os mesmos headers.
+    Ex.: PETR4 -> 29.98
+    """
+    cot = cotacao_ativo_oficial(ticker)
+    return cot["preco"] if cot else None
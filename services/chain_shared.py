@@ -0,0 +1,328 @@
+# services/chain_shared.py
+"""
+Snapshots da cadeia ao vivo compartilhados entre os workers do host.
+
+Com gunicorn + N UvicornWorker, cada worker buscava e guardava a própria
+cópia de cada cadeia: N× chamadas à OPLAB e N× memória. Aqui um worker
+busca a cadeia e grava cada versão uma vez em colunas .npy; todos os
+workers mapeiam os mesmos arquivos somente leitura (np.load mmap_mode="r").
+
+Colunas = os campos crus que o screener lê, na ordem em que a OPLAB
+devolveu as linhas (sem ordenar nem normalizar: IV em %, prêmio sem
+last/close continuam assim); valor ausente ou não numérico vira NaN / ""
+/ NaT e volta como None. Só as linhas dos vencimentos pedidos viram dicts
+(`linhas(dues)`), uma vez por versão em cada processo; o screener recebe
+os mesmos valores de buscar_opcoes_ativo, com ou sem compartilhamento.
+Os resultados do screener continuam no cache de cada worker.
+
+Layout (CHAIN_SHARED_DIR; padrão /dev/shm/simulador_chains — tmpfs, os
+arquivos mapeados são memória compartilhada):
+    <raiz>/<TICKER>/indice.json        {"versao", "pasta", "gravado_em", "expira"}
+    <raiz>/<TICKER>/v<versao>/         <coluna>.npy
+    <raiz>/<TICKER>/.lock              flock do escritor
+
+Protocolo (um escritor por ticker):
+- leitor: índice dentro da validade → mapeia a versão (cache por processo)
+- índice vencido: quem pega o flock (LOCK_NB) busca a cadeia na OPLAB;
+  mesma versão (services.api.versao_cadeia, calculada das linhas cruas) →
+  só renova a validade; versão nova → grava v<versao>/ (rename atômico da
+  pasta), troca o índice e remove as versões antigas (mantém a anterior
+  para leitores em curso)
+- quem não pega o lock serve a versão vencida, se houver; senão espera o
+  escritor por até ESPERA_MAX segundos
+
+Liga com CHAIN_SHARED=1. Sem fcntl (Windows) ou desligado, cada processo
+busca a própria cadeia (services.api, com cache em memória).
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from core.cache_ttl import ttl
+from services.api import buscar_opcoes_ativo, versao_cadeia
+
+CHAIN_SHARED_DIR = os.getenv(
+    "CHAIN_SHARED_DIR",
+    "/dev/shm/simulador_chains" if os.path.isdir("/dev/shm")
+    else os.path.join(tempfile.gettempdir(), "simulador_chains"),
+)
+ESPERA_MAX = 10.0  # s esperando o escritor quando não há versão nenhuma
+
+# campos das linhas da OPLAB lidos pelo screener (ver simulacoes.atm_screener)
+COLUNAS_TEXTO = ("symbol", "category")
+COLUNAS_NUM = (
+    "strike", "bid", "ask", "last", "close",
+    "iv", "implied_vol", "implied_volatility", "sigma",
+    "days_to_maturity", "contract_size", "open_interest", "volume", "spot_price",
+)
+
+
+@dataclass
+class SnapshotCadeia:
+    """
+    Uma versão da cadeia: colunas mapeadas de `pasta` (compartilhada) ou as
+    linhas cruas da busca local (`_linhas`).
+    """
+    ticker: str
+    versao: str
+    pasta: Optional[Path] = None
+    _linhas: Optional[List[dict]] = field(default=None, repr=False)
+    _colunas: Optional[Dict[str, np.ndarray]] = field(default=None, repr=False)
+    _por_dues: Dict[Optional[tuple], List[dict]] = field(default_factory=dict, repr=False)
+
+    def colunas(self) -> Dict[str, np.ndarray]:
+        """Colunas da versão, mapeadas somente leitura (1× por processo)."""
+        if self._colunas is None:
+            self._colunas = _mapear_colunas(self.pasta) if self.pasta else {}
+        return self._colunas
+
+    def vencimentos(self) -> List[dict]:
+        """
+        {"due_date", "category"} distintos — o que _next_two_official_dues
+        precisa, sem montar as linhas da cadeia inteira.
+        """
+        if self._linhas is not None or not self.colunas():
+            return self._linhas or []
+        dias = np.asarray(self._colunas["due_date"])
+        cats = np.char.upper(np.asarray(self._colunas["category"]))
+        saida = []
+        for lado in ("CALL", "PUT"):
+            sel = np.char.startswith(cats, lado) & ~np.isnat(dias)
+            for d in np.datetime_as_string(np.unique(dias[sel]), unit="D").tolist():
+                saida.append({"due_date": d, "category": lado})
+        return saida
+
+    def linhas(self, dues: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+        Linhas no formato de buscar_opcoes_ativo, na ordem original; só as
+        de `dues` (vencimentos "YYYY-MM-DD") quando informado. Montadas 1×
+        por versão e conjunto de vencimentos.
+        """
+        chave = None if dues is None else tuple(dues)
+        linhas = self._por_dues.get(chave)
+        if linhas is not None:
+            return linhas
+
+        if self._linhas is not None:
+            linhas = self._linhas
+            if chave is not None:
+                linhas = [o for o in linhas if (o.get("due_date") or "")[:10] in chave]
+        elif self.colunas():
+            dias = self._colunas["due_date"]
+            if chave is None:
+                idx = np.arange(len(dias))
+            else:
+                idx = np.nonzero(np.isin(dias, np.array(chave, dtype="datetime64[D]")))[0]
+            linhas = _linhas_das_colunas(self._colunas, idx)
+        else:
+            linhas = []
+
+        self._por_dues[chave] = linhas
+        return linhas
+
+
+# ticker -> última versão carregada neste processo
+_mapeadas: Dict[str, SnapshotCadeia] = {}
+_mapeadas_lock = threading.Lock()
+
+
+def _log(msg: str):
+    print(f"[CHAIN-SHARED] {msg}", flush=True)
+
+
+def compartilhado() -> bool:
+    return fcntl is not None and os.getenv("CHAIN_SHARED") == "1"
+
+
+# ------------------------------------------------------------
+# Índice / lock
+# ------------------------------------------------------------
+def _ler_indice(base: Path) -> Optional[dict]:
+    try:
+        with open(base / "indice.json", "r", encoding="utf-8") as f:
+            indice = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return indice if "pasta" in indice else None  # formato antigo: republica
+
+
+def _gravar_indice(base: Path, indice: dict):
+    fd, tmp = tempfile.mkstemp(prefix=".indice-", dir=base)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(indice, f)
+    os.replace(tmp, base / "indice.json")
+
+
+@contextmanager
+def _lock_escritor(base: Path):
+    """Tenta o flock exclusivo do ticker sem bloquear; produz True se é o escritor."""
+    with open(base / ".lock", "a+") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# ------------------------------------------------------------
+# Colunas
+# ------------------------------------------------------------
+def _num(v) -> float:
+    try:
+        return float(v) if v is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _dia(v) -> np.datetime64:
+    try:
+        return np.datetime64(str(v)[:10], "D") if v else np.datetime64("NaT")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def _colunas_das_linhas(rows: List[dict]) -> Dict[str, np.ndarray]:
+    cols = {c: np.array([str(o.get(c) or "") for o in rows]) for c in COLUNAS_TEXTO}
+    cols["due_date"] = np.array([_dia(o.get("due_date")) for o in rows], dtype="datetime64[D]")
+    for c in COLUNAS_NUM:
+        cols[c] = np.array([_num(o.get(c)) for o in rows], dtype=np.float64)
+    return cols
+
+
+def _linhas_das_colunas(cols: Dict[str, np.ndarray], idx: np.ndarray) -> List[dict]:
+    """Dicts das linhas `idx`; NaN / "" / NaT voltam como None."""
+    valores = {c: [v or None for v in cols[c][idx].tolist()] for c in COLUNAS_TEXTO}
+    dias = np.datetime_as_string(cols["due_date"][idx], unit="D").tolist()
+    valores["due_date"] = [None if d == "NaT" else d for d in dias]
+    for c in COLUNAS_NUM:
+        valores[c] = [None if v != v else v for v in cols[c][idx].tolist()]
+    nomes = list(valores)
+    return [dict(zip(nomes, linha)) for linha in zip(*(valores[n] for n in nomes))]
+
+
+def _mapear_colunas(pasta: Path) -> Dict[str, np.ndarray]:
+    return {
+        c: np.load(pasta / f"{c}.npy", mmap_mode="r")
+        for c in COLUNAS_TEXTO + ("due_date",) + COLUNAS_NUM
+    }
+
+
+def _gravar_colunas(base: Path, pasta: str, rows: List[dict]):
+    """Grava a versão numa pasta temporária e publica com rename atômico."""
+    tmp = Path(tempfile.mkdtemp(prefix=".cadeia-", dir=base))
+    for nome, arr in _colunas_das_linhas(rows).items():
+        np.save(tmp / f"{nome}.npy", arr)
+    try:
+        os.rename(tmp, base / pasta)
+    except OSError:
+        # a mesma versão já publicada (índice perdido/antigo): vale a que está lá
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _abrir(ticker: str, base: Path, indice: dict) -> SnapshotCadeia:
+    with _mapeadas_lock:
+        snap = _mapeadas.get(ticker)
+    if snap is not None and snap.versao == indice["versao"]:
+        return snap
+
+    # mapeia já aqui: se a versão for removida depois, o mmap continua válido
+    snap = SnapshotCadeia(ticker, indice["versao"], base / indice["pasta"])
+    snap.colunas()
+    with _mapeadas_lock:
+        _mapeadas[ticker] = snap
+    return snap
+
+
+def _limpar_versoes(base: Path, manter: set):
+    for p in base.glob("v*"):
+        if p.name in manter:
+            continue
+        if p.is_dir():
+            shutil.rmtree(p, ignore_errors=True)
+        else:
+            try:
+                p.unlink()  # formato antigo (v<versao>.json)
+            except FileNotFoundError:
+                pass
+
+
+def _atualizar(ticker: str, base: Path) -> SnapshotCadeia:
+    """Só com o flock na mão: busca a cadeia e publica a versão se mudou."""
+    indice = _ler_indice(base)
+    agora = time.time()
+    if indice and agora < indice["expira"]:
+        return _abrir(ticker, base, indice)  # outro worker acabou de publicar
+
+    rows = buscar_opcoes_ativo(ticker)
+    if not rows:
+        return SnapshotCadeia(ticker, "", _linhas=[])
+
+    versao = versao_cadeia(rows)
+    expira = agora + ttl("oplab")
+    if indice and indice["versao"] == versao:
+        _gravar_indice(base, dict(indice, expira=expira))
+        return _abrir(ticker, base, indice)
+
+    pasta = f"v{versao}"
+    t0 = time.perf_counter()
+    _gravar_colunas(base, pasta, rows)
+    novo = {"versao": versao, "pasta": pasta, "gravado_em": agora, "expira": expira}
+    _gravar_indice(base, novo)
+    _limpar_versoes(base, {pasta, indice["pasta"]} if indice else {pasta})
+    _log(f"{ticker} v={versao} | linhas={len(rows)} | {time.perf_counter() - t0:.3f}s (pid={os.getpid()})")
+
+    # o escritor também lê pelo mmap: as mesmas linhas que os outros workers
+    return _abrir(ticker, base, novo)
+
+
+def _snapshot_local(ticker: str) -> SnapshotCadeia:
+    rows = buscar_opcoes_ativo(ticker) or []
+    return SnapshotCadeia(ticker, versao_cadeia(rows) if rows else "", _linhas=rows)
+
+
+def snapshot_cadeia(ticker: str) -> SnapshotCadeia:
+    """
+    Versão atual da cadeia do ticker. Compartilhada entre os workers quando
+    CHAIN_SHARED=1; senão, busca local (com o cache de services.api).
+    """
+    ticker = (ticker or "").upper().strip()
+    if not compartilhado():
+        return _snapshot_local(ticker)
+
+    base = Path(CHAIN_SHARED_DIR) / ticker
+    base.mkdir(parents=True, exist_ok=True)
+    limite = time.time() + ESPERA_MAX
+    try:
+        while True:
+            indice = _ler_indice(base)
+            if indice and time.time() < indice["expira"]:
+                return _abrir(ticker, base, indice)
+            with _lock_escritor(base) as escritor:
+                if escritor:
+                    return _atualizar(ticker, base)
+            if indice:
+                return _abrir(ticker, base, indice)  # vencida, mas o escritor já está nela
+            if time.time() > limite:
+                break
+            time.sleep(0.05)
+    except FileNotFoundError:
+        pass  # versão removida entre ler o índice e mapear: busca local
+    return _snapshot_local(ticker)
@@ -0,0 +1,241 @@
+# services/chain_store.py
+"""
+Armazém local de cadeias de opções históricas (colunar, NumPy .npy).
+
+Layout em disco:
+    <raiz>/<TICKER>/<YYYY-MM-DD>/<coluna>.npy
+    <raiz>/<TICKER>/<YYYY-MM-DD>/meta.json
+
+Cada partição (ticker, pregão) guarda a cadeia inteira ordenada por
+(due_date, strike, category) — a ordenação é o índice: busca por
+vencimento/strike é searchsorted, sem varrer a cadeia.
+As colunas são abertas com mmap_mode="r" (leitura sob demanda, sem cópia).
+"""
+import json
+import os
+import shutil
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+CHAIN_STORE_DIR = os.getenv(
+    "CHAIN_STORE_DIR",
+    str(Path(__file__).resolve().parent.parent / "data" / "chains"),
+)
+
+# coluna -> dtype
+COLUNAS = {
+    "symbol": "U",  # largura ajustada ao maior símbolo
+    "category": "U4",
+    "due_date": "datetime64[D]",
+    "strike": "f8",
+    "bid": "f8",
+    "ask": "f8",
+    "last": "f8",
+    "close": "f8",
+    "iv": "f8",
+    "days_to_maturity": "i4",
+    "open_interest": "i8",
+    "volume": "i8",
+    "contract_size": "i4",
+    "spot_price": "f8",
+    "time": "i8",  # epoch em ms (mesmo formato da cadeia ao vivo)
+}
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+def _raiz(raiz=None) -> Path:
+    return Path(raiz or CHAIN_STORE_DIR)
+
+
+def _dir_particao(ticker: str, dia: date, raiz=None) -> Path:
+    return _raiz(raiz) / ticker.upper().strip() / dia.isoformat()
+
+
+def _num(v, default=0.0) -> float:
+    try:
+        x = float(v)
+        return x if x == x else default  # NaN → default
+    except (TypeError, ValueError):
+        return default
+
+
+def _epoch_ms(v) -> int:
+    if v is None:
+        return 0
+    if isinstance(v, (int, float)):
+        return int(v)
+    try:
+        dt = datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+        return int(dt.timestamp() * 1000)
+    except ValueError:
+        return 0
+
+
+def _spot_linha(row: dict) -> float:
+    sp = _num(row.get("spot_price"))
+    if sp > 0:
+        return sp
+    spot = row.get("spot") or {}
+    if isinstance(spot, dict):
+        for k in ("price", "last", "close", "spot"):
+            v = _num(spot.get(k))
+            if v > 0:
+                return v
+    return 0.0
+
+
+def _iv_decimal(row: dict) -> float:
+    for k in ("iv", "implied_vol", "implied_volatility", "volatility", "sigma"):
+        v = _num(row.get(k))
+        if v > 0:
+            # histórico OPLAB vem em % (ex.: 32.5); guardamos decimal (0.325)
+            return v / 100.0 if v > 1.5 else v
+    return 0.0
+
+
+# ------------------------------------------------------------
+# Escrita
+# ------------------------------------------------------------
+def salvar_cadeia(ticker: str, dia: date, rows: list[dict], raiz=None) -> int:
+    """
+    Grava a cadeia de um pregão. Aceita linhas do histórico
+    (/historical/options) ou da cadeia ao vivo (/market/options).
+    Sobrescreve a partição de forma atômica. Retorna o nº de linhas.
+    """
+    norm = []
+    for r in rows:
+        cat = (r.get("category") or r.get("type") or "").upper()
+        if not (cat.startswith("CALL") or cat.startswith("PUT")):
+            continue
+        strike = _num(r.get("strike"))
+        due = str(r.get("due_date") or "")[:10]
+        if strike <= 0 or not due:
+            continue
+
+        premio = _num(r.get("premium"))
+        norm.append({
+            "symbol": str(r.get("symbol") or ""),
+            "category": "CALL" if cat.startswith("CALL") else "PUT",
+            "due_date": due,
+            "strike": strike,
+            "bid": _num(r.get("bid")),
+            "ask": _num(r.get("ask")),
+            "last": _num(r.get("last")) or premio,
+            "close": _num(r.get("close")) or premio,
+            "iv": _iv_decimal(r),
+            "days_to_maturity": int(_num(r.get("days_to_maturity"))),
+            "open_interest": int(_num(r.get("open_interest"))),
+            "volume": int(_num(r.get("volume"))),
+            "contract_size": int(_num(r.get("contract_size"), 100) or 100),
+            "spot_price": _spot_linha(r),
+            "time": _epoch_ms(r.get("time")),
+        })
+
+    norm.sort(key=lambda x: (x["due_date"], x["strike"], x["category"]))
+
+    destino = _dir_particao(ticker, dia, raiz)
+    tmp = destino.with_name(f".{destino.name}.tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    for col, dtype in COLUNAS.items():
+        arr = np.array([x[col] for x in norm], dtype=dtype)
+        np.save(tmp / f"{col}.npy", arr, allow_pickle=False)
+
+    spots = [x["spot_price"] for x in norm if x["spot_price"] > 0]
+    meta = {
+        "ticker": ticker.upper().strip(),
+        "trade_date": dia.isoformat(),
+        "linhas": len(norm),
+        "spot": spots[0] if spots else 0.0,
+        "max_time": max((x["time"] for x in norm), default=0),
+    }
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    if destino.exists():
+        shutil.rmtree(destino)
+    os.replace(tmp, destino)
+    return len(norm)
+
+
+# ------------------------------------------------------------
+# Leitura
+# ------------------------------------------------------------
+def tem_cadeia(ticker: str, dia: date, raiz=None) -> bool:
+    return (_dir_particao(ticker, dia, raiz) / "meta.json").exists()
+
+
+def datas_disponiveis(ticker: str, raiz=None) -> list[date]:
+    base = _raiz(raiz) / ticker.upper().strip()
+    if not base.is_dir():
+        return []
+    out = []
+    for p in base.iterdir():
+        if p.name.startswith(".") or not (p / "meta.json").exists():
+            continue
+        try:
+            out.append(date.fromisoformat(p.name))
+        except ValueError:
+            continue
+    return sorted(out)
+
+
+def carregar_meta(ticker: str, dia: date, raiz=None) -> dict:
+    with open(_dir_particao(ticker, dia, raiz) / "meta.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def carregar_colunas(ticker: str, dia: date, raiz=None) -> dict[str, np.ndarray]:
+    """
+    Colunas da partição como arrays memory-mapped (somente leitura).
+    Ordenadas por (due_date, strike, category).
+    """
+    base = _dir_particao(ticker, dia, raiz)
+    return {
+        col: np.load(base / f"{col}.npy", mmap_mode="r", allow_pickle=False)
+        for col in COLUNAS
+    }
+
+
+def fatia_vencimento_strike(cols: dict, due_date: str, strike: float | None = None) -> slice:
+    """
+    Índice (due_date[, strike]) via searchsorted sobre a ordenação da partição.
+    """
+    dues = cols["due_date"]
+    d = np.datetime64(due_date[:10], "D")
+    ini = int(np.searchsorted(dues, d, side="left"))
+    fim = int(np.searchsorted(dues, d, side="right"))
+    if strike is None:
+        return slice(ini, fim)
+
+    ks = cols["strike"][ini:fim]
+    k_ini = int(np.searchsorted(ks, strike - 1e-6, side="left"))
+    k_fim = int(np.searchsorted(ks, strike + 1e-6, side="right"))
+    return slice(ini + k_ini, ini + k_fim)
+
+
+def colunas_para_linhas(cols: dict, sel=slice(None)) -> list[dict]:
+    """
+    Converte colunas em linhas no mesmo formato de buscar_opcoes_ativo
+    (due_date como "YYYY-MM-DD"), consumido por screener_atm_dois_vencimentos.
+    """
+    fatia = {col: cols[col][sel] for col in COLUNAS}
+    fatia["due_date"] = np.datetime_as_string(fatia["due_date"], unit="D")
+    listas = {col: arr.tolist() for col, arr in fatia.items()}
+    n = len(listas["symbol"])
+    return [{col: listas[col][i] for col in COLUNAS} for i in range(n)]
+
+
+def carregar_cadeia(ticker: str, dia: date, raiz=None) -> tuple[list[dict], float]:
+    """
+    Cadeia do pregão no formato do screener + spot do dia.
+    """
+    cols = carregar_colunas(ticker, dia, raiz)
+    meta = carregar_meta(ticker, dia, raiz)
+    return colunas_para_linhas(cols), float(meta.get("spot") or 0.0)
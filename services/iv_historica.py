@@ -1,16 +1,19 @@
-# services/iv_historica.py
 
+import codecs
+import json
 import requests
-from collections import defaultdict
 from datetime import datetime, date
 from decimal import Decimal
+from typing import Callable, Iterable, Iterator
 
-from services.api import HEADERS
+from services.api import get_headers
 
 HIST_OPTIONS_URL = (
     "https://api.oplab.com.br/v3/market/historical/options/{spot}/{date_from}/{date_to}"
 )
 
+STREAM_CHUNK_BYTES = 64 * 1024
+
 
 def _date_from_time(timestr: str) -> date:
     return datetime.fromisoformat(timestr.replace("Z", "")).date()
@@ -21,97 +24,253 @@ def _date_from_due_date(datestr: str) -> date:
     return datetime.fromisoformat(datestr.replace("Z", "")).date()
 
 
-def buscar_iv_atm_historica(
-    ticker: str,
-    date_from: str,
-    date_to: str,
-):
-    url = HIST_OPTIONS_URL.format(
-        spot=ticker.upper(),
-        date_from=date_from,
-        date_to=date_to,
-    )
-
-    resp = requests.get(url, headers=HEADERS, timeout=6.0)
-    if resp.status_code != 200:
-        raise Exception(
-            f"Erro ao buscar histórico de opções {ticker}: "
-            f"{resp.status_code} - {resp.text}"
-        )
+# --------------------------------------------------
+# Parser incremental de array JSON
+# --------------------------------------------------
+def _iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    """
+    Lê um array JSON de nível raiz ("[{...}, {...}]") em pedaços de bytes
+    e devolve um elemento por vez, sem montar a lista inteira em memória.
+    `null` na raiz é tratado como array vazio.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    inicio = True
+    fim = False
+    eof = False
+    it = iter(chunks)
 
-    data = resp.json() or []
+    def _pular_espacos():
+        nonlocal pos
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
 
-    by_date = defaultdict(list)
-    for row in data:
-        trade_date = _date_from_time(row["time"])
-        by_date[trade_date].append(row)
+    def _ler_mais():
+        # descarta o já consumido e acrescenta o próximo pedaço
+        nonlocal buf, pos, eof
+        try:
+            buf = buf[pos:] + utf8.decode(next(it))
+        except StopIteration:
+            buf = buf[pos:] + utf8.decode(b"", final=True)
+            eof = True
+        pos = 0
 
-    resultado = []
+    while not fim:
+        _pular_espacos()
 
-    for trade_date, rows in sorted(by_date.items()):
-        atms = [r for r in rows if r.get("moneyness") == "ATM"]
-        if not atms:
+        # precisa de mais dados?
+        if pos >= len(buf):
+            if eof:
+                break
+            _ler_mais()
             continue
 
-        calls = [r for r in atms if r.get("type") == "CALL"]
-        puts = [r for r in atms if r.get("type") == "PUT"]
-        if not calls or not puts:
+        if inicio:
+            if not eof and len(buf) - pos < 4 and "null".startswith(buf[pos:]):
+                _ler_mais()  # "nu" | "ll" em pedaços diferentes
+                continue
+            if buf.startswith("null", pos):
+                return
+            if buf[pos] != "[":
+                raise ValueError("Resposta JSON não é um array.")
+            pos += 1
+            inicio = False
             continue
 
-        spot_price = None
-        for r in atms:
-            spot = r.get("spot") or {}
-            for k in ("price", "last", "close", "spot"):
-                try:
-                    v = float(spot.get(k))
-                    if v > 0:
-                        spot_price = v
-                        break
-                except Exception:
-                    pass
-            if spot_price:
-                break
+        c = buf[pos]
+        if c == ",":
+            pos += 1
+            continue
+        if c == "]":
+            fim = True
+            continue
 
-        if not spot_price:
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            _ler_mais()  # elemento incompleto
+            continue
+        if end >= len(buf) and not eof:
+            # número/literal pode continuar no próximo pedaço ("123" | "45")
+            _ler_mais()
             continue
 
-        def _best_by_premium(rows):
-            return min(
-                rows,
-                key=lambda r: abs(
-                    Decimal(str(r["premium"])) - Decimal(str(spot_price))
-                )
+        pos = end
+        yield item
+
+    if not fim:
+        raise ValueError("Resposta JSON incompleta (array sem fechamento).")
+
+
+def _iter_resposta(url: str, ticker: str, date_from: str, date_to: str, timeout: float):
+    """Abre a requisição em streaming e devolve os elementos do array."""
+    try:
+        resp = requests.get(url, headers=get_headers(), timeout=timeout, stream=True)
+    except requests.Timeout:
+        # TimeoutError permite ao backfill reduzir o intervalo e tentar de novo
+        raise TimeoutError(
+            f"Timeout ao buscar histórico de opções {ticker} ({date_from} → {date_to})."
+        )
+
+    with resp:
+        if resp.status_code != 200:
+            raise Exception(
+                f"Erro ao buscar histórico de opções {ticker}: "
+                f"{resp.status_code} - {resp.text}"
             )
+        try:
+            yield from _iter_json_array(resp.iter_content(chunk_size=STREAM_CHUNK_BYTES))
+        except requests.ConnectionError as e:
+            # timeout de leitura no meio do corpo chega como ConnectionError
+            if "timed out" in str(e).lower():
+                raise TimeoutError(
+                    f"Timeout ao ler histórico de opções {ticker} ({date_from} → {date_to})."
+                )
+            raise
+
+
+def _iter_linhas_por_dia(linhas: Iterable[dict], filtro=None) -> Iterator[tuple[date, list[dict]]]:
+    """
+    Agrupa linhas por pregão ("time"). A API devolve as linhas ordenadas por
+    data, então cada dia é emitido assim que aparece a primeira linha do
+    dia seguinte — só um dia fica em memória.
+    """
+    dia_atual = None
+    grupo = []
+    for row in linhas:
+        if filtro is not None and not filtro(row):
+            continue
+        trade_date = _date_from_time(row["time"])
+        if trade_date != dia_atual:
+            if grupo:
+                yield dia_atual, grupo
+            dia_atual = trade_date
+            grupo = []
+        grupo.append(row)
+    if grupo:
+        yield dia_atual, grupo
+
+
+# --------------------------------------------------
+# Resumo diário ATM
+# --------------------------------------------------
+def _eh_atm(row: dict) -> bool:
+    return row.get("moneyness") == "ATM" and row.get("type") in ("CALL", "PUT")
+
 
-        call = _best_by_premium(calls)
-        put = _best_by_premium(puts)
-
-        iv_call = Decimal(str(call["volatility"]))
-        iv_put = Decimal(str(put["volatility"]))
-        iv_mean = (iv_call + iv_put) / Decimal("2")
-
-        resultado.append({
-            "ticker": ticker.upper(),
-            "trade_date": trade_date,
-            "spot_price": Decimal(str(spot_price)),
-
-            "call": {
-                "symbol": call["symbol"],
-                "due_date": _date_from_due_date(call["due_date"]),
-                "days_to_maturity": call["days_to_maturity"],
-                "premium": Decimal(str(call["premium"])),
-                "volatility": iv_call,
-            },
-
-            "put": {
-                "symbol": put["symbol"],
-                "due_date": _date_from_due_date(put["due_date"]),
-                "days_to_maturity": put["days_to_maturity"],
-                "premium": Decimal(str(put["premium"])),
-                "volatility": iv_put,
-            },
-
-            "iv_atm_mean": iv_mean,
-        })
-
-    return resultado
+def _spot_do_dia(atms: list[dict]) -> float | None:
+    for r in atms:
+        spot = r.get("spot") or {}
+        for k in ("price", "last", "close", "spot"):
+            try:
+                v = float(spot.get(k))
+                if v > 0:
+                    return v
+            except Exception:
+                pass
+    return None
+
+
+def _resumo_atm_dia(ticker: str, trade_date: date, atms: list[dict]) -> dict | None:
+    calls = [r for r in atms if r.get("type") == "CALL"]
+    puts = [r for r in atms if r.get("type") == "PUT"]
+    if not calls or not puts:
+        return None
+
+    spot_price = _spot_do_dia(atms)
+    if not spot_price:
+        return None
+
+    def _best_by_premium(rows):
+        return min(rows, key=lambda r: abs(float(r["premium"]) - spot_price))
+
+    call = _best_by_premium(calls)
+    put = _best_by_premium(puts)
+
+    iv_call = Decimal(str(call["volatility"]))
+    iv_put = Decimal(str(put["volatility"]))
+    iv_mean = (iv_call + iv_put) / Decimal("2")
+
+    return {
+        "ticker": ticker.upper(),
+        "trade_date": trade_date,
+        "spot_price": Decimal(str(spot_price)),
+
+        "call": {
+            "symbol": call["symbol"],
+            "due_date": _date_from_due_date(call["due_date"]),
+            "days_to_maturity": call["days_to_maturity"],
+            "premium": Decimal(str(call["premium"])),
+            "volatility": iv_call,
+        },
+
+        "put": {
+            "symbol": put["symbol"],
+            "due_date": _date_from_due_date(put["due_date"]),
+            "days_to_maturity": put["days_to_maturity"],
+            "premium": Decimal(str(put["premium"])),
+            "volatility": iv_put,
+        },
+
+        "iv_atm_mean": iv_mean,
+    }
+
+
+def iter_iv_atm_historica(
+    ticker: str,
+    date_from: str,
+    date_to: str,
+    timeout: float = 6.0,
+    ao_receber_dia: Callable[[str, date, list[dict]], None] | None = None,
+) -> Iterator[dict]:
+    """
+    Versão em streaming de buscar_iv_atm_historica: lê a resposta em pedaços,
+    mantém só as linhas ATM e emite um resumo por pregão concluído.
+    Memória limitada a um dia de linhas ATM.
+
+    Com `ao_receber_dia(ticker, trade_date, linhas)`, a cadeia completa de
+    cada pregão é entregue antes do filtro ATM (ex.: gravar no chain_store
+    aproveitando o mesmo download). Nesse modo a memória fica limitada a
+    um dia de cadeia completa.
+    """
+    url = HIST_OPTIONS_URL.format(
+        spot=ticker.upper(),
+        date_from=date_from,
+        date_to=date_to,
+    )
+
+    linhas = _iter_resposta(url, ticker, date_from, date_to, timeout)
+    filtro = None if ao_receber_dia else _eh_atm
+
+    for trade_date, rows in _iter_linhas_por_dia(linhas, filtro=filtro):
+        if ao_receber_dia:
+            ao_receber_dia(ticker.upper(), trade_date, rows)
+            atms = [r for r in rows if _eh_atm(r)]
+        else:
+            atms = rows
+
+        resumo = _resumo_atm_dia(ticker, trade_date, atms)
+        if resumo is not None:
+            yield resumo
+
+
+def buscar_iv_atm_historica(
+    ticker: str,
+    date_from: str,
+    date_to: str,
+    timeout: float = 6.0,
+    ao_receber_dia: Callable[[str, date, list[dict]], None] | None = None,
+):
+    return list(
+        iter_iv_atm_historica(
+            ticker,
+            date_from,
+            date_to,
+            timeout=timeout,
+            ao_receber_dia=ao_receber_dia,
+        )
+    )
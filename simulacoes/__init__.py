@@ -1,3 +1,23 @@
 # simulacoes/__init__.py
-from .long_straddle import simular_long_straddle, calcular_payoff_long_straddle
-__all__ = ["simular_long_straddle", "calcular_payoff_long_straddle"]
+# Reexports resolvidos sob demanda (PEP 562): importar simulacoes.base ou
+# simulacoes.utils não carrega numpy/estrategias junto.
+from importlib import import_module
+
+_REEXPORTS = {
+    "simular_long_straddle": ".long_straddle",
+    "calcular_payoff_long_straddle": ".long_straddle",
+    "ESTRATEGIAS": ".estrategias",
+    "Estrategia": ".estrategias",
+    "simular_pernas": ".estrategias",
+    "payoff_vencimento": ".estrategias",
+}
+__all__ = list(_REEXPORTS)
+
+
+def __getattr__(nome):
+    mod = _REEXPORTS.get(nome)
+    if mod is None:
+        raise AttributeError(f"module 'simulacoes' has no attribute {nome!r}")
+    valor = getattr(import_module(mod, __name__), nome)
+    globals()[nome] = valor
+    return valor
@@ -1,25 +1,33 @@
 # simulacoes/atm_screener.py
 from typing import Dict, Any, List, Optional
 from datetime import date, datetime
-import pytz
+from zoneinfo import ZoneInfo
 import calendar
+import threading
 import time
 import uuid
 import concurrent.futures as cf
-from math import log, sqrt, erf
 
-from services.api import buscar_opcoes_ativo, get_spot_ativo_oficial
+from services.api import cotacao_ativo_oficial
+from services.chain_shared import snapshot_cadeia
 from services.api_bs import bs_greeks
+from services import chain_store
 from simulacoes.utils import extrair_float as _f, preco_compra_premio as _prem
+from simulacoes.probabilidade import enriquecer_probabilidades
 
 from django.core.cache import cache
+from core.cache_snapshot import cache_set
 from core.cache_keys import screener_cache_key
+from core.cache_ttl import retencao, ttl
 
 
 # ------------------------------------------------------------
 # LOG HELPERS
 # ------------------------------------------------------------
-def _log(scid: str, msg: str):
+def _log(scid: Optional[str], msg: str):
+    # scid=None: execução silenciosa (ex.: backtest, milhares de chamadas)
+    if scid is None:
+        return
     print(f"[{scid}] {msg}", flush=True)
 
 
@@ -119,21 +127,8 @@ def _two_atm_strikes(ks, spot):
 
 
 # ------------------------------------------------------------
-# Cálculo BS local + fallback API
+# IV da perna
 # ------------------------------------------------------------
-def _norm_cdf(x):
-    return 0.5 * (1 + erf(x / sqrt(2)))
-
-
-def _bs_delta_local(spot, strike, dias, vol, r, call_flag):
-    if spot <= 0 or strike <= 0 or vol <= 0 or dias <= 0:
-        return None
-    t = dias / 252
-    d1 = (log(spot/strike) + (r + 0.5*vol*vol)*t) / (vol*sqrt(t))
-    nd1 = _norm_cdf(d1)
-    return nd1 if call_flag else nd1 - 1
-
-
 def _iv(o):
     for k in ("iv", "implied_vol", "implied_volatility", "sigma"):
         try:
@@ -148,162 +143,345 @@ def _iv(o):
 # ------------------------------------------------------------
 # Monta pares ATM
 # ------------------------------------------------------------
-def _pairs_for_due(scid, ticker, due_date, ops, spot):
+def _indexar_pernas(ops, dues) -> Dict[str, Dict[float, tuple]]:
+    """
+    {vencimento: {strike: ([calls], [puts])}} só com os strikes que têm
+    CALL e PUT no vencimento.
+    """
+    idx: Dict[str, Dict[float, tuple]] = {d: {} for d in dues}
+    for o in ops:
+        due = (o.get("due_date") or "")[:10]
+        if due not in idx:
+            continue
+        cat = (o.get("category") or "").upper()
+        if cat.startswith("CALL"):
+            lado = 0
+        elif cat.startswith("PUT"):
+            lado = 1
+        else:
+            continue
+        k = round(_f(o.get("strike")), 6)
+        idx[due].setdefault(k, ([], []))[lado].append(o)
+    return {
+        d: {k: par for k, par in strikes.items() if par[0] and par[1]}
+        for d, strikes in idx.items()
+    }
+
+
+def _base_par(due_date, k, cs, ps) -> Optional[tuple]:
+    """
+    Parte do par ATM que não depende do spot: pernas escolhidas, prêmios,
+    BE em preço e IVs. Devolve (linha sem os campos do spot, parâmetros
+    das pernas para _aplicar_spot) ou None.
+    """
+    c = _choose_leg(cs)
+    p = _choose_leg(ps)
+    if not c or not p:
+        return None
+
+    prem_c = float(_prem(c) or 0.0)
+    prem_p = float(_prem(p) or 0.0)
+    prem_total = prem_c + prem_p
+
+    dias = int(c.get("days_to_maturity") or p.get("days_to_maturity") or 0)
+    iv_c = _iv(c)
+    iv_p = _iv(p)
+    amount = int((c.get("contract_size") or 100) or 100)
+
+    linha = {
+        "bucket": "ATM",
+        "call": c["symbol"],
+        "put": p["symbol"],
+        "due_date": due_date,
+        "strike": float(k),
+        "spot": None,
+        "days_to_maturity": dias,
+        "premium_total": round(prem_total, 4),
+        "call_premio": round(prem_c, 4),
+        "put_premio": round(prem_p, 4),
+        "be_down": round(k - prem_total, 2),
+        "be_up": round(k + prem_total, 2),
+        "be_pct_down": None,
+        "be_pct_up": None,
+        "contract_size": amount,
+        "iv_call": round(iv_c, 4) if iv_c > 0 else None,
+        "iv_put": round(iv_p, 4) if iv_p > 0 else None,
+        "call_delta": None,
+        "put_delta": None,
+        "src_call": None,
+        "src_put": None,
+    }
+    pernas = ((float(c["strike"]), iv_c, prem_c), (float(p["strike"]), iv_p, prem_p))
+    return linha, pernas
+
+
+def _delta_api(linha, is_call, strike, vol, premio, spot_r):
+    params = dict(
+        symbol=linha["call"] if is_call else linha["put"],
+        kind="CALL" if is_call else "PUT",
+        spotprice=spot_r,
+        strike=strike,
+        premium=premio,
+        dtm=linha["days_to_maturity"],
+        vol=vol,
+        irate=0.0,
+        due_date=linha["due_date"],
+        amount=linha["contract_size"],
+    )
+    try:
+        resp = bs_greeks(**params, timeout=3)
+        d = resp.get("delta")
+        return (float(d) if d is not None else None), "API"
+    except:
+        return None, "MISS"
+
+
+def _aplicar_spot(bases, spot, usar_api=True) -> List[Dict[str, Any]]:
+    """
+    Linhas completas a partir das bases (_base_par) e do spot, numa passada
+    vetorizada sobre todos os pares: spot, BE% e deltas (BS local, r=0).
+    Pernas sem BS local (IV ou prazo zerados) vão à API da OPLAB se
+    `usar_api`. As probabilidades ficam para enriquecer_probabilidades.
+    """
+    import numpy as np
+    from scipy.special import ndtr
+
+    if not bases:
+        return []
+
+    spot_r = round(spot, 2)
+    linhas = [dict(b) for b, _ in bases]
+    n = len(linhas)
+
+    # pernas: [calls..., puts...]
+    K = np.array([pn[0][0] for _, pn in bases] + [pn[1][0] for _, pn in bases])
+    vol = np.array([pn[0][1] for _, pn in bases] + [pn[1][1] for _, pn in bases])
+    dias = np.array([l["days_to_maturity"] for l in linhas] * 2, dtype=float)
+
+    ok = (spot_r > 0) & (K > 0) & (vol > 0) & (dias > 0)
+    t = np.where(ok, dias, 1.0) / 252
+    sig = np.where(ok, vol, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = (np.log(spot_r / np.where(ok, K, 1.0)) + 0.5 * sig * sig * t) / (sig * np.sqrt(t))
+    nd1 = ndtr(d1)
+    delta = np.concatenate([nd1[:n], nd1[n:] - 1.0])
+
+    be = np.array([[l["be_down"], l["be_up"]] for l in linhas], dtype=float)
+    be_pct = ((be / spot_r) - 1.0) * 100.0 if spot_r > 0 else None
+
+    faltando = []
+    for i, l in enumerate(linhas):
+        l["spot"] = spot_r
+        l["be_pct_down"] = round(float(be_pct[i, 0]), 2) if be_pct is not None else None
+        l["be_pct_up"] = round(float(be_pct[i, 1]), 2) if be_pct is not None else None
+        for j, (campo, src) in ((i, ("call_delta", "src_call")), (n + i, ("put_delta", "src_put"))):
+            if ok[j]:
+                l[campo], l[src] = round(float(delta[j]), 4), "LOCAL"
+            elif usar_api:
+                faltando.append((l, j < n, campo, src, bases[i][1][0 if j < n else 1]))
+            else:
+                l[campo], l[src] = None, "MISS"
+
+    if faltando:
+        with cf.ThreadPoolExecutor(max_workers=min(8, len(faltando))) as ex:
+            res = ex.map(lambda f: _delta_api(f[0], f[1], f[4][0], f[4][1], f[4][2], spot_r), faltando)
+            for (l, _, campo, src, _), (d, origem) in zip(faltando, res):
+                l[campo] = None if d is None else round(d, 4)
+                l[src] = origem
+
+    return linhas
+
+
+def _pairs_for_due(scid, ticker, due_date, ops, spot, usar_api=True):
     t0 = time.perf_counter()
 
-    calls = [
-        o for o in ops
-        if o["due_date"].startswith(due_date)
-        and (o.get("category") or "").upper().startswith("CALL")
-    ]
-    puts = [
-        o for o in ops
-        if o["due_date"].startswith(due_date)
-        and (o.get("category") or "").upper().startswith("PUT")
-    ]
+    strikes = _indexar_pernas(ops, [due_date])[due_date]
+    bases = []
+    for k in _two_atm_strikes(list(strikes), spot):
+        cs, ps = strikes[k]
+        base = _base_par(due_date, k, cs, ps)
+        if base:
+            bases.append(base)
+    out = _aplicar_spot(bases, spot, usar_api)
 
-    strikes_call = {round(_f(o.get("strike")), 6) for o in calls}
-    strikes_put = {round(_f(o.get("strike")), 6) for o in puts}
-    strikes = sorted(strikes_call & strikes_put)
+    _log(scid, f"⏱ {ticker} {due_date} | linhas={len(out)} | {time.perf_counter() - t0:.3f}s")
+    return out
 
-    ks = _two_atm_strikes([float(k) for k in strikes], spot)
-    out = []
 
-    for k in ks:
-        cs = [o for o in calls if abs(_f(o.get("strike")) - k) < 1e-6]
-        ps = [o for o in puts if abs(_f(o.get("strike")) - k) < 1e-6]
+# ------------------------------------------------------------
+# Recálculo incremental
+# Guarda, por ticker, a última cadeia (por símbolo) e a base de cada par
+# ATM (_base_par: pernas, prêmios, BE, IV). Numa nova cadeia só refaz a
+# base dos pares cujas pernas mudaram (cotação, perna nova ou removida) ou
+# que entraram no conjunto ATM. O que depende do spot (delta, BE%,
+# probabilidades) é recalculado para todos numa passada vetorizada — o
+# spot muda a quase todo refresh no pregão e isso custa pouco.
+# ------------------------------------------------------------
+MAX_TICKERS_INCREMENTAL = 256
+_anterior: Dict[str, Dict[str, Any]] = {}
+_anterior_lock = threading.Lock()
 
-        c = _choose_leg(cs)
-        p = _choose_leg(ps)
-        if not c or not p:
-            continue
 
-        prem_c = float(_prem(c) or 0.0)
-        prem_p = float(_prem(p) or 0.0)
-        prem_total = prem_c + prem_p
-
-        dias = int(c.get("days_to_maturity") or p.get("days_to_maturity") or 0)
-        iv_c = _iv(c)
-        iv_p = _iv(p)
-        r = 0.0
-        amount = int((c.get("contract_size") or 100) or 100)
-        spot_r = round(spot, 2)
-
-        def _delta_leg(o, is_call, vol, premio):
-            d_local = _bs_delta_local(spot_r, float(o["strike"]), dias, vol, r, is_call)
-            if d_local is not None:
-                return d_local, "LOCAL"
-
-            params = dict(
-                symbol=o["symbol"],
-                kind="CALL" if is_call else "PUT",
-                spotprice=spot_r,
-                strike=float(o["strike"]),
-                premium=premio,
-                dtm=dias,
-                vol=vol,
-                irate=0.0,
-                due_date=due_date,
-                amount=amount,
-            )
-            try:
-                resp = bs_greeks(**params, timeout=3)
-                d = resp.get("delta")
-                return (float(d) if d is not None else None), "API"
-            except:
-                return None, "MISS"
-
-        with cf.ThreadPoolExecutor(max_workers=2) as ex:
-            f1 = ex.submit(_delta_leg, c, True, iv_c, prem_c)
-            f2 = ex.submit(_delta_leg, p, False, iv_p, prem_p)
-            d_call, src_c = f1.result()
-            d_put, src_p = f2.result()
-
-        be_down = round(k - prem_total, 2)
-        be_up = round(k + prem_total, 2)
-
-        be_pct_down = round(((be_down / spot_r) - 1.0) * 100.0, 2) if spot_r > 0 else None
-        be_pct_up = round(((be_up / spot_r) - 1.0) * 100.0, 2) if spot_r > 0 else None
-
-        out.append({
-            "bucket": "ATM",
-            "call": c["symbol"],
-            "put": p["symbol"],
-            "due_date": due_date,
-            "strike": float(k),
-            "spot": spot_r,
-            "days_to_maturity": dias,
-            "premium_total": round(prem_total, 4),
-            "call_premio": round(prem_c, 4),
-            "put_premio": round(prem_p, 4),
-            "be_down": be_down,
-            "be_up": be_up,
-            "be_pct_down": be_pct_down,
-            "be_pct_up": be_pct_up,
-            "contract_size": amount,
-            "call_delta": None if d_call is None else round(d_call, 4),
-            "put_delta": None if d_put is None else round(d_put, 4),
-            "src_call": src_c,
-            "src_put": src_p,
-        })
+def _linhas_incrementais(scid, ticker, hoje, dues, ops, spot) -> List[Dict[str, Any]]:
+    t0 = time.perf_counter()
+    pernas = {o.get("symbol"): o for o in ops if (o.get("due_date") or "")[:10] in dues}
+
+    with _anterior_lock:
+        prev = _anterior.get(ticker)
+    mesmo_dia = prev is not None and prev["hoje"] == hoje
+    prev_pernas = prev["pernas"] if mesmo_dia else {}
+    prev_pares = prev["pares"] if mesmo_dia else {}
+    mudou = {sym for sym, o in pernas.items() if prev_pernas.get(sym) != o}
+
+    idx = _indexar_pernas(pernas.values(), dues)
+    bases, pares, refeitas = [], {}, 0
+    for due in dues:
+        strikes = idx[due]
+        for k in _two_atm_strikes(list(strikes), spot):
+            cs, ps = strikes[k]
+            simbolos = frozenset(o.get("symbol") for o in cs + ps)
+            antigo = prev_pares.get((due, k))
+            if antigo is not None and antigo[0] == simbolos and not (simbolos & mudou):
+                base = antigo[1]
+            else:
+                base = _base_par(due, k, cs, ps)
+                refeitas += 1
+                if base is None:
+                    continue
+            pares[(due, k)] = (simbolos, base)
+            bases.append(base)
+
+    linhas = _aplicar_spot(bases, spot)
+    enriquecer_probabilidades(linhas)
+
+    with _anterior_lock:
+        _anterior.pop(ticker, None)
+        _anterior[ticker] = {"hoje": hoje, "pernas": pernas, "pares": pares}
+        while len(_anterior) > MAX_TICKERS_INCREMENTAL:
+            _anterior.pop(next(iter(_anterior)))
 
-    _log(scid, f"⏱ {ticker} {due_date} | linhas={len(out)} | {time.perf_counter() - t0:.3f}s")
-    return out
+    _log(
+        scid,
+        f"⏱ {ticker} incremental | pernas alteradas={len(mudou)}/{len(pernas)} | "
+        f"bases refeitas={refeitas}/{len(linhas)} | {time.perf_counter() - t0:.3f}s"
+    )
+    return linhas
+
+
+TZ_BRL = ZoneInfo("America/Sao_Paulo")
 
 
 def _today_brl():
-    return datetime.now(pytz.timezone("America/Sao_Paulo")).date()
+    return datetime.now(TZ_BRL).date()
+
+
+def _cadeia_replay(ticker: str, hoje: date, raiz=None):
+    """
+    Para datas passadas com cadeia gravada no chain_store (em `raiz`, ou
+    CHAIN_STORE_DIR), devolve (ops, spot) do disco — replay sem chamadas à
+    API. Senão, None.
+    """
+    if hoje >= _today_brl():
+        return None
+    try:
+        if chain_store.tem_cadeia(ticker, hoje, raiz):
+            return chain_store.carregar_cadeia(ticker, hoje, raiz)
+    except Exception:
+        return None
+    return None
 
 # ------------------------------------------------------------
 # Screener principal
 # ------------------------------------------------------------
 def screener_atm_dois_vencimentos(
     ticker: str,
-    hoje: Optional[date] = None
+    hoje: Optional[date] = None,
+    *,
+    raiz: Optional[str] = None,
+    verbose: bool = True,
 ) -> Dict[str, List[Dict[str, Any]]]:
-
-    scid = f"SC-{uuid.uuid4().hex[:6]}"
+    """
+    `raiz`: chain_store do replay (padrão CHAIN_STORE_DIR); `verbose=False`
+    desliga os logs da chamada.
+    """
+    scid = f"SC-{uuid.uuid4().hex[:6]}" if verbose else None
     t0 = time.perf_counter()
     #hoje = hoje or date.today()
     hoje = hoje or _today_brl()
 
     _log(scid, f"▶ START screener_atm_dois_vencimentos ticker={ticker}")
 
-    ops = buscar_opcoes_ativo(ticker)
-    if not ops:
-        return {"atm": [], "due_dates": []}
-
-    dues = _next_two_official_dues(hoje, ops)
-
-    v1 = dues[0] if len(dues) > 0 else ""
-    v2 = dues[1] if len(dues) > 1 else ""
-
-    spot_oficial = float(get_spot_ativo_oficial(ticker) or 0.0)
-    spot = spot_oficial if spot_oficial > 0 else _spot_from_ops(ops)
-
-    cache_key = screener_cache_key(
-        ticker,
-        v1,
-        v2,
-        "VENC",
-        round(spot_oficial, 2),
-    )
-
-
+    replay = _cadeia_replay(ticker, hoje, raiz)
+    if replay is not None:
+        # Replay histórico: cadeia e spot do chain_store, sem API e sem cache
+        ops, spot_oficial = replay
+        _log(scid, f"⏪ REPLAY chain_store {ticker} {hoje} | linhas={len(ops)}")
+        if not ops:
+            return {"atm": [], "due_dates": []}
+
+        dues = _next_two_official_dues(hoje, ops)
+        spot = spot_oficial if spot_oficial > 0 else _spot_from_ops(ops)
+
+        linhas = []
+        for d in dues:
+            linhas.extend(_pairs_for_due(scid, ticker, d, ops, spot, usar_api=False))
+        linhas.sort(key=lambda r: (r["due_date"], abs(_f(r["strike"]) - spot)))
+        enriquecer_probabilidades(linhas)
+
+        _log(
+            scid,
+            f"✔ END screener (replay) ticker={ticker} | linhas={len(linhas)} | {time.perf_counter() - t0:.3f}s"
+        )
+        return {"atm": linhas, "due_dates": dues}
+
+    # Cache versionado: a entrada guarda o resultado + a versão dos dados
+    # (maior `time` da cadeia) + a sonda do ativo (cotação do spot).
+    # - fresca (dentro do TTL): devolve direto
+    # - vencida: sonda barata; se a cotação do ativo não mudou, reaproveita
+    # - sonda mudou: busca a cadeia; se a versão e o spot forem os mesmos,
+    #   reaproveita; com a mesma versão e outro spot, o incremental só refaz
+    #   strikes ATM, deltas e probabilidades (bases dos pares reaproveitadas)
+    cache_key = screener_cache_key(ticker, hoje, "VENC")
     cached = cache.get(cache_key)
-    if cached is not None:
-        _log(scid, f"♻ CACHE HIT screener {ticker} {v1} {v2}")
-        return cached
-
-    spot_oficial = float(get_spot_ativo_oficial(ticker) or 0.0)
-    spot = spot_oficial if spot_oficial > 0 else _spot_from_ops(ops)
+    agora = time.time()
+
+    if cached is not None and agora < cached["fresco_ate"]:
+        _log(scid, f"♻ CACHE HIT screener {ticker} v={cached['versao']}")
+        return cached["resultado"]
+
+    cot = cotacao_ativo_oficial(ticker) or {}
+    sonda = cot.get("versao")
+
+    if cached is not None and sonda is not None and sonda == cached["sonda"]:
+        _log(scid, f"♻ REVALIDADO (sonda) screener {ticker} v={cached['versao']}")
+        return _guardar_versionado(cache_key, cached, sonda, agora)
+
+    # cadeia compartilhada entre os workers do host (services.chain_shared);
+    # mesma versão da cadeia e mesmo spot do resultado em cache → não recalcula
+    snap = snapshot_cadeia(ticker)
+    versao = snap.versao
+    spot_oficial = float(cot.get("preco") or 0.0)
+    mesma_cadeia = cached is not None and bool(versao) and versao == cached["versao"]
+    if mesma_cadeia and spot_oficial > 0 and round(spot_oficial, 2) == cached.get("spot"):
+        _log(scid, f"♻ REVALIDADO (cadeia) screener {ticker} v={versao}")
+        return _guardar_versionado(cache_key, cached, sonda, agora)
+
+    vencimentos = snap.vencimentos()
+    if not vencimentos:
+        return {"atm": [], "due_dates": []}
 
-    _log(scid, f"💰 SPOT={spot} (oficial) | vencimentos={dues}")
+    dues = _next_two_official_dues(hoje, vencimentos)
+    spot = spot_oficial if spot_oficial > 0 else _spot_from_ops(snap.linhas())
+    # só as linhas dos dois vencimentos (snapshot compartilhado: colunas → dicts)
+    ops = snap.linhas(dues)
 
-    linhas = []
-    for d in dues:
-        linhas.extend(_pairs_for_due(scid, ticker, d, ops, spot))
+    if mesma_cadeia:
+        # só o spot mudou: as bases dos pares vêm do incremental, refaz
+        # strikes ATM, deltas e probabilidades
+        _log(scid, f"♻ SPOT MUDOU screener {ticker} v={versao} | {cached.get('spot')} → {spot}")
+    _log(scid, f"💰 SPOT={spot} (oficial) | vencimentos={dues} | v={versao}")
 
+    linhas = _linhas_incrementais(scid, ticker, hoje, dues, ops, spot)
     linhas.sort(key=lambda r: (r["due_date"], abs(_f(r["strike"]) - spot)))
 
     _log(
@@ -311,7 +489,13 @@ def screener_atm_dois_vencimentos(
         f"✔ END screener ticker={ticker} | linhas={len(linhas)} | {time.perf_counter() - t0:.3f}s"
     )
 
-    result = {"atm": linhas, "due_dates": dues}
-    cache.set(cache_key, result, timeout=600)
+    result = {"atm": linhas, "due_dates": dues, "versao": versao}
+    entrada = {"resultado": result, "versao": versao, "spot": round(spot, 2)}
+    return _guardar_versionado(cache_key, entrada, sonda, agora)
+
 
-    return result
+def _guardar_versionado(cache_key: str, entrada: dict, sonda, agora: float):
+    """Regrava a entrada com a sonda atual e um novo prazo de frescor."""
+    entrada = dict(entrada, sonda=sonda, fresco_ate=agora + ttl("screener"))
+    cache_set(cache_key, entrada, timeout=retencao("screener"))
+    return entrada["resultado"]
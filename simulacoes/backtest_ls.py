@@ -0,0 +1,302 @@
+# simulacoes/backtest_ls.py
+"""
+Backtest de entradas Long Straddle sobre as cadeias gravadas no chain_store.
+
+- Entrada: par ATM escolhido pelo screener (replay do pregão, sem API)
+- Filtro opcional por classificação de IV (Barato / Justo / Caro)
+- Saída: D+N pregões, vencimento ou alvo de P&L (o que vier primeiro)
+- Marcação: MID (ou close/last) de cada pregão, inclusive o da entrada —
+  o prêmio de entrada usa a mesma referência das saídas; o prêmio de
+  compra do screener (ask) só entra se o par não tiver cotação no dia
+
+O P&L de todas as entradas de um ticker é montado como matriz
+(entradas × pregões) e cada regra é avaliada de uma vez sobre ela.
+Tickers rodam em paralelo num pool de processos.
+"""
+import concurrent.futures as cf
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services import chain_store
+
+
+@dataclass(frozen=True)
+class RegraSaida:
+    nome: str
+    dias: Optional[int] = None          # D+N pregões (None = até o vencimento)
+    alvo_pct: Optional[float] = None    # ex.: 30.0 → sai com +30% sobre o prêmio
+    filtro_iv: Optional[tuple] = None   # ex.: ("Barato",) — None = sem filtro
+
+
+RESULTADO_DTYPE = np.dtype([
+    ("ticker", "U12"),
+    ("regra", "U32"),
+    ("entrada", "datetime64[D]"),
+    ("saida", "datetime64[D]"),
+    ("vencimento", "datetime64[D]"),
+    ("call", "U16"),
+    ("put", "U16"),
+    ("strike", "f8"),
+    ("premio", "f8"),
+    ("contract_size", "i4"),
+    ("classificacao_iv", "U12"),
+    ("dias", "i4"),
+    ("motivo", "U9"),           # ALVO | DN | VENC | SEM_DADOS
+    ("pnl_pct", "f8"),
+    ("pnl", "f8"),              # por contrato (prêmio × contract_size)
+])
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+def _preco_coluna(cols: dict) -> np.ndarray:
+    """Preço de referência por linha: MID se houver bid/ask, senão close/last."""
+    bid = np.asarray(cols["bid"])
+    ask = np.asarray(cols["ask"])
+    close = np.asarray(cols["close"])
+    last = np.asarray(cols["last"])
+    ref = np.where(close > 0, close, last)
+    return np.where((bid > 0) & (ask > 0), (bid + ask) / 2.0, ref)
+
+
+def _ffill_linhas(m: np.ndarray) -> np.ndarray:
+    """Forward-fill de NaN ao longo de cada linha (pregões sem cotação)."""
+    idx = np.where(np.isnan(m), 0, np.arange(m.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return m[np.arange(m.shape[0])[:, None], idx]
+
+
+def _entrada_screener(ticker: str, dia: date, raiz: Optional[str] = None):
+    from simulacoes.atm_screener import screener_atm_dois_vencimentos
+
+    # o screener loga cada chamada; no backtest isso vira ruído
+    res = screener_atm_dois_vencimentos(ticker, hoje=dia, raiz=raiz, verbose=False)
+    linhas = (res or {}).get("atm") or []
+    return linhas[0] if linhas else None
+
+
+# ------------------------------------------------------------
+# Núcleo por ticker (roda dentro do pool de processos)
+# ------------------------------------------------------------
+def backtest_ticker(
+    ticker: str,
+    datas_entrada: Sequence[date],
+    regras: Sequence[RegraSaida],
+    classificacao_iv: Optional[Dict[date, str]] = None,
+    raiz: Optional[str] = None,
+) -> np.ndarray:
+    ticker = ticker.upper().strip()
+    classificacao_iv = classificacao_iv or {}
+    pregoes = chain_store.datas_disponiveis(ticker, raiz)
+    if not pregoes:
+        return np.zeros(0, dtype=RESULTADO_DTYPE)
+    pos = {d: i for i, d in enumerate(pregoes)}
+
+    # 1) entradas (pick ATM do screener)
+    entradas = []
+    for d in datas_entrada:
+        if d not in pos:
+            continue
+        row = _entrada_screener(ticker, d, raiz)
+        if not row:
+            continue
+        premio = float(row.get("premium_total") or 0.0)
+        if premio <= 0:
+            continue
+        entradas.append({
+            "data": d,
+            "j0": pos[d],
+            "call": row["call"],
+            "put": row["put"],
+            "strike": float(row["strike"]),
+            "due": date.fromisoformat(row["due_date"][:10]),
+            "premio": premio,
+            "contract_size": int(row.get("contract_size") or 100),
+            "iv": classificacao_iv.get(d, "Indisponível"),
+        })
+
+    if not entradas:
+        return np.zeros(0, dtype=RESULTADO_DTYPE)
+
+    # 2) matriz de preços (símbolo × pregão) lendo cada partição uma vez
+    simbolos = sorted({e["call"] for e in entradas} | {e["put"] for e in entradas})
+    sym_idx = {s: i for i, s in enumerate(simbolos)}
+    sym_arr = np.array(simbolos)
+
+    j_min = min(e["j0"] for e in entradas)
+    due_max = max(e["due"] for e in entradas)
+    j_max = max(i for i, d in enumerate(pregoes) if d <= due_max)
+
+    n_sess = j_max + 1
+    precos = np.full((len(simbolos), n_sess), np.nan)
+    spots = np.full(n_sess, np.nan)
+
+    for j in range(j_min, n_sess):
+        cols = chain_store.carregar_colunas(ticker, pregoes[j], raiz)
+        spots[j] = chain_store.carregar_meta(ticker, pregoes[j], raiz).get("spot") or np.nan
+        syms = np.asarray(cols["symbol"])
+        if not len(syms):
+            continue
+        hit = np.nonzero(np.isin(syms, sym_arr))[0]
+        if not len(hit):
+            continue
+        px = _preco_coluna(cols)[hit]
+        for s, v in zip(syms[hit].tolist(), px.tolist()):
+            if v > 0:
+                precos[sym_idx[s], j] = v
+
+    # 3) matriz de P&L % (entradas × horizonte), NaN após o fim de cada trade
+    fins = []
+    for e in entradas:
+        j_fim = max(i for i in range(e["j0"], n_sess) if pregoes[i] <= e["due"])
+        fins.append(j_fim - e["j0"])
+    horizonte = max(fins) + 1
+
+    n = len(entradas)
+    valor = np.full((n, horizonte), np.nan)
+    for i, e in enumerate(entradas):
+        j0 = e["j0"]
+        j1 = j0 + fins[i] + 1
+        valor[i, :fins[i] + 1] = (
+            precos[sym_idx[e["call"]], j0:j1] + precos[sym_idx[e["put"]], j0:j1]
+        )
+        # entrada na mesma referência das saídas (senão o spread vira P&L do D+1)
+        if np.isnan(valor[i, 0]):
+            valor[i, 0] = e["premio"]
+        e["premio"] = float(valor[i, 0])
+        # no pregão do vencimento vale o intrínseco
+        if pregoes[j1 - 1] == e["due"] and not np.isnan(spots[j1 - 1]):
+            valor[i, fins[i]] = abs(spots[j1 - 1] - e["strike"])
+
+    valor = _ffill_linhas(valor)
+    premios = np.array([e["premio"] for e in entradas])
+    pnl_pct = (valor / premios[:, None] - 1.0) * 100.0
+
+    fim = np.array(fins)
+    venceu = np.array([
+        pregoes[e["j0"] + fins[i]] == e["due"] for i, e in enumerate(entradas)
+    ])
+    classif = np.array([e["iv"] for e in entradas])
+    col = np.arange(horizonte)[None, :]
+
+    # 4) regras (vetorizado sobre todas as entradas)
+    saidas = []
+    for regra in regras:
+        limite = fim if regra.dias is None else np.minimum(fim, regra.dias)
+        validos = (col >= 1) & (col <= limite[:, None])
+
+        if regra.alvo_pct is not None:
+            atingiu = validos & (pnl_pct >= regra.alvo_pct)
+            tem_alvo = atingiu.any(axis=1)
+            idx = np.where(tem_alvo, atingiu.argmax(axis=1), limite)
+        else:
+            tem_alvo = np.zeros(n, dtype=bool)
+            idx = limite
+
+        no_limite_dn = (idx == regra.dias) if regra.dias is not None else np.zeros(n, dtype=bool)
+        motivo = np.select(
+            [tem_alvo, idx < fim, venceu, no_limite_dn],
+            ["ALVO", "DN", "VENC", "DN"],
+            default="SEM_DADOS",
+        )
+
+        sel = np.ones(n, dtype=bool)
+        if regra.filtro_iv:
+            sel = np.isin(classif, list(regra.filtro_iv))
+
+        pnl_saida = pnl_pct[np.arange(n), idx]
+        for i in np.nonzero(sel)[0]:
+            e = entradas[i]
+            saidas.append((
+                ticker,
+                regra.nome,
+                e["data"],
+                pregoes[e["j0"] + int(idx[i])],
+                e["due"],
+                e["call"],
+                e["put"],
+                e["strike"],
+                e["premio"],
+                e["contract_size"],
+                e["iv"],
+                int(idx[i]),
+                motivo[i],
+                float(pnl_saida[i]),
+                float(pnl_saida[i]) / 100.0 * e["premio"] * e["contract_size"],
+            ))
+
+    return np.array(saidas, dtype=RESULTADO_DTYPE)
+
+
+# ------------------------------------------------------------
+# Orquestração
+# ------------------------------------------------------------
+def rodar_backtest(
+    tickers: List[str],
+    date_from: date,
+    date_to: date,
+    regras: Sequence[RegraSaida],
+    *,
+    classificacao_iv: Optional[Dict[str, Dict[date, str]]] = None,
+    passo: int = 1,
+    workers: Optional[int] = None,
+    raiz: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Roda o backtest para cada (ticker, pregão de entrada, regra).
+
+    - Entradas: pregões com cadeia gravada em [date_from, date_to], a cada `passo`
+    - `classificacao_iv`: {ticker: {data: "Barato"|"Justo"|"Caro"}} (ver
+      classificar_iv_historica); sem ela os filtros de IV não selecionam nada
+    - Retorna um array estruturado (RESULTADO_DTYPE), uma linha por combinação
+    """
+    classificacao_iv = classificacao_iv or {}
+    passo = max(1, int(passo))
+
+    tarefas = []
+    for t in tickers:
+        t = t.upper().strip()
+        datas = [
+            d for d in chain_store.datas_disponiveis(t, raiz)
+            if date_from <= d <= date_to
+        ][::passo]
+        if datas:
+            tarefas.append((t, datas, tuple(regras), classificacao_iv.get(t), raiz))
+
+    if not tarefas:
+        return np.zeros(0, dtype=RESULTADO_DTYPE)
+
+    if workers == 1 or len(tarefas) == 1:
+        partes = [backtest_ticker(*args) for args in tarefas]
+    else:
+        with cf.ProcessPoolExecutor(max_workers=workers) as ex:
+            partes = list(ex.map(backtest_ticker, *zip(*tarefas)))
+
+    partes = [p for p in partes if len(p)]
+    if not partes:
+        return np.zeros(0, dtype=RESULTADO_DTYPE)
+    return np.concatenate(partes)
+
+
+def resumo_por_regra(tabela: np.ndarray) -> List[Dict]:
+    """
+    Agrega a tabela por regra: nº de trades, % vencedores, P&L% médio/mediano.
+    """
+    out = []
+    for regra in dict.fromkeys(tabela["regra"].tolist()):
+        t = tabela[tabela["regra"] == regra]
+        pnl = t["pnl_pct"]
+        out.append({
+            "regra": regra,
+            "trades": int(len(t)),
+            "acerto_pct": float((pnl > 0).mean() * 100.0) if len(t) else 0.0,
+            "pnl_pct_medio": float(pnl.mean()) if len(t) else 0.0,
+            "pnl_pct_mediano": float(np.median(pnl)) if len(t) else 0.0,
+            "pnl_total": float(t["pnl"].sum()),
+            "dias_medio": float(t["dias"].mean()) if len(t) else 0.0,
+        })
+    return out
@@ -4,8 +4,8 @@ from typing import List, Dict, Any, Protocol
 @dataclass
 class OptionLeg:
     symbol: str
-    type: str        # "CALL" | "PUT"
-    strike: float
+    type: str        # "CALL" | "PUT" | "STOCK"
+    strike: float    # STOCK: preço de entrada da ação
     bid: float = 0.0
     ask: float = 0.0
     close: float = 0.0
@@ -13,6 +13,10 @@ class OptionLeg:
     contract_size: int = 100
     spot_price: float = 0.0
     due_date: str = ""
+    quantity: int = 1            # > 0 compra, < 0 venda (em lotes de contract_size)
+    iv: float = 0.0              # decimal (0.32 = 32% a.a.)
+    days_to_maturity: int = 0
+    premium: float | None = None # preço de entrada explícito (senão bid/ask/last/close)
 
 @dataclass
 class SimulationResult:
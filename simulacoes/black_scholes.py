@@ -1,6 +1,8 @@
 # simulacoes/black_scholes.py
 import math
 
+import numpy as np
+
 SQRT_2PI = math.sqrt(2.0 * math.pi)
 
 def _N(x: float) -> float:
@@ -72,3 +74,57 @@ def implied_vol(target_price, S, K, r, q, T, kind, tol=1e-6, max_iter=100):
         else:
             low = mid; f_low = fm
     return (low + high) / 2
+
+
+# ------------------------------------------------------------
+# Versão vetorizada (NumPy) — S, K, sigma, T e kind em arrays
+# ------------------------------------------------------------
+def black_scholes_np(S, K, r, q, sigma, T, is_call):
+    """
+    Black-Scholes sobre arrays com broadcasting (mesmas fórmulas de black_scholes).
+    `is_call` é booleano (escalar ou array). Onde T <= 0 ou sigma <= 0 o preço
+    é o valor intrínseco e delta é 1/0/-1 — útil para pernas já vencidas.
+    Retorna {"preco", "delta", "gamma", "vega", "theta_ano"} como arrays.
+    """
+    from scipy.special import ndtr
+
+    S = np.asarray(S, dtype=float)
+    K = np.asarray(K, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    T = np.asarray(T, dtype=float)
+    is_call = np.asarray(is_call, dtype=bool)
+
+    vivo = (S > 0) & (K > 0) & (sigma > 0) & (T > 0)
+    sig = np.where(vivo, sigma, 1.0)
+    tt = np.where(vivo, T, 1.0)
+    ss = np.where(S > 0, S, 1.0)
+    kk = np.where(K > 0, K, 1.0)
+
+    raiz_t = np.sqrt(tt)
+    d1 = (np.log(ss / kk) + (r - q + 0.5 * sig * sig) * tt) / (sig * raiz_t)
+    d2 = d1 - sig * raiz_t
+    disc_r = np.exp(-r * tt)
+    disc_q = np.exp(-q * tt)
+    n_d1 = np.exp(-0.5 * d1 * d1) / SQRT_2PI
+
+    sinal = np.where(is_call, 1.0, -1.0)
+    preco = sinal * (ss * disc_q * ndtr(sinal * d1) - kk * disc_r * ndtr(sinal * d2))
+    delta = sinal * disc_q * ndtr(sinal * d1)
+    gamma = disc_q * n_d1 / (ss * sig * raiz_t)
+    vega = ss * disc_q * n_d1 * raiz_t
+    theta_ano = (
+        -(ss * disc_q * n_d1 * sig) / (2.0 * raiz_t)
+        - sinal * r * kk * disc_r * ndtr(sinal * d2)
+        + sinal * q * ss * disc_q * ndtr(sinal * d1)
+    )
+
+    intrinseco = np.maximum(sinal * (S - K), 0.0)
+    delta_venc = np.where(sinal * (S - K) > 0, sinal, 0.0)
+    zero = np.zeros_like(preco)
+    return {
+        "preco": np.where(vivo, preco, intrinseco),
+        "delta": np.where(vivo, delta, delta_venc),
+        "gamma": np.where(vivo, gamma, zero),
+        "vega": np.where(vivo, vega, zero),
+        "theta_ano": np.where(vivo, theta_ano, zero),
+    }
@@ -0,0 +1,295 @@
+# simulacoes/cenarios.py
+"""
+Superfície teórica de P&L (marcação a modelo) em spot × dias × choque de IV.
+
+Uma única avaliação Black-Scholes vetorizada cobre a grade inteira
+(spots × dias × choques × pernas). O resultado é um array compacto
+(float32) com helpers de fatiamento:
+
+- curva_em(dias, choque_iv): P&L por spot no D+k (interpolado)
+- break_evens_em(dias, choque_iv): spots de break-even no D+k
+- iv_break_even(dias, spot): choque de IV que zera o P&L naquele ponto
+
+Choques de IV são relativos: -0.30 = crush de 30% (σ × 0,70), como o
+campo crush_iv do Long Straddle.
+"""
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from simulacoes.base import OptionLeg
+from simulacoes.black_scholes import black_scholes_np, implied_vol
+from simulacoes.estrategias import (
+    DIAS_ANO,
+    TIPO_CALL,
+    TIPO_STOCK,
+    _vetores,
+    break_evens_malha,
+    horizonte_dias,
+    malha_precos,
+    perna_de_dict,
+    preco_entrada,
+)
+
+CHOQUES_IV_PADRAO = np.round(np.linspace(-0.5, 0.5, 11), 2)
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+def _pesos_interp(eixo: np.ndarray, x: float):
+    """Índices vizinhos e peso para interpolação linear (satura nas bordas)."""
+    if len(eixo) == 1 or x <= eixo[0]:
+        return 0, 0, 0.0
+    if x >= eixo[-1]:
+        n = len(eixo) - 1
+        return n, n, 0.0
+    j = int(np.searchsorted(eixo, x, side="right"))
+    i = j - 1
+    w = (x - eixo[i]) / (eixo[j] - eixo[i])
+    return i, j, float(w)
+
+
+def _interp(arr: np.ndarray, eixo: np.ndarray, x: float, axis: int) -> np.ndarray:
+    i, j, w = _pesos_interp(eixo, x)
+    a = np.take(arr, i, axis=axis).astype(float)
+    if w == 0.0:
+        return a
+    b = np.take(arr, j, axis=axis).astype(float)
+    return a + (b - a) * w
+
+
+def completar_iv(legs: Sequence[OptionLeg], spot: float, r: float = 0.0) -> List[OptionLeg]:
+    """
+    Pernas sem IV recebem a IV implícita do próprio preço de entrada
+    (mesma inversão usada no D+1 das views). T mínimo de 1 dia útil.
+    """
+    out = []
+    for l in legs:
+        if l.iv > 0 or (l.type or "").upper() == "STOCK":
+            out.append(l)
+            continue
+        T = max(1, l.days_to_maturity) / DIAS_ANO
+        iv = implied_vol(preco_entrada(l), spot, l.strike, r, 0.0, T, l.type.upper())
+        out.append(replace(l, iv=max(1e-4, iv or 1e-4)))
+    return out
+
+
+# ------------------------------------------------------------
+# Superfície
+# ------------------------------------------------------------
+@dataclass
+class SuperficiePnL:
+    spots: np.ndarray        # (n_s,)
+    dias: np.ndarray         # (n_d,) dias úteis à frente
+    choques_iv: np.ndarray   # (n_v,) relativo (-0.3 = crush 30%)
+    pnl: np.ndarray          # (n_s, n_d, n_v) float32, R$ da estrutura inteira
+    custo_total: float       # débito (>0) / crédito (<0) na montagem
+    iv_ref: float            # IV média das pernas (decimal), base dos choques
+
+    def curva_em(self, dias: float, choque_iv: float = 0.0) -> np.ndarray:
+        """P&L por spot no D+`dias` com o choque dado (interpolado nos dois eixos)."""
+        por_dia = _interp(self.pnl, self.dias, dias, axis=1)           # (n_s, n_v)
+        return _interp(por_dia, self.choques_iv, choque_iv, axis=1)    # (n_s,)
+
+    def break_evens_em(self, dias: float, choque_iv: float = 0.0) -> List[float]:
+        return break_evens_malha(self.spots, self.curva_em(dias, choque_iv))
+
+    def pnl_em(self, spot: float, dias: float, choque_iv: float = 0.0) -> float:
+        curva = self.curva_em(dias, choque_iv)
+        return float(np.interp(spot, self.spots, curva))
+
+    def curva_iv(self, dias: float, spot: float) -> np.ndarray:
+        """P&L por choque de IV num (spot, D+k) fixo."""
+        por_dia = _interp(self.pnl, self.dias, dias, axis=1)   # (n_s, n_v)
+        return _interp(por_dia, self.spots, spot, axis=0)       # (n_v,)
+
+    def iv_break_even(self, dias: float, spot: float) -> Optional[float]:
+        """
+        Menor choque de IV que zera o P&L em (spot, D+k), ou None se o P&L
+        não troca de sinal dentro da grade. IV absoluta = iv_ref × (1 + choque).
+        """
+        y = self.curva_iv(dias, spot)
+        x = self.choques_iv
+        if y[0] == 0.0:
+            return float(x[0])
+        i = np.nonzero(y[:-1] * y[1:] <= 0)[0]
+        if not len(i):
+            return None
+        i = int(i[0])
+        if y[i + 1] == y[i]:
+            return float(x[i])
+        return float(x[i] - y[i] * (x[i + 1] - x[i]) / (y[i + 1] - y[i]))
+
+    def para_dict(self) -> Dict[str, Any]:
+        """Formato JSON (listas) para views/templates."""
+        return {
+            "spots": self.spots.tolist(),
+            "dias": self.dias.tolist(),
+            "choques_iv": self.choques_iv.tolist(),
+            "pnl": np.round(self.pnl, 2).tolist(),
+            "custo_total": self.custo_total,
+            "iv_ref": self.iv_ref,
+        }
+
+
+def superficie_pnl(
+    legs: Sequence[OptionLeg],
+    *,
+    spot: Optional[float] = None,
+    spots=None,
+    dias=None,
+    choques_iv=None,
+    r: float = 0.0,
+) -> SuperficiePnL:
+    """
+    P&L teórico das pernas em cada (spot, D+k, choque de IV).
+
+    - spots: padrão 61 pontos em ±20% do spot
+    - dias: padrão 0..primeiro vencimento (dias úteis)
+    - choques_iv: padrão -50%..+50% em passos de 10pp
+    Pernas sem IV usam a implícita do preço de entrada.
+    """
+    legs = list(legs)
+    if not legs:
+        raise ValueError("Estratégia sem pernas.")
+    if spot is None:
+        spot = next((l.spot_price for l in legs if l.spot_price > 0), 0.0)
+
+    legs = completar_iv(legs, spot, r)
+
+    spots = malha_precos(spot, n_pontos=61, largura=0.2) if spots is None else np.asarray(spots, float)
+    if dias is None:
+        dias = np.arange(0, max(1, horizonte_dias(legs)) + 1)
+    dias = np.asarray(dias, dtype=float)
+    choques = CHOQUES_IV_PADRAO if choques_iv is None else np.asarray(choques_iv, float)
+
+    tipo, strike, peso, entrada, dtm, iv = _vetores(legs)
+
+    # eixos: (spot, dia, choque, perna)
+    S = spots[:, None, None, None]
+    T = np.maximum(dtm[None, None, None, :] - dias[None, :, None, None], 0.0) / DIAS_ANO
+    sigma = np.maximum(iv * (1.0 + choques[None, None, :, None]), 1e-4)
+
+    valor = black_scholes_np(S, strike, r, 0.0, sigma, T, tipo == TIPO_CALL)["preco"]
+    valor = np.where(tipo == TIPO_STOCK, S, valor)
+    pnl = ((valor - entrada) * peso).sum(axis=-1)
+
+    opcoes = [l.iv for l in legs if (l.type or "").upper() != "STOCK"]
+    return SuperficiePnL(
+        spots=spots,
+        dias=dias,
+        choques_iv=choques,
+        pnl=pnl.astype(np.float32),
+        custo_total=float((peso * entrada).sum()),
+        iv_ref=float(np.mean(opcoes)) if opcoes else 0.0,
+    )
+
+
+def superficie_straddle(
+    dados_call: Dict[str, Any],
+    dados_put: Dict[str, Any],
+    *,
+    spot: Optional[float] = None,
+    qty_call: int = 1,
+    qty_put: int = 1,
+    r: float = 0.0,
+    **kwargs,
+) -> SuperficiePnL:
+    """
+    Atalho para o Long Straddle/Strangle a partir das linhas da OPLAB
+    (buscar_detalhes_opcao). Prêmio de entrada = MID quando houver bid/ask,
+    como no D+1 das views; IV implícita desse prêmio.
+    """
+    pernas = []
+    for d, tipo, q in ((dados_call, "CALL", qty_call), (dados_put, "PUT", qty_put)):
+        leg = perna_de_dict(d, quantity=q, tipo=tipo)
+        if leg.bid > 0 and leg.ask > 0:
+            leg.premium = (leg.bid + leg.ask) / 2.0
+        leg.iv = 0.0  # recalcula pelo prêmio de entrada (coerente com o P&L zero em D+0)
+        pernas.append(leg)
+
+    if spot is None:
+        spot = next((l.spot_price for l in pernas if l.spot_price > 0), 0.0)
+    return superficie_pnl(pernas, spot=spot, r=r, **kwargs)
+
+
+# ------------------------------------------------------------
+# Matriz de crush (D+1) — preços/deltas por nível de crush
+# ------------------------------------------------------------
+CRUSH_NIVEIS = np.arange(0.0, 50.0 + 1e-9, 5.0)  # % de redução da IV
+
+
+@dataclass
+class MatrizCrush:
+    """
+    Cenário D+1 de um par CALL/PUT pré-calculado para os níveis de crush
+    padrão. `em(crush)` interpola entre os níveis; fora da faixa recalcula
+    o BS exato com os mesmos insumos (sem API).
+    """
+    spot: float
+    strikes: np.ndarray      # (2,) call, put
+    T1: np.ndarray           # (2,) anos até o vencimento no D+1
+    iv_mkt: np.ndarray       # (2,) IV de mercado (decimal)
+    r: float
+    niveis: np.ndarray       # (n,) crush em %
+    precos: np.ndarray       # (n, 2)
+    deltas: np.ndarray       # (n, 2)
+
+    def _bs(self, niveis) -> Dict[str, np.ndarray]:
+        f = np.maximum(0.0, 1.0 - np.asarray(niveis, dtype=float)[:, None] / 100.0)
+        sigma = np.maximum(1e-4, self.iv_mkt[None, :] * f)
+        return black_scholes_np(
+            self.spot, self.strikes[None, :], self.r, 0.0, sigma, self.T1[None, :],
+            np.array([True, False])[None, :],
+        )
+
+    def em(self, crush: float) -> Dict[str, float]:
+        crush = float(crush)
+        if self.niveis[0] <= crush <= self.niveis[-1]:
+            px = [np.interp(crush, self.niveis, self.precos[:, i]) for i in (0, 1)]
+            dl = [np.interp(crush, self.niveis, self.deltas[:, i]) for i in (0, 1)]
+        else:
+            bs = self._bs([crush])
+            px, dl = bs["preco"][0], bs["delta"][0]
+        return {
+            "call_iv": float(self.iv_mkt[0]),
+            "put_iv": float(self.iv_mkt[1]),
+            "call_preco": float(px[0]),
+            "put_preco": float(px[1]),
+            "call_delta": float(dl[0]),
+            "put_delta": float(dl[1]),
+        }
+
+
+def matriz_crush(
+    spot: float,
+    strike_call: float,
+    strike_put: float,
+    T_call: float,
+    T_put: float,
+    iv_call: float,
+    iv_put: float,
+    *,
+    r: float = 0.0,
+    niveis=None,
+) -> MatrizCrush:
+    """
+    Preços e deltas BS no D+1 (T - 1/252) para cada nível de crush, nas duas
+    pernas de uma vez. IVs de mercado já invertidas pelo chamador.
+    """
+    m = MatrizCrush(
+        spot=float(spot),
+        strikes=np.array([strike_call, strike_put], dtype=float),
+        T1=np.maximum(np.array([T_call, T_put], dtype=float) - 1 / DIAS_ANO, 1e-6),
+        iv_mkt=np.array([iv_call, iv_put], dtype=float),
+        r=float(r),
+        niveis=CRUSH_NIVEIS if niveis is None else np.asarray(niveis, dtype=float),
+        precos=np.zeros(0),
+        deltas=np.zeros(0),
+    )
+    bs = m._bs(m.niveis)
+    m.precos = bs["preco"]
+    m.deltas = bs["delta"]
+    return m
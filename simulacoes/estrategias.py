@@ -0,0 +1,383 @@
+# simulacoes/estrategias.py
+"""
+Motor genérico de estratégias com opções (implementa simulacoes.base.Strategy).
+
+- Qualquer lista de pernas: compra ou venda, qualquer quantidade, ação inclusive
+- Payoff de todas as pernas calculado de uma vez sobre a malha de preços (NumPy)
+- Pernas que vencem depois do horizonte (ex.: calendário) são marcadas a
+  mercado por Black-Scholes com a IV da própria perna
+- Quando todas as opções vencem juntas o payoff é linear por partes:
+  break-evens e lucro/prejuízo máximos saem exatos avaliando só os strikes
+"""
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from simulacoes.base import OptionLeg, SimulationResult
+from simulacoes.black_scholes import black_scholes_np
+
+DIAS_ANO = 252.0  # base B3 (dias úteis), como no restante do simulador
+
+TIPO_CALL, TIPO_PUT, TIPO_STOCK = 0, 1, 2
+_TIPOS = {"CALL": TIPO_CALL, "PUT": TIPO_PUT, "STOCK": TIPO_STOCK}
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+def _f(v, default: float = 0.0) -> float:
+    try:
+        return float(v) if v is not None else default
+    except (ValueError, TypeError):
+        return default
+
+
+def _tipo(leg: OptionLeg) -> int:
+    t = (leg.type or "").upper()
+    if t not in _TIPOS:
+        raise ValueError(f"Tipo de perna inválido: {leg.type!r} (use CALL, PUT ou STOCK)")
+    return _TIPOS[t]
+
+
+def preco_entrada(leg: OptionLeg) -> float:
+    """
+    Preço por unidade pago (compra) ou recebido (venda).
+    Compra: ask → last → close → bid. Venda: bid → last → close → ask.
+    STOCK: o próprio `strike` (preço de entrada da ação).
+    """
+    if leg.premium is not None:
+        return float(leg.premium)
+    if _tipo(leg) == TIPO_STOCK:
+        return float(leg.strike)
+
+    if leg.quantity >= 0:
+        ordem = (leg.ask, leg.last, leg.close, leg.bid)
+    else:
+        ordem = (leg.bid, leg.last, leg.close, leg.ask)
+    for v in ordem:
+        if _f(v) > 0:
+            return _f(v)
+    return 0.0
+
+
+def perna_de_dict(d: Dict[str, Any], quantity: int = 1, tipo: Optional[str] = None) -> OptionLeg:
+    """
+    OptionLeg a partir de uma linha da OPLAB (buscar_detalhes_opcao, screener, chain_store).
+    IV em % (32.5) é convertida para decimal (0.325).
+    """
+    cat = (tipo or d.get("category") or d.get("type") or "").upper()
+    if cat.startswith("CALL"):
+        cat = "CALL"
+    elif cat.startswith("PUT"):
+        cat = "PUT"
+    else:
+        cat = "STOCK"
+
+    iv = _f(d.get("iv") or d.get("volatility"))
+    strike = _f(d.get("strike"))
+    if cat == "STOCK" and strike <= 0:
+        strike = _f(d.get("spot_price") or d.get("close") or d.get("last"))
+
+    return OptionLeg(
+        symbol=str(d.get("symbol") or cat),
+        type=cat,
+        strike=strike,
+        bid=_f(d.get("bid")),
+        ask=_f(d.get("ask")),
+        close=_f(d.get("close")),
+        last=_f(d.get("last")),
+        contract_size=int(_f(d.get("contract_size"), 100) or 100),
+        spot_price=_f(d.get("spot_price")),
+        due_date=str(d.get("due_date") or "")[:10],
+        quantity=quantity,
+        iv=iv / 100.0 if iv > 1.5 else iv,
+        days_to_maturity=int(_f(d.get("days_to_maturity"))),
+    )
+
+
+def limites_malha(centro: float, largura: float = 0.4) -> Tuple[float, float]:
+    """(1-largura)*centro e (1+largura)*centro; centro <= 0 cai para 10,00."""
+    if centro <= 0:
+        centro = 10.0
+    return max(0.0, centro * (1 - largura)), centro * (1 + largura)
+
+
+def malha_precos(centro: float, n_pontos: int = 101, largura: float = 0.4) -> np.ndarray:
+    """
+    Malha uniforme: n_pontos de (1-largura)*centro até (1+largura)*centro,
+    arredondados a 2 casas.
+    """
+    p_min, p_max = limites_malha(centro, largura)
+    return np.round(np.linspace(p_min, p_max, n_pontos), 2)
+
+
+def horizonte_dias(legs: Sequence[OptionLeg]) -> int:
+    """Dias até o primeiro vencimento entre as opções (0 se desconhecido)."""
+    dtms = [l.days_to_maturity for l in legs if _tipo(l) != TIPO_STOCK and l.days_to_maturity > 0]
+    return min(dtms) if dtms else 0
+
+
+def _vetores(legs: Sequence[OptionLeg]):
+    tipo = np.array([_tipo(l) for l in legs])
+    strike = np.array([_f(l.strike) for l in legs])
+    peso = np.array([l.quantity * l.contract_size for l in legs], dtype=float)
+    entrada = np.array([preco_entrada(l) for l in legs])
+    dtm = np.array([l.days_to_maturity for l in legs], dtype=float)
+    iv = np.array([_f(l.iv) for l in legs])
+    return tipo, strike, peso, entrada, dtm, iv
+
+
+def _eh_linear(legs: Sequence[OptionLeg], dias_horizonte: int) -> bool:
+    """True quando nenhuma opção sobrevive ao horizonte (payoff só de intrínsecos)."""
+    return all(
+        _tipo(l) == TIPO_STOCK or l.days_to_maturity <= dias_horizonte
+        for l in legs
+    )
+
+
+# ------------------------------------------------------------
+# Kernel vetorizado
+# ------------------------------------------------------------
+def payoff_pernas(
+    precos,
+    legs: Sequence[OptionLeg],
+    *,
+    dias_horizonte: Optional[int] = None,
+    r: float = 0.0,
+) -> np.ndarray:
+    """
+    Matriz (preços × pernas) de P&L em R$ no horizonte.
+
+    Opções que vencem até o horizonte valem o intrínseco; as que vencem
+    depois são precificadas por Black-Scholes com T = (dias restantes)/252
+    e a IV da perna (sem IV, caem no intrínseco). STOCK vale o preço.
+    """
+    S = np.asarray(precos, dtype=float)[:, None]
+    tipo, strike, peso, entrada, dtm, iv = _vetores(legs)
+    h = horizonte_dias(legs) if dias_horizonte is None else dias_horizonte
+
+    T = np.maximum(dtm - h, 0.0) / DIAS_ANO
+    valor = black_scholes_np(S, strike, r, 0.0, iv, T, tipo == TIPO_CALL)["preco"]
+    valor = np.where(tipo == TIPO_STOCK, S, valor)
+    return (valor - entrada) * peso
+
+
+def payoff_vencimento(precos, legs: Sequence[OptionLeg], **kwargs) -> np.ndarray:
+    """Vetor de P&L total (R$) por preço do ativo no horizonte."""
+    return payoff_pernas(precos, legs, **kwargs).sum(axis=1)
+
+
+def analise_linear(legs: Sequence[OptionLeg]) -> Tuple[List[float], Optional[float], Optional[float]]:
+    """
+    Break-evens e extremos exatos para payoff linear por partes (todas as
+    opções no mesmo vencimento). Os vértices são os strikes; além do maior
+    strike a inclinação é constante.
+
+    Retorna (break_evens, max_lucro, max_prejuizo); None = ilimitado.
+    """
+    h = horizonte_dias(legs)
+    strikes = [_f(l.strike) for l in legs if _tipo(l) != TIPO_STOCK]
+    x = np.unique(np.r_[0.0, strikes])
+    x = np.r_[x, x[-1] + 1.0]
+    y = payoff_vencimento(x, legs, dias_horizonte=h)
+    inclinacao = y[-1] - y[-2]  # R$ por R$ 1,00 de ativo, após o último strike
+
+    bes = []
+    for i in range(len(x) - 1):
+        if y[i] == 0.0 and x[i] > 0:
+            bes.append(x[i])
+        elif y[i] * y[i + 1] < 0:
+            bes.append(x[i] - y[i] * (x[i + 1] - x[i]) / (y[i + 1] - y[i]))
+    if y[-1] == 0.0 or (abs(inclinacao) > 1e-9 and y[-1] * inclinacao < 0):
+        bes.append(x[-1] - y[-1] / inclinacao if y[-1] != 0.0 else x[-1])
+
+    max_lucro = None if inclinacao > 1e-9 else float(y.max())
+    max_prejuizo = None if inclinacao < -1e-9 else float(y.min())
+    return sorted({round(float(b), 2) for b in bes}), max_lucro, max_prejuizo
+
+
+def break_evens_malha(precos, payoff) -> List[float]:
+    """Break-evens por interpolação linear nas trocas de sinal da malha."""
+    x = np.asarray(precos, dtype=float)
+    y = np.asarray(payoff, dtype=float)
+    bes = list(x[:-1][y[:-1] == 0.0])
+    i = np.nonzero(y[:-1] * y[1:] < 0)[0]
+    bes += list(x[i] - y[i] * (x[i + 1] - x[i]) / (y[i + 1] - y[i]))
+    return sorted({round(float(b), 2) for b in bes})
+
+
+def malha_adaptativa(
+    legs: Sequence[OptionLeg],
+    p_min: float,
+    p_max: float,
+    *,
+    dias_horizonte: Optional[int] = None,
+    r: float = 0.0,
+    erro_max: Optional[float] = None,
+    max_pontos: int = 256,
+) -> np.ndarray:
+    """
+    Malha mínima de preços para desenhar o payoff sem perda visível.
+
+    - Todas as opções vencendo no horizonte (linear por partes): só os
+      limites, os strikes e os break-evens — a reta entre eles é exata.
+    - Curva suave (pernas marcadas por BS): parte de 17 pontos uniformes +
+      strikes e divide ao meio cada intervalo cujo ponto médio se afasta
+      da reta mais que `erro_max` (R$), até convergir ou `max_pontos`.
+      Padrão de erro_max: 0,5% da amplitude do payoff.
+    """
+    h = horizonte_dias(legs) if dias_horizonte is None else dias_horizonte
+    p_min, p_max = round(max(0.0, p_min), 2), round(p_max, 2)
+    strikes = [
+        _f(l.strike) for l in legs
+        if _tipo(l) != TIPO_STOCK and p_min < _f(l.strike) < p_max
+    ]
+
+    if _eh_linear(legs, h):
+        bes, _, _ = analise_linear(legs)
+        bes = [b for b in bes if p_min < b < p_max]
+        return np.unique(np.r_[p_min, strikes, bes, p_max])
+
+    x = np.unique(np.round(np.r_[np.linspace(p_min, p_max, 17), strikes], 4))
+    y = payoff_vencimento(x, legs, dias_horizonte=h, r=r)
+    if erro_max is None:
+        erro_max = max(1e-6, 0.005 * float(y.max() - y.min()))
+
+    while len(x) < max_pontos:
+        xm = np.round((x[:-1] + x[1:]) / 2.0, 4)
+        ym = payoff_vencimento(xm, legs, dias_horizonte=h, r=r)
+        erro = np.abs(ym - (y[:-1] + y[1:]) / 2.0)
+        ruins = np.nonzero((erro > erro_max) & (xm > x[:-1]) & (xm < x[1:]))[0]
+        if not len(ruins):
+            break
+        vagas = max_pontos - len(x)
+        if len(ruins) > vagas:
+            ruins = ruins[np.argsort(erro[ruins])[::-1][:vagas]]
+        x = np.r_[x, xm[ruins]]
+        y = np.r_[y, ym[ruins]]
+        ordem = np.argsort(x)
+        x, y = x[ordem], y[ordem]
+
+    return x
+
+
+# ------------------------------------------------------------
+# Simulação genérica
+# ------------------------------------------------------------
+def simular_pernas(
+    legs: Sequence[OptionLeg],
+    *,
+    nome: str = "Personalizada",
+    precos=None,
+    spot: Optional[float] = None,
+    r: float = 0.0,
+    largura: float = 0.4,
+    erro_max: Optional[float] = None,
+) -> SimulationResult:
+    """
+    Simula qualquer combinação de pernas no horizonte (primeiro vencimento).
+    Sem `precos`, usa malha_adaptativa em ±largura do spot.
+    `custo_total` > 0 é débito (pago na montagem), < 0 é crédito.
+    Em metrics, max_lucro/max_prejuizo None = ilimitado.
+    """
+    legs = list(legs)
+    if not legs:
+        raise ValueError("Estratégia sem pernas.")
+
+    if spot is None:
+        spot = next((l.spot_price for l in legs if l.spot_price > 0), 0.0)
+    h = horizonte_dias(legs)
+    if precos is None:
+        strikes = [l.strike for l in legs if l.strike > 0]
+        centro = spot or (sum(strikes) / len(strikes) if strikes else 10.0)
+        p_min, p_max = limites_malha(centro, largura)
+        precos = malha_adaptativa(legs, p_min, p_max, dias_horizonte=h, r=r, erro_max=erro_max)
+    precos = np.asarray(precos, dtype=float)
+
+    payoff = payoff_vencimento(precos, legs, dias_horizonte=h, r=r)
+    _, _, peso, entrada, _, _ = _vetores(legs)
+    custo_total = float((peso * entrada).sum())
+
+    if _eh_linear(legs, h):
+        bes, max_lucro, max_prejuizo = analise_linear(legs)
+    else:
+        # calendário & cia.: curva não linear, extremos dentro da malha
+        bes = break_evens_malha(precos, payoff)
+        max_lucro, max_prejuizo = float(payoff.max()), float(payoff.min())
+
+    ref = spot or float(precos[len(precos) // 2])
+    if len(bes) > 1:
+        be_down, be_up = bes[0], bes[-1]
+    elif bes:
+        be_down, be_up = (bes[0], None) if bes[0] <= ref else (None, bes[0])
+    else:
+        be_down = be_up = None
+
+    primeira = min(
+        (l for l in legs if _tipo(l) != TIPO_STOCK),
+        key=lambda l: (l.days_to_maturity <= 0, l.days_to_maturity, l.due_date),
+        default=legs[0],
+    )
+
+    return SimulationResult(
+        estrategia=nome,
+        precos=precos.tolist(),
+        payoff=payoff.tolist(),
+        custo_total=custo_total,
+        be_down=be_down,
+        be_up=be_up,
+        spot=float(spot or 0.0),
+        vencimento=primeira.due_date,
+        metrics={
+            "break_evens": bes,
+            "max_lucro": max_lucro,
+            "max_prejuizo": max_prejuizo,
+            "horizonte_dias": h,
+            "pernas": [
+                {
+                    "symbol": l.symbol,
+                    "type": l.type.upper(),
+                    "strike": l.strike,
+                    "quantity": l.quantity,
+                    "preco_entrada": preco_entrada(l),
+                }
+                for l in legs
+            ],
+        },
+    )
+
+
+@dataclass(frozen=True)
+class Estrategia:
+    """
+    Definição de estratégia: papéis nomeados e a quantidade (com sinal)
+    de cada um. `simulate` multiplica pela quantity de cada OptionLeg,
+    então quantity=2 em todas as pernas dobra a estrutura.
+    """
+    nome: str
+    papeis: Tuple[Tuple[str, int], ...]
+
+    def montar(self, legs: Dict[str, OptionLeg]) -> List[OptionLeg]:
+        faltando = [p for p, _ in self.papeis if p not in legs]
+        if faltando:
+            raise ValueError(f"{self.nome}: pernas ausentes {faltando}")
+        return [replace(legs[p], quantity=legs[p].quantity * q) for p, q in self.papeis]
+
+    def simulate(self, legs: Dict[str, OptionLeg], **kwargs) -> SimulationResult:
+        return simular_pernas(self.montar(legs), nome=self.nome, **kwargs)
+
+
+LONG_STRADDLE = Estrategia("Long Straddle", (("call", 1), ("put", 1)))
+LONG_STRANGLE = Estrategia("Long Strangle", (("call", 1), ("put", 1)))
+# borboleta com calls: compra K1, vende 2× K2, compra K3
+BORBOLETA = Estrategia("Borboleta", (("baixo", 1), ("meio", -2), ("alto", 1)))
+# calendário: vende o vencimento curto, compra o longo (mesmo strike)
+CALENDARIO = Estrategia("Calendário", (("curta", -1), ("longa", 1)))
+
+ESTRATEGIAS: Dict[str, Estrategia] = {
+    "long_straddle": LONG_STRADDLE,
+    "long_strangle": LONG_STRANGLE,
+    "borboleta": BORBOLETA,
+    "calendario": CALENDARIO,
+}
@@ -1,9 +1,13 @@
 from typing import Dict, Any, List
 from math import isclose
-from viz.payoff import plotar_payoff
 
+import numpy as np
 
-__all__ = ["simular_long_straddle", "calcular_payoff_long_straddle"]
+from simulacoes.base import OptionLeg
+from simulacoes.estrategias import limites_malha, malha_adaptativa, payoff_vencimento
+
+
+__all__ = ["simular_long_straddle", "simular_long_straddle_batch", "calcular_payoff_long_straddle"]
 
 # --------- helpers internos ---------
 def _to_float(v, default: float = 0.0) -> float:
@@ -37,17 +41,12 @@ def _preco_compra_premio(leg: Dict[str, Any]) -> float:
         return bid
     return 0.0
 
-def _gerar_malha_precos(centro: float, n_pontos: int = 101, largura: float = 0.4) -> List[float]:
-    """
-    Gera preços de (1-largura)*centro até (1+largura)*centro.
-    Ex.: largura=0.4 → 60% a 140% do centro, 101 pontos.
-    """
-    if centro <= 0:
-        centro = 10.0  # fallback seguro
-    p_min = max(0.0, centro * (1 - largura))
-    p_max = centro * (1 + largura)
-    passo = (p_max - p_min) / (n_pontos - 1)
-    return [round(p_min + i * passo, 2) for i in range(n_pontos)]
+def _pernas_long(strike_call: float, strike_put: float, premio_call: float,
+                 premio_put: float, lote: int) -> List[OptionLeg]:
+    return [
+        OptionLeg(symbol="CALL", type="CALL", strike=strike_call, premium=premio_call, contract_size=lote),
+        OptionLeg(symbol="PUT", type="PUT", strike=strike_put, premium=premio_put, contract_size=lote),
+    ]
 
 # --------- API pública ---------
 # simulacoes/long_straddle.py (apenas trechos relevantes)
@@ -82,18 +81,21 @@ def simular_long_straddle(dados_call: Dict[str, Any], dados_put: Dict[str, Any],
     else:
         strike_medio = 0.0
     centro = spot or strike_medio or strike_call or strike_put or 10.0
-    precos: List[float] = _gerar_malha_precos(centro)
+    p_min, p_max = limites_malha(centro)
 
-    # --- payoff ---
-    resultados: List[float] = []
-    for px in precos:
-        lucro_call = max(0.0, px - strike_call) * contract_size
-        lucro_put  = max(0.0, strike_put - px) * contract_size
-        resultados.append(lucro_call + lucro_put - custo_total)
+    # --- payoff (kernel vetorizado de simulacoes.estrategias) ---
+    # payoff no vencimento é linear por partes: a malha só precisa dos
+    # limites (±40%), strikes e break-evens — a reta entre eles é exata
+    pernas = _pernas_long(strike_call, strike_put, premio_call, premio_put, contract_size)
+    malha = malha_adaptativa(pernas, p_min, p_max, dias_horizonte=0)
+    precos: List[float] = malha.tolist()
+    resultados: List[float] = payoff_vencimento(malha, pernas, dias_horizonte=0).tolist()
 
     # --- plotar só quando pedido (ex.: CLI). No Flet passe renderizar=False ---
     if renderizar:
         try:
+            from viz.payoff import plotar_payoff  # matplotlib só quando for plotar
+
             plotar_payoff(
                 precos,
                 resultados,
@@ -124,6 +126,68 @@ def simular_long_straddle(dados_call: Dict[str, Any], dados_put: Dict[str, Any],
         "precos": precos,
         "payoff": resultados,
     }
+
+def simular_long_straddle_batch(linhas: List[Dict[str, Any]], *, largura: float = 0.4) -> List[Dict[str, Any]]:
+    """
+    Mesmo resultado de simular_long_straddle para todas as linhas do screener
+    de uma vez, sem API: usa strike/call_premio/put_premio/contract_size/spot
+    já presentes nas linhas (prêmio de compra, como no screener).
+
+    Payoff no vencimento é linear por partes: por linha bastam 6 pontos
+    (limites ±largura, strikes e break-evens), avaliados numa matriz só.
+    Linhas com strike_call/strike_put (strangle) também são aceitas.
+    """
+    if not linhas:
+        return []
+
+    col = lambda *ks: np.array(
+        [next((_to_float(l.get(k)) for k in ks if l.get(k) is not None), 0.0) for l in linhas]
+    )
+    kc = col("strike_call", "strike")
+    kp = col("strike_put", "strike")
+    pc = col("call_premio")
+    pp = col("put_premio")
+    lote = np.array([_to_int(l.get("contract_size"), 100) or 100 for l in linhas], dtype=float)
+    spot = col("spot_oficial", "spot")
+
+    premio = pc + pp
+    be_down = kp - premio
+    be_up = kc + premio
+
+    # centro como em simular_long_straddle: spot, strike médio, 10,00
+    centro = np.where(spot > 0, spot, np.where((kc > 0) & (kp > 0), (kc + kp) / 2.0, np.maximum(kc, kp)))
+    centro = np.where(centro > 0, centro, 10.0)
+    p_min = np.round(np.maximum(0.0, centro * (1 - largura)), 2)
+    p_max = np.round(centro * (1 + largura), 2)
+
+    # (linhas, 6) — pontos fora da faixa saturam nos limites
+    x = np.column_stack([p_min, kp, be_down, kc, be_up, p_max])
+    x = np.sort(np.clip(x, p_min[:, None], p_max[:, None]), axis=1)
+    y = (np.maximum(x - kc[:, None], 0.0) + np.maximum(kp[:, None] - x, 0.0) - premio[:, None]) * lote[:, None]
+
+    out = []
+    for i, l in enumerate(linhas):
+        xi, idx = np.unique(x[i], return_index=True)
+        straddle = kc[i] > 0 and kp[i] > 0 and isclose(kc[i], kp[i], abs_tol=1e-6)
+        out.append({
+            "estrategia": "Long Straddle" if straddle else "Long Strangle",
+            "call": l.get("call"),
+            "put": l.get("put"),
+            "strike_call": float(kc[i]),
+            "strike_put": float(kp[i]),
+            "premio_call": float(pc[i]),
+            "premio_put": float(pp[i]),
+            "contract_size": int(lote[i]),
+            "custo_total": float(premio[i] * lote[i]),
+            "be_down": round(float(be_down[i]), 2),
+            "be_up": round(float(be_up[i]), 2),
+            "spot": float(spot[i]),
+            "vencimento": l.get("due_date") or "",
+            "precos": xi.tolist(),
+            "payoff": y[i][idx].tolist(),
+        })
+    return out
+
 def calcular_payoff_long_straddle(
     precos_ativos: List[float],
     strike_call: float,
@@ -136,10 +200,5 @@ def calcular_payoff_long_straddle(
     Calcula apenas o vetor de payoff (sem plotar), útil para testes.
     Aceita strikes diferentes (strangle).
     """
-    custo_total = (premio_call + premio_put) * lote
-    resultado: List[float] = []
-    for px in precos_ativos:
-        lucro_call = max(px - strike_call, 0.0) * lote
-        lucro_put  = max(strike_put - px, 0.0) * lote
-        resultado.append(lucro_call + lucro_put - custo_total)
-    return resultado
+    pernas = _pernas_long(strike_call, strike_put, premio_call, premio_put, lote)
+    return payoff_vencimento(np.asarray(precos_ativos, dtype=float), pernas, dias_horizonte=0).tolist()
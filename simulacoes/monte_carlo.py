@@ -0,0 +1,268 @@
+# simulacoes/monte_carlo.py
+"""
+Distribuição de P&L por Monte Carlo para estratégias (foco: Long Straddle).
+
+Modelos de preço:
+- "gbm": movimento browniano geométrico com a IV da própria estrutura
+- "bootstrap": reamostra retornos diários históricos (IvAtmHistorico.spot_price)
+
+Os caminhos são gerados em blocos de tamanho fixo: a memória fica limitada a
+(chunk × passos) por vez, mesmo com milhões de caminhos. Estatísticas são
+acumuladas em streaming (somas + histograma para percentis). Com a mesma
+`seed` e o mesmo `chunk` o resultado é reproduzível.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from simulacoes.base import OptionLeg
+from simulacoes.cenarios import completar_iv
+from simulacoes.estrategias import (
+    DIAS_ANO,
+    TIPO_STOCK,
+    _tipo,
+    analise_linear,
+    horizonte_dias,
+    payoff_vencimento,
+    perna_de_dict,
+)
+
+PERCENTIS_PADRAO = (5, 25, 50, 75, 95)
+N_BINS = 4096
+
+
+@dataclass
+class ResultadoMC:
+    modelo: str
+    n_caminhos: int
+    passos: int
+    seed: Optional[int]
+    prob_lucro: float
+    pnl_esperado: float
+    pnl_desvio: float
+    pnl_min: float
+    pnl_max: float
+    percentis: Dict[int, float]
+    prob_toque: Dict[str, float] = field(default_factory=dict)  # path-dependent
+    segundos: float = 0.0
+
+    @property
+    def caminhos_por_segundo(self) -> float:
+        return self.n_caminhos / self.segundos if self.segundos > 0 else 0.0
+
+
+# ------------------------------------------------------------
+# Histograma em streaming (percentis com memória fixa)
+# ------------------------------------------------------------
+class _Histograma:
+    """
+    Bins fixos definidos pelo primeiro bloco (alargado 50% para cada lado);
+    valores fora da faixa caem nos bins das pontas, e min/max exatos são
+    guardados à parte. Erro do percentil ≤ largura de 1 bin.
+    """
+
+    def __init__(self, amostra: np.ndarray, n_bins: int = N_BINS):
+        lo, hi = float(amostra.min()), float(amostra.max())
+        folga = max(hi - lo, 1e-9) * 0.5
+        self.bordas = np.linspace(lo - folga, hi + folga, n_bins + 1)
+        self.contagem = np.zeros(n_bins, dtype=np.int64)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, x: np.ndarray):
+        idx = np.searchsorted(self.bordas, x, side="right") - 1
+        np.clip(idx, 0, len(self.contagem) - 1, out=idx)
+        self.contagem += np.bincount(idx, minlength=len(self.contagem))
+        self.min = min(self.min, float(x.min()))
+        self.max = max(self.max, float(x.max()))
+
+    def percentil(self, p: float) -> float:
+        acum = np.cumsum(self.contagem)
+        alvo = p / 100.0 * acum[-1]
+        i = int(np.searchsorted(acum, alvo, side="left"))
+        antes = acum[i - 1] if i > 0 else 0
+        dentro = self.contagem[i]
+        frac = (alvo - antes) / dentro if dentro else 0.0
+        v = self.bordas[i] + frac * (self.bordas[i + 1] - self.bordas[i])
+        return float(min(max(v, self.min), self.max))
+
+
+# ------------------------------------------------------------
+# Retornos históricos
+# ------------------------------------------------------------
+def retornos_log(spots: Sequence[float]) -> np.ndarray:
+    s = np.asarray(spots, dtype=float)
+    s = s[s > 0]
+    return np.diff(np.log(s)) if len(s) > 1 else np.zeros(0)
+
+
+def retornos_historicos(ticker: str, limit: Optional[int] = 504) -> np.ndarray:
+    """Log-retornos diários a partir do spot gravado no IvAtmHistorico (≈ 2 anos)."""
+    from simulador_web.repositories.iv_atm_repository import get_spot_serie
+
+    return retornos_log(get_spot_serie(ticker, limit=limit))
+
+
+# ------------------------------------------------------------
+# Geradores de caminhos (log-retorno acumulado por passo)
+# ------------------------------------------------------------
+def _incrementos_gbm(rng, n, passos, sigma, r, dt):
+    z = rng.standard_normal((n, passos))
+    return (r - 0.5 * sigma * sigma) * dt + sigma * np.sqrt(dt) * z
+
+
+def _incrementos_bootstrap(rng, n, passos, retornos):
+    return retornos[rng.integers(0, len(retornos), size=(n, passos))]
+
+
+# ------------------------------------------------------------
+# Simulação
+# ------------------------------------------------------------
+def simular_mc(
+    legs: Sequence[OptionLeg],
+    *,
+    spot: Optional[float] = None,
+    modelo: str = "gbm",
+    retornos: Optional[np.ndarray] = None,
+    centralizar: bool = True,
+    n_caminhos: int = 200_000,
+    chunk: int = 50_000,
+    seed: Optional[int] = None,
+    r: float = 0.0,
+    trajetoria: bool = True,
+    percentis: Sequence[int] = PERCENTIS_PADRAO,
+) -> ResultadoMC:
+    """
+    P&L (R$) no primeiro vencimento das pernas.
+
+    - modelo "gbm": sigma = IV média das opções (implícita do prêmio se faltar)
+    - modelo "bootstrap": `retornos` diários (log); com `centralizar` a média
+      histórica é removida e o drift vira r, como no GBM
+    - trajetoria=True simula dia a dia e mede a probabilidade de tocar cada
+      break-even antes do vencimento; False sorteia só o preço final (mais rápido)
+    """
+    legs = list(legs)
+    if not legs:
+        raise ValueError("Estratégia sem pernas.")
+    if modelo not in ("gbm", "bootstrap"):
+        raise ValueError(f"Modelo inválido: {modelo!r} (use gbm ou bootstrap)")
+    if spot is None:
+        spot = next((l.spot_price for l in legs if l.spot_price > 0), 0.0)
+    if spot <= 0:
+        raise ValueError("Spot inválido para a simulação.")
+
+    t0 = time.perf_counter()
+    legs = completar_iv(legs, spot, r)
+    dias = max(1, horizonte_dias(legs))
+    dt = 1.0 / DIAS_ANO
+
+    opcoes = [l for l in legs if _tipo(l) != TIPO_STOCK]
+    sigma = float(np.mean([l.iv for l in opcoes])) if opcoes else 0.0
+
+    if modelo == "bootstrap":
+        retornos = np.asarray(retornos if retornos is not None else [], dtype=float)
+        if len(retornos) < 20:
+            raise ValueError("Histórico insuficiente para bootstrap (mín. 20 retornos).")
+        if centralizar:
+            retornos = retornos - retornos.mean() + r * dt - 0.5 * retornos.var()
+
+    # no modo terminal o GBM sai exato num passo só; o bootstrap soma os diários
+    passos = dias if (trajetoria or modelo == "bootstrap") else 1
+    dt_passo = dt if passos == dias else dias * dt
+
+    bes = []
+    if all(_tipo(l) == TIPO_STOCK or l.days_to_maturity <= dias for l in legs):
+        bes, _, _ = analise_linear(legs)
+    be_down = min(bes) if bes and min(bes) <= spot else None
+    be_up = max(bes) if bes and max(bes) > spot else None
+
+    n_caminhos = int(n_caminhos)
+    chunk = max(1, min(int(chunk), n_caminhos))
+    n_blocos = -(-n_caminhos // chunk)
+    seeds = np.random.SeedSequence(seed).spawn(n_blocos)
+
+    soma = soma2 = 0.0
+    lucro = toque_down = toque_up = toque_algum = 0
+    hist = None
+
+    for b in range(n_blocos):
+        n = min(chunk, n_caminhos - b * chunk)
+        rng = np.random.default_rng(seeds[b])
+
+        if modelo == "gbm":
+            inc = _incrementos_gbm(rng, n, passos, sigma, r, dt_passo)
+        else:
+            inc = _incrementos_bootstrap(rng, n, passos, retornos)
+
+        if trajetoria or passos > 1:
+            np.cumsum(inc, axis=1, out=inc)
+            caminho = spot * np.exp(inc)
+            s_final = caminho[:, -1]
+            if trajetoria:
+                mn = caminho.min(axis=1)
+                mx = caminho.max(axis=1)
+                td = (mn <= be_down) if be_down is not None else np.zeros(n, dtype=bool)
+                tu = (mx >= be_up) if be_up is not None else np.zeros(n, dtype=bool)
+                toque_down += int(td.sum())
+                toque_up += int(tu.sum())
+                toque_algum += int((td | tu).sum())
+        else:
+            s_final = spot * np.exp(inc[:, 0])
+
+        pnl = payoff_vencimento(s_final, legs, dias_horizonte=dias, r=r)
+
+        if hist is None:
+            hist = _Histograma(pnl)
+        hist.add(pnl)
+        soma += float(pnl.sum())
+        soma2 += float(np.dot(pnl, pnl))
+        lucro += int((pnl > 0).sum())
+
+    media = soma / n_caminhos
+    var = max(soma2 / n_caminhos - media * media, 0.0)
+
+    prob_toque = {}
+    if trajetoria:
+        prob_toque = {
+            "be_down": toque_down / n_caminhos if be_down is not None else None,
+            "be_up": toque_up / n_caminhos if be_up is not None else None,
+            "qualquer": toque_algum / n_caminhos,
+        }
+
+    return ResultadoMC(
+        modelo=modelo,
+        n_caminhos=n_caminhos,
+        passos=passos,
+        seed=seed,
+        prob_lucro=lucro / n_caminhos,
+        pnl_esperado=media,
+        pnl_desvio=var ** 0.5,
+        pnl_min=hist.min,
+        pnl_max=hist.max,
+        percentis={int(p): hist.percentil(p) for p in percentis},
+        prob_toque=prob_toque,
+        segundos=time.perf_counter() - t0,
+    )
+
+
+def mc_straddle(
+    dados_call: Dict[str, Any],
+    dados_put: Dict[str, Any],
+    *,
+    ticker: Optional[str] = None,
+    modelo: str = "gbm",
+    **kwargs,
+) -> ResultadoMC:
+    """
+    Atalho a partir das linhas da OPLAB (buscar_detalhes_opcao).
+    Com modelo="bootstrap" e `ticker`, busca os retornos no IvAtmHistorico.
+    """
+    pernas = [
+        perna_de_dict(dados_call, tipo="CALL"),
+        perna_de_dict(dados_put, tipo="PUT"),
+    ]
+    if modelo == "bootstrap" and kwargs.get("retornos") is None and ticker:
+        kwargs["retornos"] = retornos_historicos(ticker)
+    return simular_mc(pernas, modelo=modelo, **kwargs)
@@ -0,0 +1,128 @@
+# simulacoes/probabilidade.py
+"""
+Probabilidades fechadas (lognormal) para linhas do screener Long Straddle.
+
+Para S_T = S·exp((r - σ²/2)·T + σ·√T·Z):
+- P(S_T < BE-) = N(-d2(BE-))      P(S_T > BE+) = N(d2(BE+))
+- movimento esperado (1σ) até o vencimento = S·σ·√T
+- payoff esperado E|S_T - K| = F·(2N(d1) - 1) - K·(2N(d2) - 1), F = S·e^{rT}
+
+Tudo em arrays: uma chamada cobre todas as linhas de todos os tickers.
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+
+from simulacoes.estrategias import DIAS_ANO
+
+
+def _f(v, default=np.nan) -> float:
+    try:
+        x = float(v)
+        return x if x == x else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _iv_decimal(v) -> float:
+    x = _f(v)
+    # OPLAB mistura % (32.5) e decimal (0.325)
+    return x / 100.0 if x > 1.5 else x
+
+
+def metricas_lognormais(S, K, premio, be_down, be_up, T, sigma, r: float = 0.0) -> Dict[str, np.ndarray]:
+    """
+    Arrays de mesmo tamanho (um elemento por linha). Entradas inválidas
+    (S, K, T ou σ <= 0) resultam em NaN nas saídas.
+    """
+    from scipy.special import ndtr
+
+    S = np.asarray(S, dtype=float)
+    K = np.asarray(K, dtype=float)
+    premio = np.asarray(premio, dtype=float)
+    be_down = np.asarray(be_down, dtype=float)
+    be_up = np.asarray(be_up, dtype=float)
+    T = np.asarray(T, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+
+    ok = (S > 0) & (K > 0) & (T > 0) & (sigma > 0)
+    S_ = np.where(ok, S, 1.0)
+    K_ = np.where(ok, K, 1.0)
+    T_ = np.where(ok, T, 1.0)
+    sig = np.where(ok, sigma, 1.0)
+
+    vol = sig * np.sqrt(T_)
+    mu = (r - 0.5 * sig * sig) * T_
+
+    def _d2(x):
+        x = np.where(x > 0, x, np.nan)
+        return (np.log(S_ / x) + mu) / vol
+
+    with np.errstate(invalid="ignore"):
+        p_down = np.where(be_down > 0, ndtr(-_d2(be_down)), 0.0)
+        p_up = ndtr(_d2(be_up))
+
+    d1 = (np.log(S_ / K_) + (r + 0.5 * sig * sig) * T_) / vol
+    d2 = d1 - vol
+    F = S_ * np.exp(r * T_)
+    payoff = F * (2.0 * ndtr(d1) - 1.0) - K_ * (2.0 * ndtr(d2) - 1.0)
+
+    nan = np.full(S.shape, np.nan)
+    return {
+        "prob_be_down": np.where(ok, p_down, nan),
+        "prob_be_up": np.where(ok, p_up, nan),
+        "prob_lucro": np.where(ok, p_down + p_up, nan),
+        "mov_esperado": np.where(ok, S_ * vol, nan),
+        "payoff_esperado": np.where(ok, payoff, nan),
+        "valor_esperado": np.where(ok, payoff - premio, nan),
+    }
+
+
+def enriquecer_probabilidades(linhas: List[Dict[str, Any]], r: float = 0.0) -> List[Dict[str, Any]]:
+    """
+    Acrescenta às linhas do screener (in-place) os campos:
+    iv_ref, prob_be_down_pct, prob_be_up_pct, prob_lucro_pct,
+    mov_esperado, mov_esperado_pct, payoff_esperado, valor_esperado.
+
+    σ = média das IVs de CALL/PUT da linha (iv_call/iv_put); T = dias/252.
+    Valores por unidade (multiplique por contract_size para o contrato).
+    """
+    if not linhas:
+        return linhas
+
+    col = lambda k: np.array([_f(l.get(k)) for l in linhas])
+    iv_c = np.array([_iv_decimal(l.get("iv_call")) for l in linhas])
+    iv_p = np.array([_iv_decimal(l.get("iv_put")) for l in linhas])
+    sigma = np.where(
+        np.isfinite(iv_c) & np.isfinite(iv_p),
+        (iv_c + iv_p) / 2.0,
+        np.where(np.isfinite(iv_c), iv_c, iv_p),
+    )
+
+    S = col("spot")
+    m = metricas_lognormais(
+        S,
+        col("strike"),
+        col("premium_total"),
+        col("be_down"),
+        col("be_up"),
+        col("days_to_maturity") / DIAS_ANO,
+        sigma,
+        r=r,
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mov_pct = m["mov_esperado"] / S * 100.0
+
+    def _r(x, casas):
+        return None if not np.isfinite(x) else round(float(x), casas)
+
+    for i, l in enumerate(linhas):
+        l["iv_ref"] = _r(sigma[i], 4)
+        l["prob_be_down_pct"] = _r(m["prob_be_down"][i] * 100.0, 2)
+        l["prob_be_up_pct"] = _r(m["prob_be_up"][i] * 100.0, 2)
+        l["prob_lucro_pct"] = _r(m["prob_lucro"][i] * 100.0, 2)
+        l["mov_esperado"] = _r(m["mov_esperado"][i], 4)
+        l["mov_esperado_pct"] = _r(mov_pct[i], 2)
+        l["payoff_esperado"] = _r(m["payoff_esperado"][i], 4)
+        l["valor_esperado"] = _r(m["valor_esperado"][i], 4)
+    return linhas
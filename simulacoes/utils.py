@@ -17,8 +17,6 @@ def preco_compra_premio(leg: Dict[str, Any]) -> float:
     return 0.0
 
 def gerar_malha_precos(centro: float, n_pontos: int = 101, largura: float = 0.4) -> List[float]:
-    if centro <= 0: centro = 10.0
-    pmin = max(0.0, centro * (1 - largura))
-    pmax = centro * (1 + largura)
-    passo = (pmax - pmin) / (n_pontos - 1)
-    return [round(pmin + i*passo, 2) for i in range(n_pontos)]
+    # malha uniforme; para curvas de payoff prefira estrategias.malha_adaptativa
+    from simulacoes.estrategias import malha_precos
+    return malha_precos(centro, n_pontos=n_pontos, largura=largura).tolist()
@@ -1,6 +1,31 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
 class SimuladorWebConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "simulador_web"
+
+    def ready(self):
+        from . import checks  # noqa: F401  (registra os system checks)
+        from . import signals  # noqa: F401  (tabela EarningsIvCrush)
+
+        # warmer do cache no próprio worker (LocMemCache é por processo);
+        # fora de comandos do manage.py, exceto runserver
+        comando = sys.argv[1] if len(sys.argv) > 1 and sys.argv[0].endswith("manage.py") else None
+        if comando not in (None, "runserver"):
+            return
+
+        # snapshot do cache quente: carrega antes do warmer, que só
+        # recalcula o que o disco não trouxe válido
+        if os.getenv("CACHE_SNAPSHOT") == "1":
+            from core import cache_snapshot
+
+            cache_snapshot.iniciar()
+
+        if os.getenv("CACHE_WARMER") == "1":
+            from core.cache_warmer import iniciar_em_thread
+
+            iniciar_em_thread()
@@ -0,0 +1,23 @@
+# simulador_web/checks.py
+"""
+Validação de configuração fora do import (system checks do Django).
+
+services.api só exige o OPLAB_TOKEN no primeiro uso; aqui o aviso aparece
+em `manage.py check` / `runserver` / deploy, sem atrasar o boot do worker.
+"""
+import os
+
+from django.core.checks import Warning, register
+
+
+@register()
+def checar_oplab_token(app_configs, **kwargs):
+    if os.getenv("OPLAB_TOKEN"):
+        return []
+    return [
+        Warning(
+            "OPLAB_TOKEN não definido: screener e simulações vão falhar ao chamar a OPLAB.",
+            hint="Defina OPLAB_TOKEN no .env ou nas variáveis de ambiente.",
+            id="simulador_web.W001",
+        )
+    ]
@@ -0,0 +1,103 @@
+from bisect import bisect_left, bisect_right
+from statistics import mean
+
+# Quantos eventos entram nas médias (≈ 2 anos de resultados trimestrais)
+EVENTOS_MEDIA = 8
+
+
+def _pct(a, b):
+    """(a / b - 1) em %, ou None."""
+    if a is None or not b:
+        return None
+    return (float(a) / float(b) - 1.0) * 100.0
+
+
+def _pregoes_do_evento(serie, datas, earnings_date):
+    """(D-1, D0, D+1) = linhas da série antes, no dia e depois do earnings."""
+    i = bisect_left(datas, earnings_date)
+    j = bisect_right(datas, earnings_date)
+    d1 = serie[i - 1] if i > 0 else None
+    d0 = serie[i] if i < j else None
+    p1 = serie[j] if j < len(serie) else None
+    return d1, d0, p1
+
+
+def calcular_evento(serie, datas, earnings_date, announcement_time=None) -> dict:
+    """
+    Métricas de um evento de earnings a partir da série diária do ticker.
+
+    `serie`: linhas (trade_date, iv_atm_mean, spot_price, call_premium,
+    put_premium) ascendentes; `datas`: só as trade_date (para bisect).
+
+    Antes/depois do anúncio:
+    - ANTES do pregão: D-1 → D0
+    - DEPOIS do pregão: D0 → D+1
+    - sem horário: D-1 → D+1
+
+    - crush_pct: queda da IV ATM (positivo = IV caiu)
+    - move_pct: |variação do spot|
+    - move_implicito_pct: straddle ATM / spot no pregão de antes (o que o
+      mercado precificava de movimento até o vencimento)
+    - razao_move: move / move implícito (> 1: o straddle pagou)
+    """
+    d1, d0, p1 = _pregoes_do_evento(serie, datas, earnings_date)
+
+    if announcement_time == "ANTES":
+        antes, depois = d1, d0 or p1
+    elif announcement_time == "DEPOIS":
+        antes, depois = d0 or d1, p1
+    else:
+        antes, depois = d1, p1
+
+    crush = move = implicito = razao = None
+    if antes and depois:
+        variacao_iv = _pct(depois[1], antes[1])
+        crush = -variacao_iv if variacao_iv is not None else None
+        variacao_spot = _pct(depois[2], antes[2])
+        move = abs(variacao_spot) if variacao_spot is not None else None
+    if antes and antes[2]:
+        implicito = (float(antes[3]) + float(antes[4])) / float(antes[2]) * 100.0
+    if move is not None and implicito:
+        razao = move / implicito
+
+    return {
+        "earnings_date": earnings_date,
+        "announcement_time": announcement_time,
+        "pregao_antes": antes[0] if antes else None,
+        "pregao_depois": depois[0] if depois else None,
+        "iv_d1": d1[1] if d1 else None,
+        "iv_d0": d0[1] if d0 else None,
+        "iv_p1": p1[1] if p1 else None,
+        "spot_antes": antes[2] if antes else None,
+        "spot_depois": depois[2] if depois else None,
+        "crush_pct": crush,
+        "move_pct": move,
+        "move_implicito_pct": implicito,
+        "razao_move": razao,
+    }
+
+
+def _media(eventos, campo):
+    valores = [e[campo] for e in eventos if e[campo] is not None]
+    return (mean(valores), len(valores)) if valores else (None, 0)
+
+
+def calcular_eventos(serie, eventos, n: int = EVENTOS_MEDIA) -> list[dict]:
+    """
+    Um dict por evento de `eventos` ((earnings_date, announcement_time)
+    ascendentes), com as médias dos últimos `n` eventos até ele
+    (inclusive; eventos sem dado não contam).
+    """
+    serie = list(serie)
+    datas = [r[0] for r in serie]
+
+    out = []
+    for earnings_date, announcement_time in eventos:
+        ev = calcular_evento(serie, datas, earnings_date, announcement_time)
+
+        janela = (out + [ev])[-n:]
+        ev["crush_medio_pct"], ev["eventos_media"] = _media(janela, "crush_pct")
+        ev["move_medio_pct"], _ = _media(janela, "move_pct")
+        ev["razao_move_media"], _ = _media(janela, "razao_move")
+        out.append(ev)
+    return out
@@ -5,9 +5,6 @@ from __future__ import annotations
 from datetime import date
 from decimal import Decimal
 
-from simulacoes.atm_screener import screener_atm_dois_vencimentos
-from simulacoes.black_scholes import implied_vol
-
 
 def get_iv_atual_atm(
     ticker: str,
@@ -22,6 +19,11 @@ def get_iv_atual_atm(
     - Se 'hoje' for informado -> permite replay/teste histórico
     """
 
+    # screener/BS (numpy, requests) só quando a função roda: este módulo é
+    # importado pelas views no carregamento do URLconf
+    from simulacoes.atm_screener import screener_atm_dois_vencimentos
+    from simulacoes.black_scholes import implied_vol
+
     ticker = (ticker or "").upper().strip()
     if not ticker:
         raise ValueError("ticker é obrigatório")
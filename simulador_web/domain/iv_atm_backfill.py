@@ -0,0 +1,241 @@
+# simulador_web/domain/iv_atm_backfill.py
+
+from __future__ import annotations
+
+import concurrent.futures as cf
+import json
+import os
+import time
+from collections import deque
+from datetime import date, timedelta
+from typing import Callable
+
+from core.b3_calendar import pregoes_entre
+from services.iv_historica import buscar_iv_atm_historica
+
+
+# =========================================================
+# INTERVALOS DE DATAS
+# =========================================================
+def subtrair_intervalos(
+    date_from: date,
+    date_to: date,
+    feitos: list[tuple[date, date]],
+) -> list[tuple[date, date]]:
+    """
+    Retorna os trechos de [date_from, date_to] NÃO cobertos por `feitos`.
+    """
+    restantes = []
+    ini = date_from
+    for f_ini, f_fim in sorted(feitos):
+        if f_fim < ini:
+            continue
+        if f_ini > date_to:
+            break
+        if f_ini > ini:
+            restantes.append((ini, min(f_ini - timedelta(days=1), date_to)))
+        ini = max(ini, f_fim + timedelta(days=1))
+        if ini > date_to:
+            break
+    if ini <= date_to:
+        restantes.append((ini, date_to))
+    return restantes
+
+
+def unir_intervalos(intervalos: list[tuple[date, date]]) -> list[tuple[date, date]]:
+    """
+    Une intervalos sobrepostos ou contíguos (fim + 1 dia == início).
+    """
+    unidos = []
+    for ini, fim in sorted(intervalos):
+        if unidos and ini <= unidos[-1][1] + timedelta(days=1):
+            unidos[-1] = (unidos[-1][0], max(unidos[-1][1], fim))
+        else:
+            unidos.append((ini, fim))
+    return unidos
+
+
+def intervalos_faltantes(
+    date_from: date,
+    date_to: date,
+    existentes: set[date],
+) -> list[tuple[date, date]]:
+    """
+    Pregões B3 de [date_from, date_to] ausentes em `existentes`,
+    agrupados nos menores intervalos possíveis: pregões faltantes
+    consecutivos (no calendário B3) viram um único intervalo.
+    """
+    intervalos = []
+    inicio = None
+    ultimo = None
+    for d in pregoes_entre(date_from, date_to):
+        if d in existentes:
+            if inicio is not None:
+                intervalos.append((inicio, ultimo))
+                inicio = None
+            continue
+        if inicio is None:
+            inicio = d
+        ultimo = d
+    if inicio is not None:
+        intervalos.append((inicio, ultimo))
+    return intervalos
+
+
+# =========================================================
+# CHECKPOINT (JSON EM DISCO)
+# =========================================================
+def carregar_checkpoint(path: str | None) -> dict[str, list[tuple[date, date]]]:
+    """
+    Lê os blocos já concluídos por ticker. Arquivo ausente → vazio.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f) or {}
+
+    return {
+        ticker: [
+            (date.fromisoformat(a), date.fromisoformat(b))
+            for a, b in blocos
+        ]
+        for ticker, blocos in (raw.get("concluidos") or {}).items()
+    }
+
+
+def salvar_checkpoint(path: str | None, concluidos: dict[str, list[tuple[date, date]]]):
+    """
+    Persiste os blocos concluídos (escrita atômica via arquivo temporário).
+    """
+    if not path:
+        return
+
+    raw = {
+        "concluidos": {
+            ticker: [[a.isoformat(), b.isoformat()] for a, b in unir_intervalos(blocos)]
+            for ticker, blocos in concluidos.items()
+        }
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(raw, f, indent=2)
+    os.replace(tmp, path)
+
+
+# =========================================================
+# ORQUESTRADOR
+# =========================================================
+def executar_backfill(
+    intervalos: dict[str, list[tuple[date, date]]],
+    ao_concluir: Callable[[str, date, date, list[dict]], None],
+    *,
+    chunk_dias: int = 90,
+    min_chunk_dias: int = 5,
+    workers: int = 4,
+    timeout: float = 6.0,
+    max_timeouts: int = 3,
+    checkpoint_path: str | None = None,
+    ao_receber_dia: Callable[[str, date, list[dict]], None] | None = None,
+    log: Callable[[str], None] = print,
+) -> dict:
+    """
+    Baixa o histórico de IV ATM para vários tickers em paralelo.
+
+    - `intervalos`: {ticker: [(ini, fim), ...]} a buscar
+    - Cada intervalo é quebrado em blocos de `chunk_dias` dias corridos
+    - Até `workers` requisições simultâneas (entre tickers e blocos)
+    - Timeout em um bloco → o tamanho do bloco daquele ticker cai pela metade
+      (até `min_chunk_dias`) e o trecho volta para a fila
+    - `ao_concluir(ticker, ini, fim, dados)` roda na thread principal
+      (gravação no banco fica fora do pool)
+    - Com `checkpoint_path`, blocos concluídos são persistidos e pulados
+      numa nova execução
+    - `ao_receber_dia` é repassado a buscar_iv_atm_historica (roda nas
+      threads do pool; use só para I/O local, ex.: chain_store)
+
+    Retorna um resumo: blocos, registros, timeouts e falhas.
+    """
+    concluidos = carregar_checkpoint(checkpoint_path)
+
+    tamanho = {}
+    pendentes = deque()
+    for ticker, trechos in intervalos.items():
+        tamanho[ticker] = max(1, int(chunk_dias))
+        for ini, fim in trechos:
+            for r_ini, r_fim in subtrair_intervalos(ini, fim, concluidos.get(ticker, [])):
+                pendentes.append((ticker, r_ini, r_fim))
+
+    resumo = {"blocos": 0, "registros": 0, "timeouts": 0, "falhas": []}
+    timeouts_no_minimo = {}
+
+    def _proximo_bloco():
+        ticker, ini, fim = pendentes.popleft()
+        passo = tamanho[ticker]
+        corte = ini + timedelta(days=passo - 1)
+        if corte < fim:
+            pendentes.appendleft((ticker, corte + timedelta(days=1), fim))
+            fim = corte
+        return ticker, ini, fim
+
+    def _buscar(ticker, ini, fim):
+        t0 = time.perf_counter()
+        dados = buscar_iv_atm_historica(
+            ticker=ticker,
+            date_from=ini.isoformat(),
+            date_to=fim.isoformat(),
+            timeout=timeout,
+            ao_receber_dia=ao_receber_dia,
+        )
+        return dados, time.perf_counter() - t0
+
+    workers = max(1, int(workers))
+
+    with cf.ThreadPoolExecutor(max_workers=workers) as ex:
+        em_voo = {}
+
+        while pendentes or em_voo:
+            while pendentes and len(em_voo) < workers:
+                bloco = _proximo_bloco()
+                em_voo[ex.submit(_buscar, *bloco)] = bloco
+
+            prontos, _ = cf.wait(em_voo, return_when=cf.FIRST_COMPLETED)
+
+            for fut in prontos:
+                ticker, ini, fim = em_voo.pop(fut)
+                try:
+                    dados, dt = fut.result()
+                except TimeoutError:
+                    resumo["timeouts"] += 1
+                    dias_bloco = (fim - ini).days + 1
+
+                    if dias_bloco > min_chunk_dias:
+                        tamanho[ticker] = max(min_chunk_dias, dias_bloco // 2)
+                        log(f"⏱ {ticker} {ini} → {fim} timeout | novo bloco={tamanho[ticker]}d")
+                        pendentes.appendleft((ticker, ini, fim))
+                        continue
+
+                    n = timeouts_no_minimo.get((ticker, ini), 0) + 1
+                    timeouts_no_minimo[(ticker, ini)] = n
+                    if n < max_timeouts:
+                        log(f"⏱ {ticker} {ini} → {fim} timeout | tentativa {n}/{max_timeouts}")
+                        pendentes.append((ticker, ini, fim))
+                    else:
+                        log(f"❌ {ticker} {ini} → {fim} desistindo após {n} timeouts")
+                        resumo["falhas"].append((ticker, ini, fim, "timeout"))
+                    continue
+                except Exception as e:
+                    log(f"❌ {ticker} {ini} → {fim} erro: {e}")
+                    resumo["falhas"].append((ticker, ini, fim, str(e)))
+                    continue
+
+                ao_concluir(ticker, ini, fim, dados or [])
+
+                concluidos.setdefault(ticker, []).append((ini, fim))
+                salvar_checkpoint(checkpoint_path, concluidos)
+
+                resumo["blocos"] += 1
+                resumo["registros"] += len(dados or [])
+                log(f"✔ {ticker} {ini} → {fim} | registros={len(dados or [])} | {dt:.2f}s")
+
+    return resumo
@@ -3,9 +3,18 @@ from __future__ import annotations
 from datetime import date
 from decimal import Decimal
 
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from core.cache_keys import iv_decisao_cache_key
+from core.cache_snapshot import cache_set
+from core.cache_ttl import ttl
+
 from simulador_web.domain.iv_atm_atual import get_iv_atual_atm
-from simulador_web.domain.iv_atm_metrics import calcular_metricas_iv_atm
+from simulador_web.domain.iv_atm_metrics import calcular_metricas_iv_atm, metricas_da_serie
 from simulador_web.domain.iv_atm_classifier import classificar_ls_por_iv
+from simulador_web.repositories.iv_atm_repository import get_iv_atm_serie
 
 
 # =========================================================
@@ -110,12 +119,47 @@ def decidir_ls_por_iv(
     }
 
 
+# =========================================================
+# CLASSIFICAÇÃO HISTÓRICA (BACKTEST)
+# =========================================================
+def classificar_iv_historica(
+    ticker: str,
+    datas: list[date],
+    *,
+    limit: int = 60,
+) -> dict[date, str]:
+    """
+    Classificação de IV (Barato / Justo / Caro) em cada data, como
+    decidir_ls_por_iv teria respondido naquele pregão:
+    - IV atual = iv_atm_mean do próprio pregão
+    - Percentis = últimos `limit` pregões ANTERIORES à data
+
+    Uma única query para a série inteira do ticker.
+    """
+    serie = get_iv_atm_serie(ticker)
+    if not serie:
+        return {d: "Indisponível" for d in datas}
+
+    dias = [d for d, _ in serie]
+    ivs = [iv for _, iv in serie]
+    por_dia = dict(serie)
+
+    out = {}
+    for d in datas:
+        i = bisect_left(dias, d)
+        janela = ivs[max(0, i - limit):i]
+        resultado = classificar_ls_por_iv(por_dia.get(d), metricas_da_serie(janela))
+        out[d] = resultado.get("classificacao")
+    return out
+
+
 # =========================================================
 # ADAPTER PARA VIEW (REQUEST / GET)
 # =========================================================
 def build_iv_decisao(request, ticker: str):
     """
-    Adapter TEMPORÁRIO – EXECUTA SEMPRE.
+    Adapter TEMPORÁRIO. Com IV de mercado, o resultado fica no cache
+    pelo TTL de "iv_decisao" (core.cache_ttl).
 
     Entrada:
     - iv_override no GET pode ser:
@@ -140,11 +184,21 @@ def build_iv_decisao(request, ticker: str):
         except Exception:
             iv_override = None
 
+    # só a IV de mercado é cacheada (override é instantâneo e por usuário)
+    chave = iv_decisao_cache_key(ticker) if iv_override is None else None
+    if chave:
+        cached = cache.get(chave)
+        if cached is not None:
+            return dict(cached)
+
     try:
-        return decidir_ls_por_iv(
+        decisao = decidir_ls_por_iv(
             ticker=ticker,
             iv_override=iv_override,
         )
+        if chave:
+            cache_set(chave, decisao, timeout=ttl("iv_decisao"))
+        return decisao
     except Exception as e:
         return {
             "ticker": ticker,
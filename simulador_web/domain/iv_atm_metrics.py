@@ -28,7 +28,15 @@ def calcular_metricas_iv_atm(
         limit=limit,
     )
 
-    if not historico:
+    return metricas_da_serie([r["iv_atm_mean"] for r in historico])
+
+
+def metricas_da_serie(valores) -> dict:
+    """
+    Mesmas métricas de calcular_metricas_iv_atm, a partir de uma série
+    de IVs já carregada (ex.: janela móvel no backtest).
+    """
+    if not len(valores):
         return {
             "count": 0,
             "iv_mean": None,
@@ -39,7 +47,7 @@ def calcular_metricas_iv_atm(
             "p75": None,
         }
 
-    ivs = [Decimal(r["iv_atm_mean"]) for r in historico]
+    ivs = [Decimal(str(v)) for v in valores]
     ivs_sorted = sorted(ivs)
     n = len(ivs_sorted)
 
@@ -71,8 +79,13 @@ def get_iv_ultimos_dias(ivatm_queryset, dias=10):
         .values_list("iv_atm_mean", flat=True)[:dias]
     )
 
+    return formatar_iv_ultimos_dias(registros)
+
+
+def formatar_iv_ultimos_dias(valores):
+    """IVs do mais recente para o mais antigo → [{"label": "D-1", "valor": ...}]."""
     return [
         {"label": f"D-{i+1}", "valor": round(float(iv), 2)}
-        for i, iv in enumerate(registros)
+        for i, iv in enumerate(valores)
         if iv is not None
     ]
@@ -0,0 +1,523 @@
+# simulador_web/domain/ls_linhas.py
+"""
+Enriquecimento das linhas do screener para a tela Long Straddle.
+
+Etapas (as mesmas da view, em ordem): spot oficial → D+1 (prêmio de
+mercado, BE e matriz de crush) → crush IV → lotes/custo/BE% → filtros →
+ranking por menor BE% (PRO). Usadas pela página inteira (long_straddle)
+e, por ativo, pelo modo streaming (long_straddle_stream).
+Sem numpy/requests no import: os módulos pesados entram nas funções.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+from core import cache_snapshot
+from core.cache_keys import ls_cache_key
+
+LOT_MIN = 100
+
+# cache local da tela LS (global no módulo): contexto final e base do
+# cálculo, lidos pela view e gravados também pelo core.cache_warmer
+ls_cache: Dict[str, Dict[str, Any]] = {}
+cache_snapshot.registrar_dict("ls", ls_cache, expira=lambda e: e["expira"])
+cache_snapshot.registrar_tipo("simulacoes.cenarios.MatrizCrush")
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+def fmt_brl(v):
+    """
+    Formatação pt-BR sem símbolo de moeda.
+    Ex: 5931.5 -> "5.931,50"
+    """
+    try:
+        return f"{float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except Exception:
+        return "0,00"
+
+
+def to_float(v, default=0.0):
+    try:
+        if v is None:
+            return default
+        return float(v)
+    except Exception:
+        return default
+
+
+def arredondar_lotes(call_raw, put_raw, total):
+    c = int(call_raw // LOT_MIN) * LOT_MIN
+    p = int(put_raw // LOT_MIN) * LOT_MIN
+    rem = total - (c + p)
+    while rem >= LOT_MIN:
+        frac_c = (call_raw - c)
+        frac_p = (put_raw - p)
+        if frac_c >= frac_p:
+            c += LOT_MIN
+        else:
+            p += LOT_MIN
+        rem -= LOT_MIN
+    return c, p
+
+
+def be_pct_min(r) -> float:
+    vals = []
+    if r.get("be_pct_down") is not None:
+        vals.append(abs(r["be_pct_down"]))
+    if r.get("be_pct_up") is not None:
+        vals.append(abs(r["be_pct_up"]))
+    return min(vals) if vals else float("inf")
+
+
+# ------------------------------------------------------------
+# 2–3) Linhas do screener + spot oficial
+# ------------------------------------------------------------
+def linhas_do_screener(ticker: str, res: Optional[dict]) -> List[Dict[str, Any]]:
+    out = []
+    for row in (res or {}).get("atm", []) or []:
+        r = dict(row)
+        r["ticker"] = ticker
+        out.append(r)
+    return out
+
+
+def _spot_oficial(ticker: str) -> Optional[float]:
+    from services.api import get_spot_ativo_oficial
+
+    try:
+        so = get_spot_ativo_oficial(ticker)
+        return to_float(so) if so is not None else None
+    except:
+        return None
+
+
+def spots_oficiais(tickers: List[str], linhas: List[dict]):
+    """
+    (spot_uni, {ticker: spot}). Com um único ativo, spot_uni é o spot
+    oficial (ou o do screener); com vários, spot_uni é None.
+    """
+    from services.api import get_spot_ativo_oficial
+
+    spot_uni = None
+    spots = {}
+
+    if len(tickers) == 1:
+        try:
+            spot_uni = get_spot_ativo_oficial(tickers[0])
+        except:
+            spot_uni = None
+        if spot_uni is None and linhas:
+            spot_uni = to_float(linhas[0].get("spot"))
+        spot_uni = to_float(spot_uni) if spot_uni else 0.0
+        if spot_uni:
+            spots[tickers[0]] = spot_uni
+    else:
+        for tkr in tickers:
+            so = _spot_oficial(tkr)
+            if so is not None:
+                spots[tkr] = so
+
+    return spot_uni, spots
+
+
+def aplicar_spots(linhas: List[dict], spots_oficiais: Dict[str, float]):
+    for r in linhas:
+        tkr = r.get("ticker")
+        if tkr in spots_oficiais:
+            r["spot_oficial"] = spots_oficiais[tkr]
+
+
+# ------------------------------------------------------------
+# 4) D+1 — PARTE FIXA (mesma lógica Flet)
+#    prêmio de mercado, BE, IV de mercado e matriz de
+#    preços/deltas por nível de crush (0–50%)
+# ------------------------------------------------------------
+def base_d1(linhas: List[dict], spot_uni) -> list:
+    """
+    Ajusta as linhas (in-place) para o D+1 e devolve a matriz de crush de
+    cada uma (None onde faltar dado). Os detalhes por opção da OPLAB são
+    buscados uma vez por símbolo nesta chamada.
+    """
+    from simulacoes.black_scholes import implied_vol
+    from simulacoes.cenarios import matriz_crush
+    from services.api import buscar_detalhes_opcao
+
+    matrizes_crush = [None] * len(linhas)
+    detalhes_cache = {}
+
+    # >>> AJUSTE D+1 (LOG / MID / BS)
+    # Logs ativados por padrão em ambiente local.
+    # Para desligar explicitamente: export LS_D1_LOG=0
+    log_d1 = os.getenv("LS_D1_LOG", "1") == "1"
+
+    def _px_ref(d):
+        """
+        Preço de referência para mercado:
+        - Se bid>0 e ask>0 => MID
+        - Senão => fallback (ask/last/close/bid)
+        Retorna: (preco, src, bid, ask)
+        """
+        b = to_float(d.get("bid"))
+        a = to_float(d.get("ask"))
+        last = to_float(d.get("last"))
+        close = to_float(d.get("close"))
+
+        if b > 0 and a > 0:
+            return (b + a) / 2.0, "MID", b, a
+
+        if a > 0:
+            return a, "ASK", b, a
+        if last > 0:
+            return last, "LAST", b, a
+        if close > 0:
+            return close, "CLOSE", b, a
+        if b > 0:
+            return b, "BID", b, a
+        return 0.0, "ZERO", b, a
+
+    def _implied_or_min(preco, S, K, r, T, kind):
+        try:
+            iv = implied_vol(preco, S, K, r, 0.0, T, kind)
+            return max(0.0001, iv) if iv else 0.0001
+        except:
+            return 0.0001
+
+    def _T_years(days_val):
+        try:
+            dias = max(1, int(to_float(days_val, 1)))
+            return dias / 252.0
+        except:
+            return 1 / 252.0
+
+    r_aa = to_float(os.getenv("SELIC_AA", "10.0")) / 100.0
+
+    for i, r in enumerate(linhas):
+        call_sym = r.get("call")
+        put_sym = r.get("put")
+        if not call_sym or not put_sym:
+            continue
+
+        try:
+            if call_sym in detalhes_cache:
+                cd = detalhes_cache[call_sym]
+            else:
+                cd = buscar_detalhes_opcao(call_sym)
+                detalhes_cache[call_sym] = cd
+
+            if put_sym in detalhes_cache:
+                pd = detalhes_cache[put_sym]
+            else:
+                pd = buscar_detalhes_opcao(put_sym)
+                detalhes_cache[put_sym] = pd
+
+            if spot_uni and spot_uni > 0:
+                S = spot_uni
+            else:
+                S = to_float(r.get("spot_oficial") or cd.get("spot_price") or pd.get("spot_price"))
+
+            Kc = to_float(cd.get("strike"))
+            Kp = to_float(pd.get("strike"))
+
+            Tc = _T_years(cd.get("days_to_maturity"))
+            Tp = _T_years(pd.get("days_to_maturity"))
+
+            Pc_mkt, src_c, bid_c, ask_c = _px_ref(cd)
+            Pp_mkt, src_p, bid_p, ask_p = _px_ref(pd)
+
+            if log_d1:
+                print(f"[D+1][PX][CALL] {call_sym} | bid={bid_c:.4f} | ask={ask_c:.4f} | src={src_c} | px={Pc_mkt:.4f}", flush=True)
+                print(f"[D+1][PX][PUT ] {put_sym} | bid={bid_p:.4f} | ask={ask_p:.4f} | src={src_p} | px={Pp_mkt:.4f}", flush=True)
+
+            # IV de mercado (a partir do preço de mercado)
+            sig_c = _implied_or_min(Pc_mkt, S, Kc, r_aa, Tc, "CALL")
+            sig_p = _implied_or_min(Pp_mkt, S, Kp, r_aa, Tp, "PUT")
+
+            # BS do cenário D+1 (T - 1 dia útil) para todos os níveis de crush
+            matrizes_crush[i] = matriz_crush(S, Kc, Kp, Tc, Tp, sig_c, sig_p, r=r_aa)
+
+            # Prêmios exibidos no D+1 = preço de mercado (MID quando possível)
+            r["call_premio"] = Pc_mkt
+            r["put_premio"] = Pp_mkt
+            prem_total = Pc_mkt + Pp_mkt
+            r["premium_total"] = prem_total
+
+            # BE coerente com o prêmio exibido (corrige bug Pc1/Pp1 inexistentes)
+            r["be_down"] = round(Kp - prem_total, 4)
+            r["be_up"] = round(Kc + prem_total, 4)
+
+        except:
+            continue
+
+    return matrizes_crush
+
+
+# ------------------------------------------------------------
+# 1–4) BASE DO CÁLCULO — screener + spot + parte fixa do D+1
+# ------------------------------------------------------------
+def montar_base_ls(tickers: List[str], horizonte: str) -> Dict[str, Any]:
+    """
+    Base da tela LS para `tickers` (independe de crush, lote e BE máx.):
+    {"linhas_atm", "matrizes_crush", "spot_uni"}. Screeners em paralelo;
+    ativos com erro ficam de fora. ValueError se nenhum trouxer linhas.
+    Usada pela view e pelo cache_warmer (ver aquecer_base_ls).
+    """
+    import concurrent.futures as cf
+    from core.app_core import atualizar_e_screener_atm_2venc
+
+    linhas_atm = []
+    with cf.ThreadPoolExecutor(max_workers=max(1, min(8, len(tickers)))) as ex:
+        futuros = [ex.submit(atualizar_e_screener_atm_2venc, t, False) for t in tickers]
+        for tkr, fut in zip(tickers, futuros):
+            try:
+                linhas_atm.extend(linhas_do_screener(tkr, fut.result()))
+            except Exception:
+                continue
+
+    if not linhas_atm:
+        raise ValueError("Nenhuma linha ATM retornada pelo screener.")
+
+    linhas_atm.sort(key=lambda r: r.get("ticker", ""))
+
+    spot_uni, spots = spots_oficiais(tickers, linhas_atm)
+    aplicar_spots(linhas_atm, spots)
+
+    matrizes_crush = [None] * len(linhas_atm)
+    if horizonte == "D+1":
+        matrizes_crush = base_d1(linhas_atm, spot_uni)
+
+    return {"linhas_atm": linhas_atm, "matrizes_crush": matrizes_crush, "spot_uni": spot_uni}
+
+
+def base_ls_key(ativo, horizonte, num_vencimentos, plan):
+    return f"{ls_cache_key(ativo, horizonte, num_vencimentos, plan)}|base"
+
+
+def guardar_base_ls(base_key, dados, agora_ts):
+    from core.cache_ttl import expira_em
+
+    ls_cache[base_key] = {
+        "ts": agora_ts,
+        "expira": expira_em("ls", agora_ts),
+        "data": {
+            "linhas_atm": [dict(r) for r in dados["linhas_atm"]],
+            "matrizes_crush": dados["matrizes_crush"],
+            "spot_uni": dados["spot_uni"],
+        },
+    }
+
+
+def aquecer_base_ls(planos, ativo, tickers, horizonte="Vencimento", num_vencimentos=("1", "2")):
+    """
+    Monta a base do LS (montar_base_ls) uma vez e grava em `ls_cache` nas
+    chaves que a página lê, para cada plano e `num_vencimentos` (a base é
+    a mesma). Chamada pelo core.cache_warmer, depois do screener.
+    """
+    import time
+
+    dados = montar_base_ls(list(tickers), horizonte)
+    agora_ts = time.time()
+    for plan in planos:
+        for nv in num_vencimentos:
+            guardar_base_ls(base_ls_key(ativo, horizonte, nv, plan), dados, agora_ts)
+    return len(dados["linhas_atm"])
+
+
+# ------------------------------------------------------------
+# 4.1) D+1 + CRUSH IV — só consulta a matriz (sem API/BS)
+# ------------------------------------------------------------
+def aplicar_crush(linhas: List[dict], matrizes_crush: list, crush_iv: float) -> str:
+    """Deltas D+1 no nível de crush pedido (in-place). Devolve o aviso da tela."""
+    log_d1 = os.getenv("LS_D1_LOG", "1") == "1"
+
+    for r, m in zip(linhas, matrizes_crush):
+        if m is None:
+            continue
+        cen = m.em(crush_iv)
+
+        if log_d1:
+            print(f"[D+1][BS][CALL] {r.get('call')} | IV_mkt={cen['call_iv']:.4f} | crush={crush_iv:.1f}% | delta={cen['call_delta']}", flush=True)
+            print(f"[D+1][BS][PUT ] {r.get('put')} | IV_mkt={cen['put_iv']:.4f} | crush={crush_iv:.1f}% | delta={cen['put_delta']}", flush=True)
+
+        # Atualiza deltas para D+1 (sem depender do screener)
+        r["call_delta"] = round(cen["call_delta"], 4)
+        r["put_delta"] = round(cen["put_delta"], 4)
+
+    return f"Cálculo D+1 aplicado com Crush IV de {crush_iv:.1f}%."
+
+
+# ------------------------------------------------------------
+# 5) LOTES, CUSTO, BE%
+# ------------------------------------------------------------
+def enriquecer_lotes(linhas: List[dict], lote_total: int, spot_uni) -> List[dict]:
+    linhas_enriquecidas = []
+    for r in linhas:
+        delta_c = r.get("call_delta")
+        delta_p = r.get("put_delta")
+
+        w_call = abs(to_float(delta_p)) if delta_p is not None else 1.0
+        w_put = abs(to_float(delta_c)) if delta_c is not None else 1.0
+        soma = w_call + w_put
+
+        if soma == 0:
+            continue
+
+        raw_call = lote_total * (w_call / soma)
+        raw_put = lote_total - raw_call
+
+        qty_call, qty_put = arredondar_lotes(raw_call, raw_put, lote_total)
+
+        call_premio = to_float(r.get("call_premio"))
+        put_premio = to_float(r.get("put_premio"))
+        custo_oper = qty_call * call_premio + qty_put * put_premio
+
+        r = dict(r)
+        r["qty_call"] = qty_call
+        r["qty_put"] = qty_put
+
+        # ✅ Substituição mínima: remove locale e mantém padrão R$ 5.931,50
+        r["custo_operacao"] = fmt_brl(custo_oper)
+
+        if r.get("spot_oficial") is not None:
+            spot_ref = to_float(r["spot_oficial"])
+        elif spot_uni:
+            spot_ref = spot_uni
+        else:
+            spot_ref = to_float(r.get("spot"))
+
+        be_down_val = r.get("be_down")
+        be_up_val = r.get("be_up")
+
+        if spot_ref and spot_ref > 0:
+            r["be_pct_down"] = ((be_down_val / spot_ref) - 1.0) * 100 if be_down_val else None
+            r["be_pct_up"] = ((be_up_val / spot_ref) - 1.0) * 100 if be_up_val else None
+        else:
+            r["be_pct_down"] = None
+            r["be_pct_up"] = None
+
+        linhas_enriquecidas.append(r)
+    return linhas_enriquecidas
+
+
+# ------------------------------------------------------------
+# 6) FILTROS
+# ------------------------------------------------------------
+def filtrar(linhas: List[dict], be_max_pct, num_vencimentos) -> List[dict]:
+    if be_max_pct is not None:
+        linhas = [
+            r for r in linhas
+            if (
+                r.get("be_pct_down") is not None and abs(r["be_pct_down"]) <= be_max_pct
+            ) or (
+                r.get("be_pct_up") is not None and abs(r["be_pct_up"]) <= be_max_pct
+            )
+        ]
+
+    if num_vencimentos in ("1", "2"):
+        max_rows = 2 if num_vencimentos == "1" else 4
+        agrupado = {}
+        for r in linhas:
+            agrupado.setdefault(r["ticker"], []).append(r)
+
+        linhas_final = []
+        for tkr, rows in agrupado.items():
+            linhas_final.extend(rows[:max_rows])
+        linhas = linhas_final
+
+    return linhas
+
+
+# ------------------------------------------------------------
+# 6.1) ORDENAÇÃO POR MENOR BE% + REDUÇÃO (APENAS PLANO PRO)
+# ------------------------------------------------------------
+def ranquear_pro(linhas: List[dict], ativo: str) -> List[dict]:
+    # Sempre ordenar por menor BE%
+    linhas.sort(key=be_pct_min)
+
+    # Consulta FULL (sem ativo): manter apenas 1 LS por ticker
+    if ativo:
+        return linhas
+
+    agrupado = {}
+    for r in linhas:
+        agrupado.setdefault(r["ticker"], []).append(r)
+
+    linhas_finais = []
+
+    for tkr, rows in agrupado.items():
+
+        # 🔎 LOG — CANDIDATOS
+        print(f"[LS-RANK][CANDIDATOS] {tkr}", flush=True)
+        for r in rows:
+            print(
+                f"  call={r.get('call')} put={r.get('put')} | "
+                f"venc={r.get('due_date')} | "
+                f"be_pct_down={r.get('be_pct_down'):.4f} "
+                f"be_pct_up={r.get('be_pct_up'):.4f} | "
+                f"be_pct_min={be_pct_min(r):.4f}",
+                flush=True
+            )
+
+        # vencedor = menor BE%
+        vencedor = rows[0]
+        linhas_finais.append(vencedor)
+
+        # 🏆 LOG — ESCOLHIDO
+        print(
+            f"[LS-RANK][ESCOLHIDO] {tkr} | "
+            f"call={vencedor.get('call')} put={vencedor.get('put')} | "
+            f"be_pct_min={be_pct_min(vencedor):.4f}",
+            flush=True
+        )
+
+    return linhas_finais
+
+
+# ------------------------------------------------------------
+# Pipeline de um ativo (modo streaming)
+# ------------------------------------------------------------
+def linhas_ls_ativo(
+    ticker: str,
+    res: Optional[dict],
+    *,
+    unico: bool,
+    horizonte: str,
+    crush_iv: float,
+    lote_total: int,
+    be_max_pct,
+    num_vencimentos: str,
+    user_plan: str,
+    ativo: str,
+) -> Dict[str, Any]:
+    """
+    Etapas 2–7 para o resultado do screener de um ativo: linhas
+    ranqueadas + simulação LS de cada uma. `unico` = consulta de um só ativo
+    (usa o spot dele como spot_uni, como na página).
+    """
+    from simulacoes.long_straddle import simular_long_straddle_batch
+
+    linhas = linhas_do_screener(ticker, res)
+    if not linhas:
+        return {"linhas": [], "simulacoes": [], "aviso_horizonte": None}
+
+    if unico:
+        spot_uni, spots = spots_oficiais([ticker], linhas)
+    else:
+        spot_uni, so = None, _spot_oficial(ticker)
+        spots = {ticker: so} if so is not None else {}
+    aplicar_spots(linhas, spots)
+
+    aviso = None
+    if horizonte == "D+1":
+        matrizes = base_d1(linhas, spot_uni)
+        aviso = aplicar_crush(linhas, matrizes, crush_iv)
+
+    linhas = filtrar(enriquecer_lotes(linhas, lote_total, spot_uni), be_max_pct, num_vencimentos)
+    if user_plan == "pro":
+        linhas = ranquear_pro(linhas, ativo)
+
+    simulacoes = simular_long_straddle_batch(linhas) if linhas else []
+    if spot_uni:
+        for sim in simulacoes:
+            sim["spot"] = float(spot_uni)
+    return {"linhas": linhas, "simulacoes": simulacoes, "aviso_horizonte": aviso}
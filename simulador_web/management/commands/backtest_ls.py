@@ -0,0 +1,112 @@
+import csv
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services import chain_store
+from simulacoes.backtest_ls import RegraSaida, resumo_por_regra, rodar_backtest
+from simulador_web.domain.iv_atm_decision import classificar_iv_historica
+from simulador_web.models import PlanAssetList
+
+
+def _lista(valor: str | None, conv=str) -> list:
+    if not valor:
+        return []
+    return [conv(v.strip()) for v in valor.split(",") if v.strip()]
+
+
+class Command(BaseCommand):
+    help = "Backtest de entradas Long Straddle sobre as cadeias do chain_store"
+
+    def add_arguments(self, parser):
+        alvo = parser.add_mutually_exclusive_group(required=True)
+        alvo.add_argument("--tickers", type=str, help="Tickers separados por vírgula")
+        alvo.add_argument("--plan", type=str, help="Usa os ativos do PlanAssetList do plano")
+
+        parser.add_argument("--from", dest="date_from", required=True, type=str,
+                            help="Primeira data de entrada (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", required=True, type=str,
+                            help="Última data de entrada (YYYY-MM-DD)")
+        parser.add_argument("--dias", type=str, default="1,5,10",
+                            help="Saídas D+N em pregões, separadas por vírgula (padrão: 1,5,10)")
+        parser.add_argument("--alvos", type=str, default="",
+                            help="Alvos de P&L %% separados por vírgula (ex.: 20,50)")
+        parser.add_argument("--filtro-iv", dest="filtro_iv", type=str, default="",
+                            help="Classificações de IV aceitas na entrada (ex.: Barato,Justo)")
+        parser.add_argument("--janela-iv", dest="janela_iv", type=int, default=60,
+                            help="Pregões anteriores usados nos percentis de IV (padrão: 60)")
+        parser.add_argument("--passo", type=int, default=1,
+                            help="Entrar a cada N pregões (padrão: 1)")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Processos em paralelo (padrão: nº de CPUs)")
+        parser.add_argument("--chain-store-dir", dest="chain_store_dir", type=str, default=None,
+                            help="Diretório do chain_store (padrão: CHAIN_STORE_DIR ou data/chains)")
+        parser.add_argument("--csv", type=str, default=None,
+                            help="Grava a tabela completa neste arquivo CSV")
+
+    def _regras(self, options) -> list[RegraSaida]:
+        dias = _lista(options["dias"], int)
+        alvos = _lista(options["alvos"], float)
+        filtro = tuple(_lista(options["filtro_iv"])) or None
+
+        regras = []
+        for n in dias + [None]:
+            nome_n = f"D+{n}" if n is not None else "VENC"
+            regras.append(RegraSaida(nome=nome_n, dias=n, filtro_iv=filtro))
+            for a in alvos:
+                regras.append(
+                    RegraSaida(nome=f"{nome_n}|alvo{a:g}%", dias=n, alvo_pct=a, filtro_iv=filtro)
+                )
+        return regras
+
+    def handle(self, *args, **options):
+        if options["tickers"]:
+            tickers = [t.upper() for t in _lista(options["tickers"])]
+        else:
+            try:
+                pal = PlanAssetList.objects.get(plan=options["plan"].lower().strip())
+            except PlanAssetList.DoesNotExist:
+                raise CommandError(f"PlanAssetList não encontrado para o plano '{options['plan']}'")
+            tickers = [str(t).upper().strip() for t in (pal.assets or []) if t]
+
+        date_from = date.fromisoformat(options["date_from"])
+        date_to = date.fromisoformat(options["date_to"])
+        raiz = options["chain_store_dir"]
+        regras = self._regras(options)
+
+        # Classificação de IV por data (uma query por ticker, no processo principal)
+        classificacao_iv = {}
+        for t in tickers:
+            datas = [d for d in chain_store.datas_disponiveis(t, raiz) if date_from <= d <= date_to]
+            if datas:
+                classificacao_iv[t] = classificar_iv_historica(t, datas, limit=options["janela_iv"])
+
+        tabela = rodar_backtest(
+            tickers,
+            date_from,
+            date_to,
+            regras,
+            classificacao_iv=classificacao_iv,
+            passo=options["passo"],
+            workers=options["workers"],
+            raiz=raiz,
+        )
+
+        if not len(tabela):
+            self.stdout.write(self.style.WARNING("Nenhuma entrada encontrada no chain_store."))
+            return
+
+        self.stdout.write(f"{'Regra':<24} {'Trades':>7} {'Acerto%':>8} {'P&L% méd':>9} {'P&L% med':>9} {'P&L R$':>12} {'Dias':>5}")
+        for r in resumo_por_regra(tabela):
+            self.stdout.write(
+                f"{r['regra']:<24} {r['trades']:>7} {r['acerto_pct']:>8.1f} "
+                f"{r['pnl_pct_medio']:>9.2f} {r['pnl_pct_mediano']:>9.2f} "
+                f"{r['pnl_total']:>12.2f} {r['dias_medio']:>5.1f}"
+            )
+
+        if options["csv"]:
+            with open(options["csv"], "w", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                w.writerow(tabela.dtype.names)
+                w.writerows(tabela.tolist())
+            self.stdout.write(self.style.SUCCESS(f"Tabela gravada em {options['csv']} ({len(tabela)} linhas)"))
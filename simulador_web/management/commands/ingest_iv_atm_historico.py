@@ -1,89 +1,270 @@
-from django.core.management.base import BaseCommand
+import os
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
 
-from services.iv_historica import buscar_iv_atm_historica
-from simulador_web.models import IvAtmHistorico
+from services.chain_store import salvar_cadeia
+from simulador_web.domain.iv_atm_backfill import executar_backfill, intervalos_faltantes
+from simulador_web.models import PlanAssetList
+from simulador_web.repositories.earnings_crush_repository import recalcular_earnings_crush
+from simulador_web.repositories.iv_atm_repository import (
+    get_pregoes_sem_dados,
+    get_trade_dates_existentes,
+    get_ultimo_trade_date,
+    registrar_pregoes_sem_dados,
+    upsert_iv_atm_historico,
+)
 
 
 class Command(BaseCommand):
     help = "Ingestão do histórico diário de IV ATM via OPLAB"
 
     def add_arguments(self, parser):
-        parser.add_argument(
+        alvo = parser.add_mutually_exclusive_group(required=True)
+        alvo.add_argument(
             "--ticker",
-            required=True,
             type=str,
             help="Ticker do ativo (ex: PETR4)",
         )
+        alvo.add_argument(
+            "--tickers",
+            type=str,
+            help="Lista de tickers separados por vírgula (ex: PETR4,VALE3)",
+        )
+        alvo.add_argument(
+            "--plan",
+            type=str,
+            help="Usa os ativos do PlanAssetList do plano (ex: pro)",
+        )
         parser.add_argument(
             "--from",
             dest="date_from",
-            required=True,
             type=str,
-            help="Data inicial (YYYY-MM-DD)",
+            default=None,
+            help="Data inicial (YYYY-MM-DD). Opcional com --since-last",
         )
         parser.add_argument(
             "--to",
             dest="date_to",
-            required=True,
             type=str,
-            help="Data final (YYYY-MM-DD)",
+            default=None,
+            help="Data final (YYYY-MM-DD). Padrão: hoje",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Busca apenas os pregões B3 que ainda não estão no banco",
+        )
+        parser.add_argument(
+            "--since-last",
+            dest="since_last",
+            action="store_true",
+            help="Começa no pregão seguinte ao último gravado por ticker (cron diário)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            default=500,
+            type=int,
+            help="Registros por INSERT em lote (padrão: 500)",
+        )
+        parser.add_argument(
+            "--chunk-days",
+            dest="chunk_days",
+            default=90,
+            type=int,
+            help="Dias corridos por requisição (padrão: 90; reduz sozinho em timeout)",
+        )
+        parser.add_argument(
+            "--min-chunk-days",
+            dest="min_chunk_days",
+            default=5,
+            type=int,
+            help="Menor bloco aceito ao reduzir após timeout (padrão: 5)",
+        )
+        parser.add_argument(
+            "--workers",
+            default=4,
+            type=int,
+            help="Requisições simultâneas à OPLAB (padrão: 4)",
+        )
+        parser.add_argument(
+            "--timeout",
+            default=6.0,
+            type=float,
+            help="Timeout por requisição em segundos (padrão: 6)",
+        )
+        parser.add_argument(
+            "--store-chains",
+            dest="store_chains",
+            action="store_true",
+            help="Grava também a cadeia completa de cada pregão no chain_store local",
+        )
+        parser.add_argument(
+            "--chain-store-dir",
+            dest="chain_store_dir",
+            type=str,
+            default=None,
+            help="Diretório do chain_store (padrão: CHAIN_STORE_DIR ou data/chains)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default=None,
+            help="Arquivo JSON de checkpoint para retomar execução interrompida",
         )
 
+    def _resolver_tickers(self, options) -> list[str]:
+        if options.get("ticker"):
+            return [options["ticker"].upper().strip()]
+
+        if options.get("tickers"):
+            tickers = [t.upper().strip() for t in options["tickers"].split(",")]
+            return [t for t in tickers if t]
+
+        plan = options["plan"].lower().strip()
+        try:
+            pal = PlanAssetList.objects.get(plan=plan)
+        except PlanAssetList.DoesNotExist:
+            raise CommandError(f"PlanAssetList não encontrado para o plano '{plan}'")
+        return [str(t).upper().strip() for t in (pal.assets or []) if t]
+
+    def _montar_intervalos(self, tickers, date_from, date_to, options):
+        """
+        Intervalos a buscar por ticker:
+        - padrão: [from, to] inteiro (reescreve o que já existe)
+        - --since-last: a partir do dia seguinte ao último pregão gravado
+        - --incremental: só os pregões faltantes, agrupados em intervalos mínimos
+          (pregões já consultados que voltaram vazios não contam como faltantes)
+        """
+        intervalos = {}
+
+        for ticker in tickers:
+            ini = date_from
+
+            if options["since_last"]:
+                ultimo = get_ultimo_trade_date(ticker)
+                if ultimo is not None:
+                    ini = ultimo + timedelta(days=1)
+                elif ini is None:
+                    self.stdout.write(
+                        self.style.WARNING(f"{ticker}: sem histórico e sem --from, ignorado.")
+                    )
+                    continue
+
+            if ini > date_to:
+                continue
+
+            if options["incremental"]:
+                existentes = get_trade_dates_existentes(ticker, ini, date_to)
+                existentes |= get_pregoes_sem_dados(ticker, ini, date_to)
+                trechos = intervalos_faltantes(ini, date_to, existentes)
+            elif options["since_last"]:
+                # tudo após o último gravado falta; só recorta para pregões
+                trechos = intervalos_faltantes(ini, date_to, set())
+            else:
+                trechos = [(ini, date_to)]
+
+            if trechos:
+                intervalos[ticker] = trechos
+
+        return intervalos
+
     def handle(self, *args, **options):
-        ticker = options["ticker"].upper()
-        date_from = options["date_from"]
-        date_to = options["date_to"]
+        tickers = self._resolver_tickers(options)
+        batch_size = options["batch_size"]
+        checkpoint = options["checkpoint"]
+
+        date_from = date.fromisoformat(options["date_from"]) if options["date_from"] else None
+        date_to = (
+            date.fromisoformat(options["date_to"]) if options["date_to"]
+            else timezone.localdate()
+        )
+
+        if not tickers:
+            raise CommandError("Nenhum ticker para processar.")
+        if date_from is None and not options["since_last"]:
+            raise CommandError("--from é obrigatório (exceto com --since-last)")
+        if date_from is not None and date_from > date_to:
+            raise CommandError("--from deve ser anterior ou igual a --to")
 
         self.stdout.write(
             self.style.NOTICE(
-                f"Iniciando ingestão IV ATM | {ticker} | {date_from} → {date_to}"
+                f"Iniciando ingestão IV ATM | {','.join(tickers)} | "
+                f"{date_from or 'último gravado'} → {date_to}"
             )
         )
 
-        dados = buscar_iv_atm_historica(
-            ticker=ticker,
-            date_from=date_from,
-            date_to=date_to,
-        )
-
-        if not dados:
-            self.stdout.write(self.style.WARNING("Nenhum dado retornado."))
+        intervalos = self._montar_intervalos(tickers, date_from, date_to, options)
+        if not intervalos:
+            self.stdout.write(self.style.SUCCESS("Nada a buscar: histórico já completo."))
             return
 
-        inseridos = 0
-        atualizados = 0
-
-        with transaction.atomic():
-            for d in dados:
-                obj, created = IvAtmHistorico.objects.update_or_create(
-                    ticker=d["ticker"],
-                    trade_date=d["trade_date"],
-                    defaults={
-                        "spot_price": d["spot_price"],
-
-                        "call_symbol": d["call"]["symbol"],
-                        "call_due_date": d["call"]["due_date"],
-                        "call_days_to_maturity": d["call"]["days_to_maturity"],
-                        "call_premium": d["call"]["premium"],
-                        "call_volatility": d["call"]["volatility"],
-
-                        "put_symbol": d["put"]["symbol"],
-                        "put_due_date": d["put"]["due_date"],
-                        "put_days_to_maturity": d["put"]["days_to_maturity"],
-                        "put_premium": d["put"]["premium"],
-                        "put_volatility": d["put"]["volatility"],
-
-                        "iv_atm_mean": d["iv_atm_mean"],
-                    },
+        for ticker, trechos in intervalos.items():
+            self.stdout.write(
+                f"{ticker}: " + ", ".join(f"{a} → {b}" for a, b in trechos)
+            )
+
+        totais = {"inseridos": 0, "atualizados": 0, "sem_dados": 0}
+        hoje = timezone.localdate()
+
+        def _gravar(ticker, ini, fim, dados):
+            # consulta concluída: pregões que não vieram não são buscados de novo
+            totais["sem_dados"] += registrar_pregoes_sem_dados(ticker, ini, fim, dados, hoje)
+            if not dados:
+                return
+            with transaction.atomic():
+                inseridos, atualizados = upsert_iv_atm_historico(
+                    dados,
+                    batch_size=batch_size,
+                )
+            totais["inseridos"] += inseridos
+            totais["atualizados"] += atualizados
+
+        raiz = options["chain_store_dir"]
+
+        def _salvar_cadeia(ticker, trade_date, rows):
+            salvar_cadeia(ticker, trade_date, rows, raiz=raiz)
+
+        ao_receber_dia = _salvar_cadeia if options["store_chains"] else None
+
+        resumo = executar_backfill(
+            intervalos,
+            _gravar,
+            chunk_dias=options["chunk_days"],
+            min_chunk_dias=options["min_chunk_days"],
+            workers=options["workers"],
+            timeout=options["timeout"],
+            checkpoint_path=checkpoint,
+            ao_receber_dia=ao_receber_dia,
+            log=self.stdout.write,
+        )
+
+        if resumo["falhas"]:
+            for ticker, ini, fim, motivo in resumo["falhas"]:
+                self.stdout.write(
+                    self.style.ERROR(f"Falha | {ticker} | {ini} → {fim} | {motivo}")
                 )
-                if created:
-                    inseridos += 1
-                else:
-                    atualizados += 1
+        elif checkpoint and os.path.exists(checkpoint):
+            # execução completa: checkpoint não é mais necessário
+            os.remove(checkpoint)
+
+        if not resumo["registros"]:
+            self.stdout.write(self.style.WARNING("Nenhum dado retornado."))
+        else:
+            # bulk_create não dispara os sinais: atualiza a tabela de crush aqui
+            for ticker in intervalos:
+                n = recalcular_earnings_crush(ticker)
+                if n:
+                    self.stdout.write(f"{ticker}: IV crush recalculado ({n} eventos)")
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Ingestão concluída | Inseridos: {inseridos} | Atualizados: {atualizados}"
+                f"Ingestão concluída | Blocos: {resumo['blocos']} | "
+                f"Timeouts: {resumo['timeouts']} | Falhas: {len(resumo['falhas'])} | "
+                f"Inseridos: {totais['inseridos']} | Atualizados: {totais['atualizados']} | "
+                f"Pregões sem dados: {totais['sem_dados']}"
             )
         )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from simulador_web.models import EarningsDate
+from simulador_web.repositories.earnings_crush_repository import recalcular_earnings_crush
+
+
+class Command(BaseCommand):
+    help = "Recalcula a tabela materializada de IV crush por earnings (EarningsIvCrush)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tickers",
+            type=str,
+            default=None,
+            help="Lista de tickers separados por vírgula (padrão: todos com EarningsDate)",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["tickers"]:
+            tickers = [t.strip().upper() for t in opts["tickers"].split(",") if t.strip()]
+        else:
+            tickers = sorted(set(
+                EarningsDate.objects.values_list("ticker", flat=True).distinct()
+            ))
+
+        total = 0
+        for ticker in tickers:
+            n = recalcular_earnings_crush(ticker)
+            total += n
+            self.stdout.write(f"{ticker}: {n} eventos")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {total} eventos recalculados em {len(tickers)} ativos"
+        ))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+
+from core import cache_warmer
+
+
+class Command(BaseCommand):
+    help = "Aquece o cache do screener para os ativos do PlanAssetList (alinhado ao pregão B3)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Uma rodada e sai (padrão: laço contínuo seguindo o pregão)",
+        )
+        parser.add_argument(
+            "--tickers",
+            type=str,
+            default=None,
+            help="Lista de tickers separados por vírgula (padrão: todos os planos)",
+        )
+        parser.add_argument(
+            "--concorrencia",
+            type=int,
+            default=cache_warmer.CONCORRENCIA,
+            help=f"Ativos simultâneos (padrão: {cache_warmer.CONCORRENCIA})",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=int,
+            default=cache_warmer.INTERVALO_PREGAO,
+            help=f"Segundos entre rodadas no pregão (padrão: {cache_warmer.INTERVALO_PREGAO})",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=int,
+            default=cache_warmer.JITTER,
+            help=f"Variação aleatória do intervalo, em segundos (padrão: {cache_warmer.JITTER})",
+        )
+
+    def handle(self, *args, **opts):
+        tickers = None
+        if opts["tickers"]:
+            tickers = [t.strip().upper() for t in opts["tickers"].split(",") if t.strip()]
+
+        if opts["once"]:
+            resumo = cache_warmer.aquecer(tickers, concorrencia=opts["concorrencia"])
+            for t, st in cache_warmer.estado_warmer()["tickers"].items():
+                msg = f"{t}: linhas={st['linhas']} {st['duracao_s']}s"
+                if st["ultimo_erro"]:
+                    self.stdout.write(self.style.WARNING(f"{msg} | erro: {st['ultimo_erro']}"))
+                else:
+                    self.stdout.write(msg)
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {resumo['ok']}/{resumo['tickers']} ativos aquecidos em {resumo['segundos']}s"
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS("Warmer em laço (Ctrl+C para sair)"))
+        try:
+            cache_warmer.rodar_loop(
+                intervalo=opts["intervalo"],
+                jitter=opts["jitter"],
+                concorrencia=opts["concorrencia"],
+                tickers=tickers,
+            )
+        except KeyboardInterrupt:
+            cache_warmer.parar()
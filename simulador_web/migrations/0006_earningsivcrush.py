@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulador_web', '0005_earningsdate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningsIvCrush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=20)),
+                ('earnings_date', models.DateField()),
+                ('announcement_time', models.CharField(blank=True, max_length=10, null=True)),
+                ('pregao_antes', models.DateField(null=True)),
+                ('pregao_depois', models.DateField(null=True)),
+                ('iv_d1', models.DecimalField(decimal_places=6, max_digits=10, null=True)),
+                ('iv_d0', models.DecimalField(decimal_places=6, max_digits=10, null=True)),
+                ('iv_p1', models.DecimalField(decimal_places=6, max_digits=10, null=True)),
+                ('spot_antes', models.DecimalField(decimal_places=4, max_digits=15, null=True)),
+                ('spot_depois', models.DecimalField(decimal_places=4, max_digits=15, null=True)),
+                ('crush_pct', models.FloatField(null=True)),
+                ('move_pct', models.FloatField(null=True)),
+                ('move_implicito_pct', models.FloatField(null=True)),
+                ('razao_move', models.FloatField(null=True)),
+                ('eventos_media', models.IntegerField(default=0)),
+                ('crush_medio_pct', models.FloatField(null=True)),
+                ('move_medio_pct', models.FloatField(null=True)),
+                ('razao_move_media', models.FloatField(null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'earnings_iv_crush',
+                'indexes': [models.Index(fields=['ticker', 'earnings_date'], name='earnings_iv_ticker_1c9453_idx')],
+                'unique_together': {('ticker', 'earnings_date')},
+            },
+        ),
+    ]
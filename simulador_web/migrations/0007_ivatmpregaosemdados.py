@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulador_web', '0006_earningsivcrush'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IvAtmPregaoSemDados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=20)),
+                ('trade_date', models.DateField()),
+                ('verificado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'iv_atm_pregao_sem_dados',
+                'indexes': [models.Index(fields=['ticker', 'trade_date'], name='iv_atm_preg_ticker_df0e9e_idx')],
+                'unique_together': {('ticker', 'trade_date')},
+            },
+        ),
+    ]
@@ -138,6 +138,27 @@ class IvAtmHistorico(models.Model):
         return f"{self.ticker} - {self.trade_date}"
 
 
+class IvAtmPregaoSemDados(models.Model):
+    """
+    Pregão B3 já consultado na OPLAB que voltou sem IV ATM para o ticker
+    (feriado local, ativo sem negócio). O --incremental do
+    ingest_iv_atm_historico pula essas datas em vez de buscá-las sempre.
+    """
+    ticker = models.CharField(max_length=20)
+    trade_date = models.DateField()
+    verificado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "iv_atm_pregao_sem_dados"
+        unique_together = ("ticker", "trade_date")
+        indexes = [
+            models.Index(fields=["ticker", "trade_date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker} - {self.trade_date} (sem dados)"
+
+
 class EarningsDate(models.Model):
     ANNOUNCEMENT_CHOICES = (
         ("ANTES", "Antes do pregão"),
@@ -167,6 +188,66 @@ class EarningsDate(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # mesmos índice/unique da 0005_earningsdate
+        unique_together = ("ticker", "earnings_date")
+        indexes = [
+            models.Index(fields=["ticker", "earnings_date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker} - {self.earnings_date}"
+
+
+# =========================================================
+# EARNINGS × IV — TABELA MATERIALIZADA (CRUSH POR EVENTO)
+# =========================================================
+
+class EarningsIvCrush(models.Model):
+    """
+    Um evento de earnings com a IV ATM antes/depois, o crush, o movimento
+    do spot × movimento implícito e as médias dos últimos N eventos.
+    Derivada de EarningsDate + IvAtmHistorico; recalculada por
+    simulador_web.repositories.earnings_crush_repository.
+    """
+    ticker = models.CharField(max_length=20)
+    earnings_date = models.DateField()
+    announcement_time = models.CharField(max_length=10, null=True, blank=True)
+
+    # Pregões usados (antes/depois do anúncio, conforme announcement_time)
+    pregao_antes = models.DateField(null=True)
+    pregao_depois = models.DateField(null=True)
+
+    # IV ATM em D-1 / D0 / D+1
+    iv_d1 = models.DecimalField(max_digits=10, decimal_places=6, null=True)
+    iv_d0 = models.DecimalField(max_digits=10, decimal_places=6, null=True)
+    iv_p1 = models.DecimalField(max_digits=10, decimal_places=6, null=True)
+
+    spot_antes = models.DecimalField(max_digits=15, decimal_places=4, null=True)
+    spot_depois = models.DecimalField(max_digits=15, decimal_places=4, null=True)
+
+    # Evento (%)
+    crush_pct = models.FloatField(null=True)
+    move_pct = models.FloatField(null=True)
+    move_implicito_pct = models.FloatField(null=True)
+    razao_move = models.FloatField(null=True)
+
+    # Médias dos últimos N eventos até este (inclusive)
+    eventos_media = models.IntegerField(default=0)
+    crush_medio_pct = models.FloatField(null=True)
+    move_medio_pct = models.FloatField(null=True)
+    razao_move_media = models.FloatField(null=True)
+
+    # Auditoria
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "earnings_iv_crush"
+        unique_together = ("ticker", "earnings_date")
+        indexes = [
+            models.Index(fields=["ticker", "earnings_date"]),
+        ]
+
     def __str__(self):
         return f"{self.ticker} - {self.earnings_date}"
 
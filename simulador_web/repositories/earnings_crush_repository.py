@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from simulador_web.domain.earnings_crush import calcular_eventos
+from simulador_web.models import EarningsDate, EarningsIvCrush, IvAtmHistorico
+
+EARNINGS_CRUSH_UPDATE_FIELDS = [
+    "announcement_time",
+    "pregao_antes",
+    "pregao_depois",
+    "iv_d1",
+    "iv_d0",
+    "iv_p1",
+    "spot_antes",
+    "spot_depois",
+    "crush_pct",
+    "move_pct",
+    "move_implicito_pct",
+    "razao_move",
+    "eventos_media",
+    "crush_medio_pct",
+    "move_medio_pct",
+    "razao_move_media",
+    "atualizado_em",
+]
+
+
+def recalcular_earnings_crush(ticker: str, hoje=None) -> int:
+    """
+    Recalcula a tabela EarningsIvCrush do ticker: todos os earnings
+    <= hoje contra a série de IvAtmHistorico (duas leituras + um upsert).
+    Eventos apagados do EarningsDate saem da tabela. Retorna nº de eventos.
+    """
+    ticker = ticker.upper().strip()
+    hoje = hoje or timezone.localdate()
+
+    eventos = list(
+        EarningsDate.objects
+        .filter(ticker=ticker, earnings_date__lte=hoje)
+        .order_by("earnings_date")
+        .values_list("earnings_date", "announcement_time")
+    )
+
+    serie = []
+    if eventos:
+        serie = list(
+            IvAtmHistorico.objects
+            .filter(ticker=ticker)
+            .order_by("trade_date")
+            .values_list("trade_date", "iv_atm_mean", "spot_price", "call_premium", "put_premium")
+        )
+
+    agora = timezone.now()
+    registros = [
+        EarningsIvCrush(ticker=ticker, atualizado_em=agora, **ev)
+        for ev in calcular_eventos(serie, eventos)
+    ]
+
+    with transaction.atomic():
+        (
+            EarningsIvCrush.objects
+            .filter(ticker=ticker)
+            .exclude(earnings_date__in=[e[0] for e in eventos])
+            .delete()
+        )
+        if registros:
+            EarningsIvCrush.objects.bulk_create(
+                registros,
+                update_conflicts=True,
+                unique_fields=["ticker", "earnings_date"],
+                update_fields=EARNINGS_CRUSH_UPDATE_FIELDS,
+            )
+
+    return len(registros)
+
+
+async def aget_earnings_crush(ticker: str, hoje):
+    """Linha do último earnings <= hoje (ou None): uma query, pelo índice (ticker, earnings_date)."""
+    return await (
+        EarningsIvCrush.objects
+        .filter(ticker=ticker.upper(), earnings_date__lte=hoje)
+        .order_by("-earnings_date")
+        .afirst()
+    )
+
+
+def ranking_earnings_crush(tickers=None, hoje=None) -> list[EarningsIvCrush]:
+    """
+    Último evento de cada ticker, ordenado pelo crush médio histórico
+    (maior primeiro; sem média no fim). `tickers` restringe a lista.
+    """
+    hoje = hoje or timezone.localdate()
+    ultimo = (
+        EarningsIvCrush.objects
+        .filter(ticker=OuterRef("ticker"), earnings_date__lte=hoje)
+        .order_by("-earnings_date")
+        .values("earnings_date")[:1]
+    )
+    qs = EarningsIvCrush.objects.filter(earnings_date=Subquery(ultimo))
+    if tickers:
+        qs = qs.filter(ticker__in=[t.upper().strip() for t in tickers])
+    return list(qs.order_by(F("crush_medio_pct").desc(nulls_last=True), "ticker"))
@@ -0,0 +1,16 @@
+from simulador_web.models import EarningsDate
+
+
+async def aget_earnings_ultimo_proximo(ticker: str, hoje):
+    """
+    (último earnings <= hoje, próximo earnings >= hoje) do ticker numa
+    query só: a tabela tem poucas datas por ativo (uma por trimestre).
+    """
+    ultimo = proximo = None
+    qs = EarningsDate.objects.filter(ticker=ticker).order_by("earnings_date")
+    async for e in qs:
+        if e.earnings_date <= hoje:
+            ultimo = e
+        if e.earnings_date >= hoje and proximo is None:
+            proximo = e
+    return ultimo, proximo
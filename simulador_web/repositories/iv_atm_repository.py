@@ -1,4 +1,11 @@
-from simulador_web.models import IvAtmHistorico
+from datetime import timedelta
+
+from core.b3_calendar import pregoes_entre
+from simulador_web.models import IvAtmHistorico, IvAtmPregaoSemDados
+
+# Pregões mais novos que isso não são marcados como "sem dados": a OPLAB
+# pode ainda não ter publicado o dia
+CARENCIA_SEM_DADOS_DIAS = 5
 
 
 def get_iv_atm_historico_por_pregoes(
@@ -60,3 +67,189 @@ def get_iv_atm_por_data(
         raise ValueError(f"Modo inválido: {modo}")
 
     return r.iv_atm_mean if r else None
+
+# --------------------------------------------------
+# Leituras assíncronas da tela LS (async ORM)
+# --------------------------------------------------
+async def aget_iv_atm_ultimos(ticker: str, dias: int = 10) -> list:
+    """iv_atm_mean dos últimos `dias` pregões, do mais recente para o mais antigo."""
+    qs = (
+        IvAtmHistorico.objects
+        .filter(ticker=ticker.upper())
+        .order_by("-trade_date")
+        .values_list("iv_atm_mean", flat=True)[:dias]
+    )
+    return [v async for v in qs]
+
+
+def get_iv_atm_serie(ticker: str, date_from=None, date_to=None) -> list[tuple]:
+    """
+    Série (trade_date, iv_atm_mean) ascendente, numa única query.
+    """
+    qs = IvAtmHistorico.objects.filter(ticker=ticker.upper())
+    if date_from is not None:
+        qs = qs.filter(trade_date__gte=date_from)
+    if date_to is not None:
+        qs = qs.filter(trade_date__lte=date_to)
+    return list(qs.order_by("trade_date").values_list("trade_date", "iv_atm_mean"))
+
+
+def get_spot_serie(ticker: str, limit: int | None = None) -> list[float]:
+    """
+    Spots diários (spot_price) ascendentes por data; `limit` = últimos N pregões.
+    """
+    qs = (
+        IvAtmHistorico.objects
+        .filter(ticker=ticker.upper())
+        .order_by("-trade_date")
+        .values_list("spot_price", flat=True)
+    )
+    if limit is not None:
+        qs = qs[:limit]
+    return [float(v) for v in reversed(list(qs))]
+
+
+def get_trade_dates_existentes(ticker: str, date_from, date_to) -> set:
+    """Datas de pregão já gravadas para o ticker no intervalo (inclusivo)."""
+    return set(
+        IvAtmHistorico.objects
+        .filter(
+            ticker=ticker.upper(),
+            trade_date__gte=date_from,
+            trade_date__lte=date_to,
+        )
+        .values_list("trade_date", flat=True)
+    )
+
+
+def get_pregoes_sem_dados(ticker: str, date_from, date_to) -> set:
+    """Pregões já consultados que voltaram vazios para o ticker no intervalo."""
+    return set(
+        IvAtmPregaoSemDados.objects
+        .filter(
+            ticker=ticker.upper(),
+            trade_date__gte=date_from,
+            trade_date__lte=date_to,
+        )
+        .values_list("trade_date", flat=True)
+    )
+
+
+def registrar_pregoes_sem_dados(ticker: str, date_from, date_to, dados: list[dict], hoje) -> int:
+    """
+    Marca os pregões B3 de [date_from, date_to] que a consulta (`dados`, já
+    concluída) não trouxe, exceto os dos últimos CARENCIA_SEM_DADOS_DIAS.
+    Retorna quantos pregões ficaram marcados.
+    """
+    ticker = ticker.upper()
+    limite = min(date_to, hoje - timedelta(days=CARENCIA_SEM_DADOS_DIAS))
+    if limite < date_from:
+        return 0
+
+    retornados = {d["trade_date"] for d in dados if d["ticker"].upper() == ticker}
+    vazios = [d for d in pregoes_entre(date_from, limite) if d not in retornados]
+    if vazios:
+        IvAtmPregaoSemDados.objects.bulk_create(
+            [IvAtmPregaoSemDados(ticker=ticker, trade_date=d) for d in vazios],
+            ignore_conflicts=True,
+        )
+    return len(vazios)
+
+
+def get_ultimo_trade_date(ticker: str):
+    """Último pregão gravado para o ticker (ou None)."""
+    return (
+        IvAtmHistorico.objects
+        .filter(ticker=ticker.upper())
+        .order_by("-trade_date")
+        .values_list("trade_date", flat=True)
+        .first()
+    )
+
+
+IV_ATM_UPDATE_FIELDS = [
+    "spot_price",
+    "call_symbol",
+    "call_due_date",
+    "call_days_to_maturity",
+    "call_premium",
+    "call_volatility",
+    "put_symbol",
+    "put_due_date",
+    "put_days_to_maturity",
+    "put_premium",
+    "put_volatility",
+    "iv_atm_mean",
+]
+
+
+def _iv_atm_from_dict(d: dict) -> IvAtmHistorico:
+    return IvAtmHistorico(
+        ticker=d["ticker"],
+        trade_date=d["trade_date"],
+        spot_price=d["spot_price"],
+
+        call_symbol=d["call"]["symbol"],
+        call_due_date=d["call"]["due_date"],
+        call_days_to_maturity=d["call"]["days_to_maturity"],
+        call_premium=d["call"]["premium"],
+        call_volatility=d["call"]["volatility"],
+
+        put_symbol=d["put"]["symbol"],
+        put_due_date=d["put"]["due_date"],
+        put_days_to_maturity=d["put"]["days_to_maturity"],
+        put_premium=d["put"]["premium"],
+        put_volatility=d["put"]["volatility"],
+
+        iv_atm_mean=d["iv_atm_mean"],
+    )
+
+
+def upsert_iv_atm_historico(
+    dados: list[dict],
+    batch_size: int = 500,
+) -> tuple[int, int]:
+    """
+    Grava em lote os registros de IV ATM (formato de buscar_iv_atm_historica).
+
+    - Um SELECT (datas já existentes) + um INSERT ... ON CONFLICT por lote
+    - Conflito em (ticker, trade_date) atualiza os campos de mercado
+    - Retorna (inseridos, atualizados)
+    """
+    batch_size = max(1, int(batch_size or 1))
+
+    # Última ocorrência vence (mesmo comportamento do update_or_create em loop)
+    por_chave = {}
+    for d in dados:
+        por_chave[(d["ticker"], d["trade_date"])] = d
+    registros = list(por_chave.values())
+
+    inseridos = 0
+    atualizados = 0
+
+    for i in range(0, len(registros), batch_size):
+        lote = registros[i:i + batch_size]
+
+        existentes = 0
+        por_ticker = {}
+        for d in lote:
+            por_ticker.setdefault(d["ticker"], []).append(d["trade_date"])
+        for ticker, datas in por_ticker.items():
+            existentes += (
+                IvAtmHistorico.objects
+                .filter(ticker=ticker, trade_date__in=datas)
+                .count()
+            )
+
+        IvAtmHistorico.objects.bulk_create(
+            [_iv_atm_from_dict(d) for d in lote],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["ticker", "trade_date"],
+            update_fields=IV_ATM_UPDATE_FIELDS,
+        )
+
+        atualizados += existentes
+        inseridos += len(lote) - existentes
+
+    return inseridos, atualizados
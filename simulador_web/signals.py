@@ -0,0 +1,29 @@
+"""
+Mantém a tabela materializada EarningsIvCrush em dia quando EarningsDate
+ou IvAtmHistorico mudam pelo ORM (admin, save/delete).
+
+A ingestão em lote (bulk_create) não dispara sinais: o comando
+ingest_iv_atm_historico recalcula os tickers no fim; para o resto há
+`manage.py recalcular_earnings_crush`.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from simulador_web.models import EarningsDate, IvAtmHistorico
+
+
+def _recalcular(ticker):
+    from simulador_web.repositories.earnings_crush_repository import recalcular_earnings_crush
+
+    try:
+        recalcular_earnings_crush(ticker)
+    except Exception as e:
+        print(f"[EARNINGS-CRUSH] ❌ {ticker}: {e}", flush=True)
+
+
+@receiver([post_save, post_delete], sender=EarningsDate)
+@receiver([post_save, post_delete], sender=IvAtmHistorico)
+def earnings_crush_ao_mudar(sender, instance, **kwargs):
+    ticker = instance.ticker
+    transaction.on_commit(lambda: _recalcular(ticker))
@@ -1,3 +1,1611 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+
+# ------------------------------------------------------------
+# IV ATM histórico — upsert em lote
+# ------------------------------------------------------------
+def _registro_iv(ticker, trade_date, iv):
+    """Registro no formato de buscar_iv_atm_historica."""
+    perna = lambda sym: {
+        "symbol": sym,
+        "due_date": date(2024, 4, 19),
+        "days_to_maturity": 20,
+        "premium": 1.5,
+        "volatility": iv,
+    }
+    return {
+        "ticker": ticker,
+        "trade_date": trade_date,
+        "spot_price": 30.0,
+        "call": perna(f"{ticker}C"),
+        "put": perna(f"{ticker}P"),
+        "iv_atm_mean": iv,
+    }
+
+
+class UpsertIvAtmHistoricoTests(TestCase):
+    def test_contagem_inseridos_e_atualizados(self):
+        from simulador_web.models import IvAtmHistorico
+        from simulador_web.repositories.iv_atm_repository import upsert_iv_atm_historico
+
+        dias = [date(2024, 3, d) for d in (4, 5, 6)]
+        self.assertEqual(
+            upsert_iv_atm_historico([_registro_iv("PETR4", d, 30.0) for d in dias], batch_size=2),
+            (3, 0),
+        )
+
+        # 2 existentes + 1 novo, com chave repetida no lote (a última vence)
+        dados = [
+            _registro_iv("PETR4", dias[0], 31.0),
+            _registro_iv("PETR4", dias[1], 32.0),
+            _registro_iv("PETR4", dias[1], 33.0),
+            _registro_iv("VALE3", dias[0], 25.0),
+        ]
+        self.assertEqual(upsert_iv_atm_historico(dados, batch_size=2), (1, 2))
+
+        self.assertEqual(IvAtmHistorico.objects.count(), 4)
+        iv = IvAtmHistorico.objects.get(ticker="PETR4", trade_date=dias[1]).iv_atm_mean
+        self.assertEqual(float(iv), 33.0)
+
+
+# ------------------------------------------------------------
+# Backfill de IV — intervalos de datas
+# ------------------------------------------------------------
+class SubtrairIntervalosTests(SimpleTestCase):
+    def test_trechos_nao_cobertos(self):
+        from simulador_web.domain.iv_atm_backfill import subtrair_intervalos
+
+        d = lambda dia: date(2024, 1, dia)
+        feitos = [(d(10), d(12)), (d(1), d(3)), (d(20), d(31))]
+        self.assertEqual(
+            subtrair_intervalos(d(1), d(31), feitos),
+            [(d(4), d(9)), (d(13), d(19))],
+        )
+
+    def test_sem_feitos_e_tudo_coberto(self):
+        from simulador_web.domain.iv_atm_backfill import subtrair_intervalos
+
+        d = lambda dia: date(2024, 1, dia)
+        self.assertEqual(subtrair_intervalos(d(5), d(9), []), [(d(5), d(9))])
+        self.assertEqual(subtrair_intervalos(d(5), d(9), [(d(1), d(31))]), [])
+        # feitos fora da faixa não contam
+        self.assertEqual(
+            subtrair_intervalos(d(5), d(9), [(d(1), d(2)), (d(20), d(25))]),
+            [(d(5), d(9))],
+        )
+
+
+class IntervalosFaltantesTests(SimpleTestCase):
+    # 14/11/2024 (qui) ... 22/11/2024 (sex); 15/11 e 20/11 são feriados
+    def test_agrupa_pregoes_faltantes_consecutivos(self):
+        from simulador_web.domain.iv_atm_backfill import intervalos_faltantes
+
+        d = lambda dia: date(2024, 11, dia)
+        self.assertEqual(
+            intervalos_faltantes(d(14), d(22), {d(14), d(21)}),
+            [(d(18), d(19)), (d(22), d(22))],
+        )
+
+    def test_feriado_nao_quebra_intervalo(self):
+        from simulador_web.domain.iv_atm_backfill import intervalos_faltantes
+
+        d = lambda dia: date(2024, 11, dia)
+        self.assertEqual(intervalos_faltantes(d(14), d(22), {d(14), d(22)}), [(d(18), d(21))])
+        self.assertEqual(intervalos_faltantes(d(15), d(17), set()), [])
+        self.assertEqual(
+            intervalos_faltantes(d(14), d(22), {d(14), d(18), d(19), d(21), d(22)}),
+            [],
+        )
+
+
+# ------------------------------------------------------------
+# Histórico de opções — parser incremental do array JSON
+# ------------------------------------------------------------
+def _pedacos(dados: bytes, tamanho: int):
+    return [dados[i:i + tamanho] for i in range(0, len(dados), tamanho)]
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    itens = [
+        {"symbol": "PETRK300", "strike": 30.0, "iv": 32.5, "obs": "ação, [vírgula]"},
+        {"symbol": "PETRW300", "due_date": "2024-11-14T00:00:00.000Z", "n": [1, [2, {"x": None}]]},
+        'texto com ] e , e " aspas \\ barra',
+        12345678901234567890,
+        [],
+    ]
+
+    def test_qualquer_fronteira_de_pedaco(self):
+        from services.iv_historica import _iter_json_array
+
+        dados = (" \n" + json.dumps(self.itens, ensure_ascii=False, indent=1) + "\n").encode("utf-8")
+        for tamanho in range(1, len(dados) + 1):
+            with self.subTest(tamanho=tamanho):
+                self.assertEqual(list(_iter_json_array(_pedacos(dados, tamanho))), self.itens)
+
+    def test_vazio_e_null(self):
+        from services.iv_historica import _iter_json_array
+
+        for dados in (b"[]", b" [ ] ", b"null"):
+            for tamanho in (1, 2, 64):
+                self.assertEqual(list(_iter_json_array(_pedacos(dados, tamanho))), [])
+
+    def test_resposta_invalida(self):
+        from services.iv_historica import _iter_json_array
+
+        with self.assertRaises(ValueError):
+            list(_iter_json_array([b'{"erro": 1}']))
+        for tamanho in (1, 3, 64):
+            with self.assertRaises(ValueError):
+                list(_iter_json_array(_pedacos(b'[{"a": 1}, {"b": 2', tamanho)))
+            with self.assertRaises(ValueError):
+                list(_iter_json_array(_pedacos(b'[{"a": 1}', tamanho)))
+
+
+# ------------------------------------------------------------
+# Armazém colunar de cadeias (services.chain_store)
+# ------------------------------------------------------------
+class ChainStoreTests(SimpleTestCase):
+    # histórico da OPLAB fora de ordem, IV em %, prêmio sem last/close
+    rows = [
+        {"symbol": "PETRX32", "category": "PUT", "due_date": "2024-04-19T00:00:00.000Z", "strike": 32,
+         "bid": 2.0, "ask": 2.1, "iv": 35.0, "spot": {"price": 30.5}, "time": "2024-03-04T17:00:00Z"},
+        {"symbol": "PETRD28", "category": "CALL", "due_date": "2024-04-19", "strike": 28,
+         "premium": 2.9, "iv": 0.31, "spot_price": 30.5, "time": 1709571600000},
+        {"symbol": "PETRC30", "category": "CALL", "due_date": "2024-03-15", "strike": 30,
+         "bid": 0.9, "ask": 1.0, "close": 0.95, "iv": 33.0, "spot_price": 30.5},
+        {"symbol": "PETRO30", "category": "PUT", "due_date": "2024-03-15", "strike": 30,
+         "bid": 0.5, "ask": 0.6, "iv": 34.0, "spot_price": 30.5},
+        {"symbol": "PETRD32", "category": "CALL", "due_date": "2024-04-19", "strike": 32,
+         "bid": 0.7, "ask": 0.8, "iv": 32.0, "spot_price": 30.5},
+        {"symbol": "LIXO", "category": "STOCK", "due_date": "2024-04-19", "strike": 1},
+        {"symbol": "SEMSTRIKE", "category": "CALL", "due_date": "2024-04-19", "strike": 0},
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_ida_e_volta(self):
+        from services import chain_store
+
+        dia = date(2024, 3, 4)
+        self.assertEqual(chain_store.salvar_cadeia("petr4", dia, self.rows, raiz=self.tmp.name), 5)
+        self.assertTrue(chain_store.tem_cadeia("PETR4", dia, raiz=self.tmp.name))
+
+        linhas, spot = chain_store.carregar_cadeia("PETR4", dia, raiz=self.tmp.name)
+        self.assertEqual(spot, 30.5)
+        # ordenada por (due_date, strike, category)
+        self.assertEqual(
+            [(r["due_date"], r["strike"], r["category"]) for r in linhas],
+            [
+                ("2024-03-15", 30.0, "CALL"),
+                ("2024-03-15", 30.0, "PUT"),
+                ("2024-04-19", 28.0, "CALL"),
+                ("2024-04-19", 32.0, "CALL"),
+                ("2024-04-19", 32.0, "PUT"),
+            ],
+        )
+        por_simbolo = {r["symbol"]: r for r in linhas}
+        self.assertAlmostEqual(por_simbolo["PETRX32"]["iv"], 0.35)
+        self.assertEqual(por_simbolo["PETRX32"]["spot_price"], 30.5)
+        self.assertEqual(por_simbolo["PETRX32"]["time"], 1709571600000)
+        self.assertEqual(por_simbolo["PETRD28"]["iv"], 0.31)
+        self.assertEqual((por_simbolo["PETRD28"]["last"], por_simbolo["PETRD28"]["close"]), (2.9, 2.9))
+        self.assertEqual(por_simbolo["PETRC30"]["contract_size"], 100)
+
+    def test_busca_por_vencimento_e_strike(self):
+        from services import chain_store
+
+        dia = date(2024, 3, 4)
+        chain_store.salvar_cadeia("PETR4", dia, self.rows, raiz=self.tmp.name)
+        cols = chain_store.carregar_colunas("PETR4", dia, raiz=self.tmp.name)
+
+        venc = chain_store.fatia_vencimento_strike(cols, "2024-04-19")
+        self.assertEqual((venc.start, venc.stop), (2, 5))
+        par = chain_store.fatia_vencimento_strike(cols, "2024-04-19T00:00:00", 32.0)
+        self.assertEqual(list(cols["symbol"][par]), ["PETRD32", "PETRX32"])
+        vazio = chain_store.fatia_vencimento_strike(cols, "2024-05-17", 30.0)
+        self.assertEqual(vazio.stop - vazio.start, 0)
+
+    def test_datas_disponiveis(self):
+        from services import chain_store
+
+        self.assertEqual(chain_store.datas_disponiveis("PETR4", raiz=self.tmp.name), [])
+        for dia in (date(2024, 3, 5), date(2024, 3, 4)):
+            chain_store.salvar_cadeia("PETR4", dia, self.rows, raiz=self.tmp.name)
+        # pastas estranhas e partições incompletas não contam
+        os.makedirs(os.path.join(self.tmp.name, "PETR4", "lixo"))
+        os.makedirs(os.path.join(self.tmp.name, "PETR4", "2024-03-06"))
+        self.assertEqual(
+            chain_store.datas_disponiveis("petr4", raiz=self.tmp.name),
+            [date(2024, 3, 4), date(2024, 3, 5)],
+        )
+
+
+# ------------------------------------------------------------
+# Backtest do Long Straddle (simulacoes.backtest_ls)
+# ------------------------------------------------------------
+class BacktestLsTests(SimpleTestCase):
+    # (pregão, (bid, ask) da CALL ou None, (bid, ask) da PUT, spot) — vencimento 15/03/2024
+    pregoes = [
+        (date(2024, 3, 11), (0.95, 1.05), (0.95, 1.05), 30.0),   # entrada: MID 2,00
+        (date(2024, 3, 12), (1.15, 1.25), (0.85, 0.95), 30.3),   # 2,10 → +5%
+        (date(2024, 3, 13), None, (0.85, 0.95), 30.3),           # CALL sem cotação: ffill
+        (date(2024, 3, 14), (1.75, 1.85), (0.55, 0.65), 31.2),   # 2,40 → +20%
+        (date(2024, 3, 15), (0.95, 1.05), (0.0, 0.1), 31.0),     # vencimento: intrínseco 1,00
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        entrada = {
+            "call": "TSTEC30", "put": "TSTEO30", "strike": 30.0, "due_date": "2024-03-15",
+            "premium_total": 2.1, "contract_size": 100,
+        }
+        patcher = mock.patch("simulacoes.backtest_ls._entrada_screener", return_value=entrada)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _gravar(self, pregoes):
+        from services import chain_store
+
+        for dia, call, put, spot in pregoes:
+            rows = []
+            for sym, cat, cot in (("TSTEC30", "CALL", call), ("TSTEO30", "PUT", put)):
+                if cot:
+                    rows.append({"symbol": sym, "category": cat, "due_date": "2024-03-15", "strike": 30.0,
+                                 "bid": cot[0], "ask": cot[1], "spot_price": spot})
+            chain_store.salvar_cadeia("TSTE4", dia, rows, raiz=self.tmp.name)
+
+    def _rodar(self, regras):
+        from simulacoes.backtest_ls import backtest_ticker
+
+        tabela = backtest_ticker("TSTE4", [date(2024, 3, 11)], regras, raiz=self.tmp.name)
+        return {r["regra"]: r for r in tabela}
+
+    def test_regras_de_saida(self):
+        from simulacoes.backtest_ls import RegraSaida
+
+        self._gravar(self.pregoes)
+        res = self._rodar([
+            RegraSaida("D+1", dias=1),
+            RegraSaida("D+2", dias=2),
+            RegraSaida("alvo15", alvo_pct=15.0),
+            RegraSaida("alvo90", alvo_pct=90.0),
+            RegraSaida("VENC"),
+        ])
+        esperado = {
+            # regra: (motivo, dias, saída, P&L %)
+            "D+1": ("DN", 1, date(2024, 3, 12), 5.0),
+            "D+2": ("DN", 2, date(2024, 3, 13), 5.0),
+            "alvo15": ("ALVO", 3, date(2024, 3, 14), 20.0),
+            "alvo90": ("VENC", 4, date(2024, 3, 15), -50.0),
+            "VENC": ("VENC", 4, date(2024, 3, 15), -50.0),
+        }
+        for regra, (motivo, dias, saida, pnl_pct) in esperado.items():
+            with self.subTest(regra):
+                r = res[regra]
+                self.assertEqual((r["motivo"], int(r["dias"])), (motivo, dias))
+                self.assertEqual(r["saida"].astype(object), saida)
+                self.assertAlmostEqual(float(r["pnl_pct"]), pnl_pct)
+                # prêmio de entrada = MID do pregão, não o ask do screener
+                self.assertAlmostEqual(float(r["premio"]), 2.0)
+                self.assertAlmostEqual(float(r["pnl"]), pnl_pct / 100.0 * 2.0 * 100)
+
+    def test_sem_dados_ate_o_vencimento(self):
+        from simulacoes.backtest_ls import RegraSaida
+
+        self._gravar(self.pregoes[:4])
+        res = self._rodar([RegraSaida("VENC"), RegraSaida("D+5", dias=5)])
+        for regra in ("VENC", "D+5"):
+            with self.subTest(regra):
+                self.assertEqual(res[regra]["motivo"], "SEM_DADOS")
+                self.assertEqual(int(res[regra]["dias"]), 3)
+                self.assertAlmostEqual(float(res[regra]["pnl_pct"]), 20.0)
+
+
+# ------------------------------------------------------------
+# Motor de estratégias (simulacoes.estrategias)
+# ------------------------------------------------------------
+def _perna(tipo, strike, premio, quantity=1, dias=20):
+    from simulacoes.base import OptionLeg
+
+    return OptionLeg(
+        symbol=f"{tipo}{strike}", type=tipo, strike=strike, premium=premio,
+        quantity=quantity, days_to_maturity=dias,
+    )
+
+
+class EstrategiasTests(SimpleTestCase):
+    def test_payoff_vencimento_straddle(self):
+        import numpy as np
+
+        from simulacoes.estrategias import payoff_vencimento
+
+        pernas = [_perna("CALL", 30.0, 1.2), _perna("PUT", 30.0, 0.9)]
+        precos = np.array([20.0, 27.9, 30.0, 32.1, 40.0])
+        np.testing.assert_allclose(
+            payoff_vencimento(precos, pernas, dias_horizonte=20),
+            [790.0, 0.0, -210.0, 0.0, 790.0],
+            atol=1e-9,
+        )
+
+    def test_analise_linear(self):
+        from simulacoes.estrategias import analise_linear
+
+        casos = {
+            "long straddle": (
+                [_perna("CALL", 30.0, 1.2), _perna("PUT", 30.0, 0.9)],
+                ([27.9, 32.1], None, -210.0),
+            ),
+            "short straddle": (
+                [_perna("CALL", 30.0, 1.2, -1), _perna("PUT", 30.0, 0.9, -1)],
+                ([27.9, 32.1], 210.0, None),
+            ),
+            "trava de alta": (
+                [_perna("CALL", 28.0, 2.5), _perna("CALL", 32.0, 0.8, -1)],
+                ([29.7], 230.0, -170.0),
+            ),
+            "venda coberta": (
+                [_perna("STOCK", 30.0, None, dias=0), _perna("CALL", 32.0, 1.0, -1)],
+                ([29.0], 300.0, -2900.0),
+            ),
+        }
+        for nome, (pernas, (bes, lucro, prejuizo)) in casos.items():
+            with self.subTest(nome):
+                r_bes, r_lucro, r_prejuizo = analise_linear(pernas)
+                self.assertEqual(r_bes, bes)
+                for obtido, esperado in ((r_lucro, lucro), (r_prejuizo, prejuizo)):
+                    if esperado is None:
+                        self.assertIsNone(obtido)
+                    else:
+                        self.assertAlmostEqual(obtido, esperado, places=6)
+
+    def test_analise_linear_bate_com_a_malha(self):
+        import numpy as np
+
+        from simulacoes.estrategias import analise_linear, break_evens_malha, payoff_vencimento
+
+        # borboleta: 4 vértices, extremos dentro da faixa
+        pernas = [
+            _perna("CALL", 28.0, 2.6),
+            _perna("CALL", 30.0, 1.2, -2),
+            _perna("CALL", 32.0, 0.4),
+        ]
+        bes, lucro, prejuizo = analise_linear(pernas)
+        malha = np.round(np.arange(20.0, 40.0 + 1e-9, 0.01), 2)
+        y = payoff_vencimento(malha, pernas, dias_horizonte=20)
+        self.assertEqual(bes, break_evens_malha(malha, y))
+        self.assertAlmostEqual(lucro, y.max(), places=6)
+        self.assertAlmostEqual(prejuizo, y.min(), places=6)
+
+    def test_malha_adaptativa_linear(self):
+        import numpy as np
+
+        from simulacoes.estrategias import malha_adaptativa, payoff_vencimento
+
+        pernas = [_perna("CALL", 30.0, 1.2), _perna("PUT", 30.0, 0.9)]
+        x = malha_adaptativa(pernas, 18.0, 42.0)
+        self.assertEqual(x.tolist(), [18.0, 27.9, 30.0, 32.1, 42.0])
+
+        # a reta entre os pontos é exata
+        denso = np.linspace(18.0, 42.0, 2401)
+        np.testing.assert_allclose(
+            np.interp(denso, x, payoff_vencimento(x, pernas)),
+            payoff_vencimento(denso, pernas),
+            atol=1e-9,
+        )
+
+    def test_malha_adaptativa_curva(self):
+        import numpy as np
+
+        from simulacoes.base import OptionLeg
+        from simulacoes.estrategias import malha_adaptativa, payoff_vencimento
+
+        # calendário: a CALL longa é marcada por BS no vencimento da curta
+        pernas = [
+            OptionLeg("C20", "CALL", 30.0, premium=0.9, quantity=-1, days_to_maturity=20, iv=0.35),
+            OptionLeg("C60", "CALL", 30.0, premium=1.9, quantity=1, days_to_maturity=60, iv=0.35),
+        ]
+        x = malha_adaptativa(pernas, 18.0, 42.0)
+        y = payoff_vencimento(x, pernas)
+        erro_max = 0.005 * (y.max() - y.min())
+
+        denso = np.linspace(18.0, 42.0, 2401)
+        erro = np.abs(np.interp(denso, x, y) - payoff_vencimento(denso, pernas))
+        self.assertLess(len(x), 101)
+        self.assertLess(erro.max(), 2 * erro_max)
+        self.assertIn(30.0, x.tolist())
+
+        self.assertLessEqual(len(malha_adaptativa(pernas, 18.0, 42.0, max_pontos=20)), 20)
+
+
+# ------------------------------------------------------------
+# Superfície teórica de P&L (simulacoes.cenarios)
+# ------------------------------------------------------------
+class SuperficiePnLTests(SimpleTestCase):
+    def setUp(self):
+        from simulacoes.cenarios import superficie_straddle
+
+        perna = {"strike": 30.0, "spot_price": 30.0, "days_to_maturity": 20, "contract_size": 100}
+        self.s = superficie_straddle(
+            {**perna, "symbol": "C", "bid": 1.1, "ask": 1.3},
+            {**perna, "symbol": "P", "bid": 0.9, "ask": 1.1},
+        )
+
+    def test_grade_e_extremos(self):
+        import numpy as np
+
+        from simulacoes.base import OptionLeg
+        from simulacoes.estrategias import payoff_vencimento
+
+        s = self.s
+        self.assertEqual(s.pnl.shape, (61, 21, 11))
+        self.assertEqual(s.pnl.dtype, np.float32)
+        self.assertAlmostEqual(s.custo_total, 220.0)
+
+        # D+0 sem choque no spot de entrada: IV implícita do MID → P&L zero
+        self.assertAlmostEqual(s.pnl_em(30.0, 0, 0.0), 0.0, delta=0.05)
+        # no vencimento a curva é o payoff (choque de IV não importa)
+        pernas = [OptionLeg("C", "CALL", 30.0, premium=1.2), OptionLeg("P", "PUT", 30.0, premium=1.0)]
+        esperado = payoff_vencimento(s.spots, pernas, dias_horizonte=0)
+        for choque in (-0.5, 0.0, 0.5):
+            np.testing.assert_allclose(s.curva_em(20, choque), esperado, atol=0.01)
+
+    def test_interpolacao_e_iv_break_even(self):
+        s = self.s
+        # entre dias da grade: média dos vizinhos
+        meio = s.curva_em(2.5, 0.0)
+        self.assertTrue(((meio - (s.curva_em(2, 0.0) + s.curva_em(3, 0.0)) / 2) ** 2 < 1e-6).all())
+
+        # long straddle: ganha com alta de IV; o choque que zera no D+0 é ~0
+        curva = s.curva_iv(0, 30.0)
+        self.assertTrue((curva[1:] > curva[:-1]).all())
+        self.assertAlmostEqual(s.iv_break_even(0, 30.0), 0.0, delta=0.01)
+        self.assertEqual(len(s.break_evens_em(20)), 2)
+
+
+# ------------------------------------------------------------
+# Matriz de crush do LS (simulacoes.cenarios)
+# ------------------------------------------------------------
+class MatrizCrushTests(SimpleTestCase):
+    def setUp(self):
+        from simulacoes.cenarios import matriz_crush
+
+        self.m = matriz_crush(30.4, 30.0, 30.0, 20 / 252, 20 / 252, 0.42, 0.38)
+
+    def _exato(self, crush):
+        import numpy as np
+
+        from simulacoes.black_scholes import black_scholes_np
+
+        f = max(0.0, 1.0 - crush / 100.0)
+        bs = black_scholes_np(
+            30.4, np.array([30.0, 30.0]), 0.0, 0.0, np.array([0.42, 0.38]) * f,
+            np.array([19 / 252, 19 / 252]), np.array([True, False]),
+        )
+        return bs["preco"], bs["delta"]
+
+    def test_niveis_da_matriz_sao_exatos(self):
+        for crush in (0.0, 25.0, 50.0):
+            with self.subTest(crush=crush):
+                r = self.m.em(crush)
+                preco, delta = self._exato(crush)
+                self.assertAlmostEqual(r["call_preco"], preco[0], places=10)
+                self.assertAlmostEqual(r["put_preco"], preco[1], places=10)
+                self.assertAlmostEqual(r["call_delta"], delta[0], places=10)
+                self.assertAlmostEqual(r["put_delta"], delta[1], places=10)
+                self.assertEqual((r["call_iv"], r["put_iv"]), (0.42, 0.38))
+
+    def test_entre_niveis_interpola(self):
+        r = self.m.em(12.5)
+        preco, delta = self._exato(12.5)
+        # passo de 5pp: erro de interpolação bem abaixo de 1 centavo
+        self.assertAlmostEqual(r["call_preco"], preco[0], delta=0.005)
+        self.assertAlmostEqual(r["put_preco"], preco[1], delta=0.005)
+        self.assertAlmostEqual(r["call_delta"], delta[0], delta=0.005)
+        self.assertAlmostEqual(r["put_delta"], delta[1], delta=0.005)
+
+    def test_fora_da_faixa_recalcula(self):
+        for crush in (-10.0, 70.0):
+            with self.subTest(crush=crush):
+                r = self.m.em(crush)
+                preco, delta = self._exato(crush)
+                self.assertAlmostEqual(r["call_preco"], preco[0], places=10)
+                self.assertAlmostEqual(r["put_delta"], delta[1], places=10)
+
+
+# ------------------------------------------------------------
+# Probabilidades fechadas × Monte Carlo
+# ------------------------------------------------------------
+class MetricasLognormaisTests(SimpleTestCase):
+    def test_bate_com_monte_carlo(self):
+        import numpy as np
+
+        from simulacoes.base import OptionLeg
+        from simulacoes.monte_carlo import simular_mc
+        from simulacoes.probabilidade import metricas_lognormais
+
+        spot, k, dias, iv = 30.0, 30.0, 21, 0.35
+        premio_c, premio_p = 1.2, 0.9
+        pernas = [
+            OptionLeg("C", "CALL", k, premium=premio_c, iv=iv, days_to_maturity=dias, spot_price=spot),
+            OptionLeg("P", "PUT", k, premium=premio_p, iv=iv, days_to_maturity=dias, spot_price=spot),
+        ]
+        n = 200_000
+        mc = simular_mc(pernas, n_caminhos=n, seed=7, trajetoria=False)
+
+        premio = premio_c + premio_p
+        m = metricas_lognormais(
+            [spot], [k], [premio], [k - premio], [k + premio], [dias / 252], [iv],
+        )
+        # tolerâncias de ~4 erros-padrão do MC
+        self.assertAlmostEqual(m["prob_lucro"][0], mc.prob_lucro, delta=4 * np.sqrt(0.25 / n))
+        self.assertAlmostEqual(
+            m["valor_esperado"][0] * 100, mc.pnl_esperado, delta=4 * mc.pnl_desvio / np.sqrt(n),
+        )
+        self.assertAlmostEqual(
+            m["prob_be_down"][0] + m["prob_be_up"][0], m["prob_lucro"][0], places=12,
+        )
+
+    def test_entradas_invalidas_viram_nan(self):
+        import numpy as np
+
+        from simulacoes.probabilidade import metricas_lognormais
+
+        m = metricas_lognormais([30.0, 0.0], [30.0, 30.0], [2.1, 2.1], [27.9, 27.9], [32.1, 32.1],
+                                [0.0, 0.1], [0.35, 0.35])
+        for campo, v in m.items():
+            with self.subTest(campo):
+                self.assertTrue(np.isnan(v).all())
+
+
+# ------------------------------------------------------------
+# Long straddle: simulação em lote × por par
+# ------------------------------------------------------------
+class LongStraddleBatchTests(SimpleTestCase):
+    casos = [
+        # (strike call, strike put, prêmio call, prêmio put, spot)
+        (30.0, 30.0, 1.2, 0.9, 30.4),   # straddle
+        (32.0, 28.0, 0.5, 0.4, 30.1),   # strangle
+        (30.0, 30.0, 1.2, 0.9, 0.0),    # sem spot: centro no strike
+        (30.0, 30.0, 9.0, 8.0, 30.0),   # break-evens fora da malha
+    ]
+
+    def test_mesmo_resultado_que_simular_long_straddle(self):
+        from simulacoes.long_straddle import simular_long_straddle, simular_long_straddle_batch
+
+        linhas, esperados = [], []
+        for kc, kp, pc, pp, spot in self.casos:
+            base = {"spot_price": spot, "contract_size": 100, "due_date": "2026-11-20"}
+            esperados.append(simular_long_straddle(
+                {**base, "symbol": "C", "strike": kc, "ask": pc},
+                {**base, "symbol": "P", "strike": kp, "ask": pp},
+                renderizar=False,
+            ))
+            linhas.append({
+                "call": "C", "put": "P", "strike_call": kc, "strike_put": kp,
+                "call_premio": pc, "put_premio": pp, "contract_size": 100,
+                "spot": spot, "due_date": "2026-11-20",
+            })
+
+        for caso, obtido, esperado in zip(self.casos, simular_long_straddle_batch(linhas), esperados):
+            with self.subTest(caso=caso):
+                payoff = esperado.pop("payoff")
+                precos = esperado.pop("precos")
+                self.assertEqual({k: obtido[k] for k in esperado}, esperado)
+                self.assertEqual(obtido["precos"], precos)
+                for a, b in zip(obtido["payoff"], payoff):
+                    self.assertAlmostEqual(a, b, places=6)
+
+
+# ------------------------------------------------------------
+# Renderização do payoff (viz.render / viz.svg)
+# ------------------------------------------------------------
+class RenderPayoffTests(SimpleTestCase):
+    precos = [25.0, 27.5, 30.0, 32.5, 35.0]
+    payoff = [290.0, 40.0, -210.0, 40.0, 290.0]
+
+    def setUp(self):
+        from viz import render
+        render.limpar_cache()
+
+    def test_svg_bem_formado_com_curva_e_linhas(self):
+        import xml.etree.ElementTree as ET
+        from viz.svg import svg_payoff
+
+        svg = svg_payoff(self.precos, self.payoff, 30.4, 27.9, 32.1, "PETRK300", "PETRW300", "2026-11-20")
+        raiz = ET.fromstring(svg)
+        ns = "{http://www.w3.org/2000/svg}"
+        self.assertEqual(raiz.tag, ns + "svg")
+
+        curva = raiz.findall(ns + "polyline")
+        self.assertEqual(len(curva), 1)
+        self.assertEqual(len(curva[0].get("points").split()), len(self.precos))
+
+        textos = [t.text for t in raiz.iter(ns + "text")]
+        self.assertIn("Preço do Ativo (Atual)", textos)
+        self.assertIn("BE Inferior", textos)
+        self.assertIn("BE Superior", textos)
+
+    def test_svg_ignora_linhas_fora_da_malha(self):
+        from viz.svg import svg_payoff
+
+        svg = svg_payoff(self.precos, self.payoff, 99.0, None, float("nan"))
+        self.assertNotIn("Preço do Ativo (Atual)", svg)
+        self.assertNotIn("BE Inferior", svg)
+        self.assertNotIn("BE Superior", svg)
+
+    def test_cache_devolve_os_mesmos_bytes(self):
+        from viz import render
+
+        a = render.renderizar_payoff(self.precos, self.payoff, 30.4)
+        b = render.renderizar_payoff(self.precos, self.payoff, 30.4)
+        self.assertIs(a, b)
+        self.assertEqual(render.estatisticas_cache(), {"itens": 1, "hits": 1, "misses": 1})
+
+        # malha diferente → outra entrada
+        render.renderizar_payoff(self.precos, [p + 1 for p in self.payoff], 30.4)
+        self.assertEqual(render.estatisticas_cache()["itens"], 2)
+
+    def test_lru_descarta_o_mais_antigo(self):
+        from viz import render
+
+        with mock.patch.object(render, "MAX_ITENS", 2):
+            for spot in (30.0, 31.0, 32.0):
+                render.renderizar_payoff(self.precos, self.payoff, spot)
+            render.renderizar_payoff(self.precos, self.payoff, 30.0)
+        self.assertEqual(render.estatisticas_cache(), {"itens": 2, "hits": 0, "misses": 4})
+
+    def test_resultado_svg_png(self):
+        from viz import render
+
+        res = {"precos": self.precos, "payoff": self.payoff, "spot": 30.4,
+               "be_down": 27.9, "be_up": 32.1, "vencimento": "2026-11-20"}
+        self.assertTrue(render.renderizar_resultado(res).startswith(b"<svg"))
+
+        import importlib.util
+        if importlib.util.find_spec("matplotlib") is None:
+            self.skipTest("matplotlib não instalado")
+        png = render.renderizar_resultado(res, formato="png")
+        self.assertTrue(png.startswith(b"\x89PNG"))
+
+    def test_argumentos_invalidos(self):
+        from viz import render
+
+        with self.assertRaises(ValueError):
+            render.renderizar_payoff(self.precos, self.payoff, formato="pdf")
+        with self.assertRaises(ValueError):
+            render.renderizar_payoff(self.precos, self.payoff, formato="png", motor="svg")
+
+
+# ------------------------------------------------------------
+# Cold start do worker — imports sob demanda
+# ------------------------------------------------------------
+class ColdStartImportsTests(SimpleTestCase):
+    PESADOS = ("numpy", "matplotlib", "requests", "pytz")
+
+    def _carregados(self, codigo, env=None):
+        """Roda `codigo` num processo novo e devolve os PESADOS em sys.modules."""
+        import subprocess
+        import sys
+
+        script = codigo + (
+            "\nimport json, sys\n"
+            f"print(json.dumps(sorted(m for m in {self.PESADOS!r} if m in sys.modules)))\n"
+        )
+        p = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True,
+            env=env or dict(os.environ), timeout=60,
+        )
+        self.assertEqual(p.returncode, 0, p.stderr[-2000:])
+        return json.loads(p.stdout.strip().splitlines()[-1])
+
+    def test_urlconf_nao_carrega_pesados(self):
+        codigo = (
+            "import django\n"
+            "django.setup()\n"
+            "from django.urls import resolve\n"
+            "resolve('/')\n"
+            "import simulador_web.views\n"
+        )
+        self.assertEqual(self._carregados(codigo), [])
+
+    def test_simulacoes_reexporta_sob_demanda(self):
+        self.assertEqual(self._carregados("import simulacoes, simulacoes.base\n"), [])
+        self.assertEqual(
+            self._carregados("import simulacoes\nsimulacoes.simular_long_straddle\n"),
+            ["numpy"],
+        )
+
+    def test_api_sem_token_so_falha_no_uso(self):
+        env = {k: v for k, v in os.environ.items() if k != "OPLAB_TOKEN"}
+        codigo = (
+            "import services.api as api\n"
+            "try:\n"
+            "    api.get_headers()\n"
+            "except RuntimeError:\n"
+            "    pass\n"
+            "else:\n"
+            "    raise SystemExit('get_headers sem token não falhou')\n"
+        )
+        self.assertEqual(self._carregados(codigo, env), [])
+
+    def test_check_avisa_sem_token(self):
+        from simulador_web.checks import checar_oplab_token
+
+        with mock.patch.dict(os.environ, {"OPLAB_TOKEN": ""}):
+            avisos = checar_oplab_token(None)
+        self.assertEqual([a.id for a in avisos], ["simulador_web.W001"])
+        with mock.patch.dict(os.environ, {"OPLAB_TOKEN": "x"}):
+            self.assertEqual(checar_oplab_token(None), [])
+
+
+# ------------------------------------------------------------
+# LS em streaming (SSE) — um evento por ativo, na ordem de chegada
+# ------------------------------------------------------------
+def _linha_screener(strike, spot, due="2026-11-20"):
+    return {
+        "bucket": "ATM", "call": f"C{int(strike)}", "put": f"P{int(strike)}",
+        "due_date": due, "strike": strike, "spot": spot, "days_to_maturity": 24,
+        "call_premio": 1.0, "put_premio": 0.9, "premium_total": 1.9,
+        "be_down": strike - 1.9, "be_up": strike + 1.9, "contract_size": 100,
+        "call_delta": 0.5, "put_delta": -0.5,
+    }
+
+
+class LongStraddleStreamTests(TestCase):
+    # ticker: (atraso do screener em s, spot) — None = screener falha
+    cenario = {
+        "LENT3": (0.3, 30.0),
+        "RAPI4": (0.0, 20.0),
+        "FALH3": None,
+        "VAZI3": (0.0, 10.0),
+    }
+    params = {
+        "horizonte": "Vencimento", "crush_iv": 10.0, "lote_total": 10000, "be_max_pct": None,
+        "num_vencimentos": "1", "user_plan": "pro", "ativo": "",
+    }
+
+    def setUp(self):
+        patches = [
+            mock.patch("core.app_core.atualizar_e_screener_atm_2venc", side_effect=self._screener),
+            mock.patch("services.api.get_spot_ativo_oficial", side_effect=self._spot),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _screener(self, ticker, refresh=False):
+        import time
+
+        if self.cenario[ticker] is None:
+            raise RuntimeError("OPLAB fora")
+        atraso, spot = self.cenario[ticker]
+        time.sleep(atraso)
+        if ticker == "VAZI3":
+            return {"atm": [], "due_dates": []}
+        return {"atm": [_linha_screener(spot - 1, spot), _linha_screener(spot + 1, spot)]}
+
+    def _spot(self, ticker):
+        c = self.cenario.get(ticker)
+        return c[1] if c else None
+
+    @staticmethod
+    def _parse(texto):
+        eventos = []
+        for bloco in texto.strip().split("\n\n"):
+            nome, dados = bloco.split("\n")
+            eventos.append((nome[len("event: "):], json.loads(dados[len("data: "):])))
+        return eventos
+
+    def _eventos(self, tickers, **params):
+        import asyncio
+
+        from simulador_web.views import _eventos_ls
+
+        async def _coletar():
+            return [e async for e in _eventos_ls(tickers, dict(self.params, **params))]
+
+        return self._parse("".join(asyncio.run(_coletar())))
+
+    def test_ordem_de_chegada_e_falhas(self):
+        eventos = self._eventos(["LENT3", "RAPI4", "FALH3", "VAZI3"])
+        nomes = [n for n, _ in eventos]
+
+        self.assertEqual(eventos[0], ("inicio", {"tickers": ["LENT3", "RAPI4", "FALH3", "VAZI3"]}))
+        self.assertEqual(nomes[-1], "resumo")
+        ativos = [d["ticker"] for n, d in eventos if n == "ativo"]
+        # o ativo lento chega por último, depois dos que falharam
+        self.assertEqual(ativos, ["RAPI4", "LENT3"])
+        self.assertEqual(nomes[-2], "ativo")
+        erros = {d["ticker"]: d["erro"] for n, d in eventos if n == "erro"}
+        self.assertEqual(erros, {"FALH3": "OPLAB fora", "VAZI3": "Nenhuma linha LS para o ativo."})
+
+        resumo = eventos[-1][1]
+        self.assertEqual((resumo["tickers"], resumo["ok"]), (4, 2))
+        self.assertEqual(sorted(resumo["falhas"]), ["FALH3", "VAZI3"])
+        self.assertLess(resumo["primeira_linha_s"], 0.3)
+        self.assertGreaterEqual(resumo["segundos"], 0.3)
+
+    def test_evento_do_ativo_traz_linhas_e_simulacoes(self):
+        eventos = self._eventos(["RAPI4"], ativo="RAPI4")
+        ativo = next(d for n, d in eventos if n == "ativo")
+
+        self.assertEqual(len(ativo["linhas"]), len(ativo["simulacoes"]))
+        for linha, sim in zip(ativo["linhas"], ativo["simulacoes"]):
+            self.assertEqual(linha["spot_oficial"], 20.0)
+            self.assertEqual(linha["qty_call"] + linha["qty_put"], 10000)
+            self.assertEqual((sim["call"], sim["put"]), (linha["call"], linha["put"]))
+        # PRO: ordenado pelo menor BE%
+        be = [min(abs(l["be_pct_down"]), abs(l["be_pct_up"])) for l in ativo["linhas"]]
+        self.assertEqual(be, sorted(be))
+
+    def test_ranking_do_resumo(self):
+        pro = self._eventos(["LENT3", "RAPI4"])[-1][1]["ranking"]
+        self.assertEqual([r["be_pct_min"] for r in pro], sorted(r["be_pct_min"] for r in pro))
+        # PRO sem ativo: 1 LS por ticker
+        self.assertEqual(sorted(r["ticker"] for r in pro), ["LENT3", "RAPI4"])
+
+        basico = self._eventos(["RAPI4", "LENT3"], user_plan="basic")[-1][1]["ranking"]
+        self.assertEqual([r["ticker"] for r in basico], sorted(r["ticker"] for r in basico))
+
+    def test_endpoint_sse(self):
+        from asgiref.sync import async_to_sync
+        from django.contrib.auth import get_user_model
+        from django.urls import reverse
+
+        from simulador_web.models import Subscription
+
+        user = get_user_model().objects.create_user("stream", password="x")
+        Subscription.objects.create(user=user, plan="pro", end_date=date(2099, 1, 1))
+        self.client.force_login(user)
+
+        r = self.client.get(reverse("ls_stream"), {"ativo": "rapi4"})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["Content-Type"], "text/event-stream")
+        self.assertEqual(r["Cache-Control"], "no-cache")
+        self.assertTrue(r.is_async)
+
+        async def _ler():
+            return b"".join([parte async for parte in r.streaming_content])
+
+        corpo = async_to_sync(_ler)().decode("utf-8")
+        self.assertEqual([n for n, _ in self._parse(corpo)], ["inicio", "ativo", "resumo"])
+
+
+# ------------------------------------------------------------
+# TTL dos caches pela sessão da B3 (core.cache_ttl)
+# ------------------------------------------------------------
+class CacheTtlTests(SimpleTestCase):
+    @staticmethod
+    def _em(a, m, d, h, mi, s=0):
+        from datetime import datetime
+
+        from core.b3_calendar import TZ_B3
+
+        return datetime(a, m, d, h, mi, s, tzinfo=TZ_B3)
+
+    def test_fases_abertas(self):
+        from core.cache_ttl import TTL_LEILAO, TTL_PREGAO, ttl
+
+        # 10/03/2026: horário de verão nos EUA, fechamento às 18:00
+        casos = [
+            (self._em(2026, 3, 10, 9, 50), TTL_LEILAO),    # pré-abertura
+            (self._em(2026, 3, 10, 12, 0), TTL_PREGAO),    # pregão
+            (self._em(2026, 3, 10, 17, 54), TTL_PREGAO),
+            (self._em(2026, 3, 10, 17, 57), TTL_LEILAO),   # call de fechamento
+        ]
+        for agora, tabela in casos:
+            for categoria in ("screener", "ls", "iv_decisao", "oplab"):
+                with self.subTest(agora=agora, categoria=categoria):
+                    self.assertEqual(ttl(categoria, agora), tabela[categoria])
+
+    def test_fechado_vale_ate_a_proxima_pre_abertura(self):
+        from core.cache_ttl import TTL_MIN_FECHADO, ttl
+
+        casos = [
+            # sem horário de verão nos EUA: fecha às 17:00 → amanhã 09:45
+            (self._em(2026, 2, 10, 17, 57), 15 * 3600 + 48 * 60),
+            (self._em(2026, 3, 10, 18, 30), 15 * 3600 + 15 * 60),
+            # sexta → segunda
+            (self._em(2026, 3, 13, 20, 0), 2 * 86400 + 13 * 3600 + 45 * 60),
+            # quinta antes da Sexta-feira Santa (03/04/2026) → segunda
+            (self._em(2026, 4, 2, 18, 30), 3 * 86400 + 15 * 3600 + 15 * 60),
+            # segundos antes da pré-abertura: piso
+            (self._em(2026, 3, 10, 9, 44, 30), TTL_MIN_FECHADO),
+        ]
+        for agora, esperado in casos:
+            with self.subTest(agora=agora):
+                self.assertEqual(ttl("screener", agora), esperado)
+
+    def test_retencao_e_categoria_invalida(self):
+        from core.cache_ttl import RETENCAO_VERSIONADA, retencao, ttl
+
+        self.assertEqual(retencao("screener", self._em(2026, 3, 10, 12, 0)), RETENCAO_VERSIONADA)
+        fim_de_semana = self._em(2026, 3, 13, 20, 0)
+        self.assertEqual(retencao("screener", fim_de_semana), ttl("screener", fim_de_semana))
+        with self.assertRaises(ValueError):
+            ttl("outra")
+
+
+# ------------------------------------------------------------
+# Warmer do cache — agenda pela sessão da B3 e eleição por host
+# ------------------------------------------------------------
+class CacheWarmerAgendaTests(SimpleTestCase):
+    @staticmethod
+    def _em(a, m, d, h, mi):
+        from datetime import datetime
+
+        from core.b3_calendar import TZ_B3
+
+        return datetime(a, m, d, h, mi, tzinfo=TZ_B3)
+
+    def _esperas(self, agora, aberto, intervalo=0, jitter=0):
+        """(mínimo, máximo) de _espera com o sorteio nos dois extremos."""
+        from core import cache_warmer as w
+
+        extremos = []
+        for lado in (0, 1):
+            with mock.patch.object(w.random, "uniform", lambda a, b: (a, b)[lado]):
+                extremos.append(w._espera(agora, aberto, intervalo, jitter))
+        return tuple(extremos)
+
+    def test_sessao_aberta_segue_o_ttl_da_fase(self):
+        from core.b3_calendar import FASE_FECHADO, fase_sessao
+        from core.cache_ttl import ttl
+
+        # 10/03/2026: pré-abertura, pregão e call de fechamento (18:00 com DST nos EUA)
+        for agora in (self._em(2026, 3, 10, 9, 50), self._em(2026, 3, 10, 12, 0), self._em(2026, 3, 10, 17, 57)):
+            with self.subTest(agora=agora):
+                self.assertNotEqual(fase_sessao(agora), FASE_FECHADO)
+                base = int(ttl("screener", agora) * 0.8)
+                lo, hi = self._esperas(agora, True)
+                self.assertAlmostEqual(lo, base * 0.9)
+                self.assertAlmostEqual(hi, base * 1.1)
+                # a rodada sai antes de a entrada do screener expirar
+                self.assertLess(hi, ttl("screener", agora))
+
+    def test_intervalo_e_jitter_fixos(self):
+        self.assertEqual(self._esperas(self._em(2026, 3, 10, 12, 0), True, 300, 20), (280, 320))
+
+    def test_fechado_dorme_ate_a_pre_abertura(self):
+        from core.b3_calendar import proxima_pre_abertura
+
+        casos = [
+            (self._em(2026, 3, 10, 19, 0), self._em(2026, 3, 11, 9, 45)),   # noite → dia seguinte
+            (self._em(2026, 3, 13, 20, 0), self._em(2026, 3, 16, 9, 45)),   # sexta → segunda
+            (self._em(2026, 4, 2, 20, 0), self._em(2026, 4, 6, 9, 45)),     # Sexta-feira Santa
+        ]
+        for agora, pre in casos:
+            with self.subTest(agora=agora):
+                self.assertEqual(proxima_pre_abertura(agora), pre)
+                ate = (pre - agora).total_seconds()
+                self.assertEqual(self._esperas(agora, False), (ate, ate + 60))
+
+    def _rodar_loop(self, horarios, eleito=True):
+        """rodar_loop sobre `horarios` (um por ciclo); devolve os horários com rodada."""
+        from core import cache_warmer as w
+
+        ciclo = {"i": 0}
+        agora = lambda: horarios[min(ciclo["i"], len(horarios) - 1)]
+
+        class _Parar:
+            def is_set(self):
+                return ciclo["i"] >= len(horarios)
+
+            def wait(self, segundos):
+                ciclo["i"] += 1
+                return self.is_set()
+
+        rodadas = []
+        with mock.patch.object(w, "_parar", _Parar()), \
+                mock.patch.object(w, "agora_b3", agora), \
+                mock.patch.object(w, "_eleito", return_value=eleito), \
+                mock.patch.object(w, "aquecer", side_effect=lambda *a, **k: rodadas.append(agora())):
+            w.rodar_loop()
+        return rodadas
+
+    def test_loop_roda_na_sessao_e_uma_vez_apos_o_fechamento(self):
+        horarios = [
+            self._em(2026, 3, 9, 23, 0),    # boot fora da sessão: aquece
+            self._em(2026, 3, 10, 2, 0),    # madrugada: dorme
+            self._em(2026, 3, 10, 9, 50),   # pré-abertura
+            self._em(2026, 3, 10, 12, 0),   # pregão
+            self._em(2026, 3, 10, 17, 57),  # call de fechamento
+            self._em(2026, 3, 10, 18, 5),   # logo após o fechamento: última rodada
+            self._em(2026, 3, 10, 23, 0),   # noite: dorme
+        ]
+        self.assertEqual(self._rodar_loop(horarios), [horarios[i] for i in (0, 2, 3, 4, 5)])
+
+    def test_loop_sem_eleicao_nao_aquece(self):
+        self.assertEqual(self._rodar_loop([self._em(2026, 3, 10, 12, 0)] * 3, eleito=False), [])
+
+    def test_eleicao_por_flock(self):
+        from core import cache_warmer as w
+
+        if w.fcntl is None:
+            self.skipTest("sem fcntl (Windows)")
+
+        d = tempfile.TemporaryDirectory()
+        self.addCleanup(d.cleanup)
+        caminho = os.path.join(d.name, "warmer.lock")
+
+        with mock.patch.object(w, "LOCK_PATH", caminho), mock.patch.object(w, "_lock_eleicao", None):
+            # outro processo do host já é o warmer
+            outro = open(caminho, "a+")
+            w.fcntl.flock(outro.fileno(), w.fcntl.LOCK_EX | w.fcntl.LOCK_NB)
+            self.assertFalse(w._eleito())
+            self.assertFalse(w.estado_warmer()["eleito"])
+
+            # ele morre: o lock é liberado e este processo assume
+            outro.close()
+            self.assertTrue(w._eleito())
+            self.assertTrue(w.estado_warmer()["eleito"])
+            self.assertTrue(w._eleito())  # continua eleito sem reabrir o arquivo
+            w._lock_eleicao.close()
+
+
+# ------------------------------------------------------------
+# API JSON v1 — ETag / 304
+# ------------------------------------------------------------
+class ApiScreenerCondicionalTests(TestCase):
+    res = {
+        "atm": [{"call": "PETRK300", "put": "PETRW300", "strike": 30.0, "due_date": "2026-11-20"}],
+        "due_dates": ["2026-11-20"],
+        "versao": "1792400000000",
+    }
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.urls import reverse
+
+        from simulador_web.models import Subscription
+
+        user = get_user_model().objects.create_user("api", password="x")
+        Subscription.objects.create(user=user, plan="pro", end_date=date(2099, 1, 1))
+        self.client.force_login(user)
+        self.url = reverse("api_screener", args=["petr4"])
+
+        patcher = mock.patch("simulador_web.views_api._screener", side_effect=lambda t: dict(self.res))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_304_com_if_none_match(self):
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["versao"], self.res["versao"])
+        etag = r["ETag"]
+
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.content, b"")
+        self.assertEqual(r["ETag"], etag)
+        self.assertIn("max-age=", r["Cache-Control"])
+
+    def test_304_com_if_modified_since(self):
+        r = self.client.get(self.url)
+        r = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=r["Last-Modified"])
+        self.assertEqual(r.status_code, 304)
+
+    def test_versao_nova_devolve_200(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.res = dict(self.res, versao="1792400060000")
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+
+
+# ------------------------------------------------------------
+# IV crush nos earnings (simulador_web.domain.earnings_crush)
+# ------------------------------------------------------------
+class CalcularEventosTests(SimpleTestCase):
+    # (trade_date, iv_atm_mean, spot_price, call_premium, put_premium), como no banco
+    serie = [
+        (date(2024, 3, 4), 40, 30, 1, 1),
+        (date(2024, 3, 5), 50, 30, 1.5, 1.5),
+        (date(2024, 3, 6), 40, 33, 1.65, 1.65),
+        (date(2024, 3, 7), 30, 31.35, 1, 1),
+        (date(2024, 3, 8), 32, 31.35, 1, 1),
+        (date(2024, 3, 11), 24, 31.35, 1, 1),
+    ]
+    eventos = [
+        (date(2023, 12, 20), "ANTES"),   # antes da série: sem dado
+        (date(2024, 3, 5), "DEPOIS"),    # D0 → D+1
+        (date(2024, 3, 7), "ANTES"),     # D-1 → D0
+        (date(2024, 3, 9), None),        # sábado, sem horário: D-1 → D+1
+    ]
+
+    def _calcular(self):
+        from decimal import Decimal
+
+        from simulador_web.domain.earnings_crush import calcular_eventos
+
+        serie = [(d, *(Decimal(str(v)) for v in resto)) for d, *resto in self.serie]
+        return calcular_eventos(serie, self.eventos, n=2)
+
+    def test_pregoes_e_metricas_por_evento(self):
+        sem_dado, depois, antes, sabado = self._calcular()
+
+        self.assertIsNone(sem_dado["crush_pct"])
+        self.assertIsNone(sem_dado["pregao_antes"])
+
+        esperado = [
+            # (evento, pregão antes, pregão depois, crush, move, implícito, razão)
+            (depois, date(2024, 3, 5), date(2024, 3, 6), 20.0, 10.0, 10.0, 1.0),
+            (antes, date(2024, 3, 6), date(2024, 3, 7), 25.0, 5.0, 10.0, 0.5),
+            (sabado, date(2024, 3, 8), date(2024, 3, 11), 25.0, 0.0, 2 / 31.35 * 100, 0.0),
+        ]
+        for ev, d_antes, d_depois, crush, move, implicito, razao in esperado:
+            with self.subTest(evento=ev["earnings_date"]):
+                self.assertEqual((ev["pregao_antes"], ev["pregao_depois"]), (d_antes, d_depois))
+                self.assertAlmostEqual(ev["crush_pct"], crush)
+                self.assertAlmostEqual(ev["move_pct"], move)
+                self.assertAlmostEqual(ev["move_implicito_pct"], implicito)
+                self.assertAlmostEqual(ev["razao_move"], razao)
+
+        self.assertIsNone(sabado["iv_d0"])
+        self.assertEqual(float(sabado["iv_d1"]), 32.0)
+        self.assertEqual(float(sabado["iv_p1"]), 24.0)
+
+    def test_medias_moveis_ignoram_eventos_sem_dado(self):
+        eventos = self._calcular()
+        self.assertEqual([e["eventos_media"] for e in eventos], [0, 1, 2, 2])
+        self.assertIsNone(eventos[0]["crush_medio_pct"])
+
+        medias = [(e["crush_medio_pct"], e["move_medio_pct"], e["razao_move_media"]) for e in eventos[1:]]
+        for obtido, esperado in zip(medias, [(20.0, 10.0, 1.0), (22.5, 7.5, 0.75), (25.0, 2.5, 0.25)]):
+            for a, b in zip(obtido, esperado):
+                self.assertAlmostEqual(a, b)
+
+
+# ------------------------------------------------------------
+# Tela LS — contexto pós-cálculo (earnings / IV crush) sem recálculo no GET
+# ------------------------------------------------------------
+class ContextoPosCalculoTests(TestCase):
+    hoje = date(2024, 3, 20)
+
+    def setUp(self):
+        from django.test import RequestFactory
+
+        from simulador_web.models import EarningsDate
+
+        EarningsDate.objects.create(ticker="PETR4", earnings_date=date(2023, 11, 7), announcement_time="DEPOIS")
+        EarningsDate.objects.create(ticker="PETR4", earnings_date=date(2024, 3, 7), announcement_time="DEPOIS")
+        self.request = RequestFactory().get("/app/ls/", {"ativo": "PETR4"})
+
+        patches = [
+            mock.patch("simulador_web.views.build_iv_decisao", return_value={"decisao": "ok"}),
+            mock.patch("simulador_web.views.timezone.localdate", return_value=self.hoje),
+            mock.patch(
+                "simulador_web.repositories.earnings_crush_repository.recalcular_earnings_crush",
+                side_effect=AssertionError("recálculo no GET"),
+            ),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _contexto(self, plano="pro"):
+        from asgiref.sync import async_to_sync
+
+        from simulador_web.views import _contexto_pos_calculo
+
+        return async_to_sync(_contexto_pos_calculo)(self.request, "PETR4", plano)
+
+    def _crush(self, earnings_date):
+        from decimal import Decimal
+
+        from simulador_web.models import EarningsIvCrush
+
+        EarningsIvCrush.objects.create(
+            ticker="PETR4", earnings_date=earnings_date,
+            iv_d1=Decimal("0.45"), iv_d0=Decimal("0.50"), iv_p1=Decimal("0.32"),
+        )
+
+    def test_sem_linha_na_tabela_sai_sem_iv_earnings(self):
+        from simulador_web.models import EarningsIvCrush
+
+        extras, iv_decisao = self._contexto()
+        self.assertEqual(extras["earnings_last"]["earnings_date"], date(2024, 3, 7))
+        self.assertIsNone(extras["iv_earnings"])
+        self.assertIsNone(extras["earnings_crush"])
+        self.assertEqual(iv_decisao, {"decisao": "ok"})
+        self.assertFalse(EarningsIvCrush.objects.exists())
+
+    def test_linha_de_evento_anterior_nao_vale(self):
+        self._crush(date(2023, 11, 7))
+        extras, _ = self._contexto()
+        self.assertIsNone(extras["iv_earnings"])
+        self.assertIsNone(extras["earnings_crush"])
+
+    def test_linha_do_ultimo_evento(self):
+        from decimal import Decimal
+
+        self._crush(date(2024, 3, 7))
+        extras, _ = self._contexto()
+        self.assertEqual(extras["iv_earnings"], {"d1": Decimal("0.45"), "d0": Decimal("0.50"), "p1": Decimal("0.32")})
+        self.assertEqual(extras["earnings_crush"]["earnings_date"], date(2024, 3, 7))
+
+    def test_plano_basico_nao_le_crush(self):
+        self._crush(date(2024, 3, 7))
+        extras, iv_decisao = self._contexto(plano="basic")
+        self.assertIsNone(extras["iv_earnings"])
+        self.assertIsNone(iv_decisao)
+
+
+# ------------------------------------------------------------
+# Snapshot do cache em disco (core.cache_snapshot)
+# ------------------------------------------------------------
+class CacheSnapshotTests(SimpleTestCase):
+    def test_codificacao_ida_e_volta(self):
+        from decimal import Decimal
+
+        import numpy as np
+
+        from core import cache_snapshot
+        from simulacoes.cenarios import matriz_crush
+
+        cache_snapshot.registrar_tipo("simulacoes.cenarios.MatrizCrush")
+        m = matriz_crush(30.4, 30.0, 30.0, 20 / 252, 20 / 252, 0.42, 0.38)
+        valor = {
+            "linhas": [{"strike": 30.0, "iv": Decimal("0.325"), "dia": date(2024, 3, 4)}],
+            "par": ("PETRK300", "PETRW300"),
+            (2024, 3): np.float64(1.5),
+            "crush": m,
+        }
+        volta = json.loads(json.dumps(cache_snapshot._codificar(valor)))
+        obtido = cache_snapshot._decodificar(volta)
+
+        self.assertEqual(obtido["linhas"], valor["linhas"])
+        self.assertEqual(obtido["par"], valor["par"])
+        self.assertEqual(obtido[(2024, 3)], 1.5)
+        self.assertEqual(obtido["crush"].em(12.5), m.em(12.5))
+        np.testing.assert_array_equal(obtido["crush"].precos, m.precos)
+
+        with self.assertRaises(TypeError):
+            cache_snapshot._codificar({"x": object()})
+
+    def test_pasta_precisa_ser_privada(self):
+        from core import cache_snapshot
+
+        if not hasattr(os, "getuid"):
+            self.skipTest("sem dono/permissões POSIX")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            nova = os.path.join(tmp, "snap", "cache.bin")
+            cache_snapshot.salvar(nova)
+            self.assertEqual(os.stat(os.path.dirname(nova)).st_mode & 0o777, 0o700)
+            self.assertTrue(os.path.exists(nova))
+
+            aberta = os.path.join(tmp, "aberta")
+            os.mkdir(aberta)
+            os.chmod(aberta, 0o755)
+            with self.assertRaises(PermissionError):
+                cache_snapshot.salvar(os.path.join(aberta, "cache.bin"))
+
+
+# ------------------------------------------------------------
+# Cadeia compartilhada entre workers (services.chain_shared)
+# ------------------------------------------------------------
+def _cadeia_oplab():
+    """Cadeia no formato da OPLAB: IV em %, prêmio sem last/close em parte das pernas."""
+    rows = []
+    for due, dias in (("2026-11-20", 24), ("2026-12-18", 44)):
+        for k in (28.0, 29.0, 30.0, 31.0, 32.0):
+            for cat in ("CALL", "PUT"):
+                sem_ask = k == 30.0 and cat == "PUT"
+                rows.append({
+                    "symbol": f"TSTE{cat[0]}{due[5:7]}{int(k)}",
+                    "category": cat,
+                    "due_date": f"{due}T00:00:00",
+                    "strike": k,
+                    "bid": 0.8 + (k - 28) / 10,
+                    "ask": 0.0 if sem_ask else 0.9 + (k - 28) / 10,
+                    "premium": 0.85 + (k - 28) / 10,
+                    "iv": 32.5 + k / 10,
+                    "days_to_maturity": dias,
+                    "open_interest": 100,
+                    "volume": 10,
+                    "contract_size": 100,
+                    "spot_price": 30.12,
+                    "time": 1792400000000,
+                    "variation": -1.25,
+                })
+    return rows
+
+
+def _cadeia_variada():
+    """
+    _cadeia_oplab com o que a ordem/formato das linhas pode mudar: perna
+    empatada antes da original, IV em outra chave, prêmio só em last,
+    strike em texto e um vencimento semanal.
+    """
+    rows = _cadeia_oplab()
+    por_simbolo = {o["symbol"]: o for o in rows}
+    rows.insert(0, dict(por_simbolo["TSTEC1130"], symbol="TSTEC1130E"))  # empate: vence a 1ª
+    perna = por_simbolo["TSTEP1131"]
+    perna["implied_vol"] = perna.pop("iv")
+    por_simbolo["TSTEC1231"].update(bid=0.0, ask=0.0, last=1.1)
+    por_simbolo["TSTEP1230"]["strike"] = "30"
+    rows.append(dict(por_simbolo["TSTEC1130"], symbol="TSTEC1130W", due_date="2026-11-13T00:00:00"))
+    return rows
+
+
+class ChainSharedScreenerTests(SimpleTestCase):
+    hoje = date(2026, 10, 19)
+
+    def setUp(self):
+        from services import chain_shared
+        from simulacoes import atm_screener
+
+        self.chain_shared = chain_shared
+        self.atm_screener = atm_screener
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(chain_shared._mapeadas.clear)
+        self.raiz = self.tmp.name
+
+    def _rodar(self, compartilhado, cadeia=_cadeia_variada):
+        cache.clear()
+        self.atm_screener._anterior.clear()
+        self.chain_shared._mapeadas.clear()
+        env = {"CHAIN_SHARED": "1" if compartilhado else "0"}
+        with mock.patch.dict(os.environ, env), \
+                mock.patch.object(self.chain_shared, "CHAIN_SHARED_DIR", self.raiz), \
+                mock.patch.object(self.chain_shared, "buscar_opcoes_ativo", side_effect=lambda t: cadeia()), \
+                mock.patch.object(self.atm_screener, "cotacao_ativo_oficial", return_value={"preco": 30.12, "versao": None}):
+            return self.atm_screener.screener_atm_dois_vencimentos("TSTE4", self.hoje, verbose=False)
+
+    def test_screener_igual_com_e_sem_compartilhamento(self):
+        if self.chain_shared.fcntl is None:
+            self.skipTest("sem fcntl")
+
+        for cadeia in (_cadeia_oplab, _cadeia_variada):
+            with self.subTest(cadeia=cadeia.__name__):
+                # as duas cadeias têm a mesma versão: uma pasta para cada
+                self.raiz = os.path.join(self.tmp.name, cadeia.__name__)
+                local = self._rodar(compartilhado=False, cadeia=cadeia)
+                # 1ª chamada publica a versão; a 2ª lê as colunas, como os outros workers
+                self._rodar(compartilhado=True, cadeia=cadeia)
+                compartilhado = self._rodar(compartilhado=True, cadeia=cadeia)
+                self.assertEqual(len(local["atm"]), 4)
+                self.assertEqual(local, compartilhado)
+
+        calls = {r["due_date"]: r["call"] for r in local["atm"] if r["strike"] == 30.0}
+        self.assertEqual(calls["2026-11-20"], "TSTEC1130E")
+
+    def test_colunas_mapeadas_e_so_os_vencimentos_pedidos(self):
+        import numpy as np
+
+        if self.chain_shared.fcntl is None:
+            self.skipTest("sem fcntl")
+
+        self._rodar(compartilhado=True)
+        self._rodar(compartilhado=True)
+        snap = self.chain_shared._mapeadas["TSTE4"]
+
+        indice = json.load(open(os.path.join(self.tmp.name, "TSTE4", "indice.json")))
+        self.assertEqual(indice["pasta"], f"v{snap.versao}")
+        for nome, col in snap.colunas().items():
+            with self.subTest(coluna=nome):
+                self.assertIsInstance(col, np.memmap)
+                self.assertFalse(col.flags.writeable)
+
+        # spot oficial presente: só os dois vencimentos viraram dicts
+        self.assertEqual(list(snap._por_dues), [("2026-11-20", "2026-12-18")])
+
+    def test_linhas_fieis_as_cruas(self):
+        if self.chain_shared.fcntl is None:
+            self.skipTest("sem fcntl")
+
+        self._rodar(compartilhado=True)
+        snap = self.chain_shared._mapeadas["TSTE4"]
+        cruas = _cadeia_variada()
+        linhas = snap.linhas()
+        self.assertEqual([o["symbol"] for o in linhas], [o["symbol"] for o in cruas])
+
+        for crua, linha in zip(cruas, linhas):
+            for campo, valor in linha.items():
+                with self.subTest(symbol=crua["symbol"], campo=campo):
+                    esperado = crua.get(campo)
+                    if campo == "due_date":
+                        esperado = esperado[:10]
+                    elif esperado is not None and campo not in self.chain_shared.COLUNAS_TEXTO:
+                        esperado = float(esperado)
+                    self.assertEqual(valor, esperado)
+
+    def test_indice_antigo_e_republicado(self):
+        if self.chain_shared.fcntl is None:
+            self.skipTest("sem fcntl")
+
+        base = os.path.join(self.tmp.name, "TSTE4")
+        os.makedirs(base)
+        with open(os.path.join(base, "indice.json"), "w") as f:
+            json.dump({"versao": "1", "arquivo": "v1.json", "gravado_em": 0, "expira": 9e12}, f)
+        open(os.path.join(base, "v1.json"), "w").close()
+
+        self._rodar(compartilhado=True)
+        indice = json.load(open(os.path.join(base, "indice.json")))
+        self.assertIn("pasta", indice)
+        self.assertTrue(os.path.isdir(os.path.join(base, indice["pasta"])))
+        self.assertFalse(os.path.exists(os.path.join(base, "v1.json")))
+
+
+# ------------------------------------------------------------
+# Screener ATM — cache versionado (revalidação por sonda/cadeia/spot)
+# ------------------------------------------------------------
+class ScreenerCacheVersionadoTests(SimpleTestCase):
+    hoje = date(2026, 10, 19)
+
+    def setUp(self):
+        from services import chain_shared
+        from simulacoes import atm_screener
+
+        self.atm_screener = atm_screener
+        cache.clear()
+        atm_screener._anterior.clear()
+        self.cot = {"preco": 30.0, "versao": "s1"}
+
+        patches = [
+            mock.patch.dict(os.environ, {"CHAIN_SHARED": "0"}),
+            mock.patch.object(chain_shared, "buscar_opcoes_ativo", side_effect=lambda t: _cadeia_oplab()),
+            mock.patch.object(atm_screener, "cotacao_ativo_oficial", side_effect=lambda t: dict(self.cot)),
+            mock.patch.object(atm_screener, "_linhas_incrementais", wraps=atm_screener._linhas_incrementais),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.buscar = chain_shared.buscar_opcoes_ativo
+        self.incremental = atm_screener._linhas_incrementais
+        self.addCleanup(cache.clear)
+
+    def _rodar(self):
+        return self.atm_screener.screener_atm_dois_vencimentos("TSTE4", self.hoje, verbose=False)
+
+    def _expirar(self):
+        from core.cache_keys import screener_cache_key
+
+        chave = screener_cache_key("TSTE4", self.hoje, "VENC")
+        cache.set(chave, dict(cache.get(chave), fresco_ate=0.0))
+
+    @staticmethod
+    def _strikes(res):
+        return sorted({r["strike"] for r in res["atm"]})
+
+    def test_fresco_nao_consulta_nada(self):
+        primeiro = self._rodar()
+        self.assertEqual(self._rodar(), primeiro)
+        self.assertEqual(self.buscar.call_count, 1)
+        self.assertEqual(self.incremental.call_count, 1)
+
+    def test_sonda_igual_revalida_sem_buscar_a_cadeia(self):
+        primeiro = self._rodar()
+        self._expirar()
+        self.assertEqual(self._rodar(), primeiro)
+        self.assertEqual(self.buscar.call_count, 1)
+        self.assertEqual(self.incremental.call_count, 1)
+
+    def test_mesma_cadeia_e_mesmo_spot_reaproveita(self):
+        primeiro = self._rodar()
+        self._expirar()
+        self.cot["versao"] = "s2"
+        self.assertEqual(self._rodar(), primeiro)
+        self.assertEqual(self.buscar.call_count, 2)
+        self.assertEqual(self.incremental.call_count, 1)
+
+    def test_mesma_cadeia_com_spot_novo_recalcula(self):
+        primeiro = self._rodar()
+        self.assertEqual(self._strikes(primeiro), [29.0, 31.0])
+        self.assertEqual({r["spot"] for r in primeiro["atm"]}, {30.0})
+
+        self._expirar()
+        self.cot = {"preco": 31.6, "versao": "s2"}
+        novo = self._rodar()
+
+        self.assertEqual(novo["versao"], primeiro["versao"])
+        self.assertEqual(self.incremental.call_count, 2)
+        self.assertEqual({r["spot"] for r in novo["atm"]}, {31.6})
+        self.assertEqual(self._strikes(novo), [31.0, 32.0])
+
+        # o spot novo fica na entrada: a próxima revalidação reaproveita
+        self._expirar()
+        self.cot["versao"] = "s3"
+        self.assertEqual(self._rodar(), novo)
+        self.assertEqual(self.incremental.call_count, 2)
+
+
+# ------------------------------------------------------------
+# Screener ATM — recálculo incremental (_linhas_incrementais)
+# ------------------------------------------------------------
+class LinhasIncrementaisTests(SimpleTestCase):
+    hoje = date(2026, 10, 19)
+    dues = ["2026-11-20", "2026-12-18"]
+
+    def setUp(self):
+        from simulacoes import atm_screener
+
+        self.sc = atm_screener
+        atm_screener._anterior.clear()
+        self.addCleanup(atm_screener._anterior.clear)
+        patches = [
+            mock.patch.object(atm_screener, "_base_par", wraps=atm_screener._base_par),
+            mock.patch.object(atm_screener, "_aplicar_spot", wraps=atm_screener._aplicar_spot),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _rodar(self, ops, spot):
+        self.sc._base_par.reset_mock()
+        self.sc._aplicar_spot.reset_mock()
+        return self.sc._linhas_incrementais(None, "TSTE4", self.hoje, self.dues, ops, spot)
+
+    def _refeitas(self):
+        return sorted((c.args[0], c.args[1]) for c in self.sc._base_par.call_args_list)
+
+    def _pares(self):
+        return dict(self.sc._anterior["TSTE4"]["pares"])
+
+    def test_cadeia_igual_reaproveita_as_bases(self):
+        self._rodar(_cadeia_oplab(), 30.0)
+        self.assertEqual(self.sc._base_par.call_count, 4)
+        antes = self._pares()
+
+        linhas = self._rodar(_cadeia_oplab(), 30.0)
+        self.assertEqual(self._refeitas(), [])
+        depois = self._pares()
+        self.assertEqual(antes.keys(), depois.keys())
+        for chave in antes:
+            self.assertIs(depois[chave][1], antes[chave][1])
+        self.assertEqual(len(linhas), 4)
+
+    def test_so_os_pares_das_pernas_alteradas_sao_refeitos(self):
+        self._rodar(_cadeia_oplab(), 30.0)
+
+        ops = _cadeia_oplab()
+        perna = next(o for o in ops if o["symbol"] == "TSTEC1129")
+        perna["bid"] += 0.05
+        perna["ask"] += 0.05
+        linhas = self._rodar(ops, 30.0)
+
+        self.assertEqual(self._refeitas(), [("2026-11-20", 29.0)])
+        par = next(l for l in linhas if l["due_date"] == "2026-11-20" and l["strike"] == 29.0)
+        self.assertAlmostEqual(par["call_premio"], 1.05)
+
+    def test_troca_de_strikes_atm_refaz_so_os_novos_pares(self):
+        self._rodar(_cadeia_oplab(), 30.0)    # ATM 29/31
+        linhas = self._rodar(_cadeia_oplab(), 31.6)  # ATM 31/32
+
+        self.assertEqual(self._refeitas(), [("2026-11-20", 32.0), ("2026-12-18", 32.0)])
+        self.assertEqual(sorted({l["strike"] for l in linhas}), [31.0, 32.0])
+        self.assertEqual(sorted(k for _, k in self._pares()), [31.0, 31.0, 32.0, 32.0])
+
+    def test_so_o_spot_mudou_passa_por_aplicar_spot(self):
+        # IV em fração: o BS local do screener não converte de %
+        ops = [dict(o, iv=o["iv"] / 100.0) for o in _cadeia_oplab()]
+        antes = self._rodar(ops, 30.2)   # ATM 30/31
+        depois = self._rodar(ops, 30.4)  # mesmos strikes
+
+        self.assertEqual(self._refeitas(), [])
+        self.sc._aplicar_spot.assert_called_once()
+        self.assertEqual(self.sc._aplicar_spot.call_args.args[1], 30.4)
+        self.assertEqual({l["spot"] for l in depois}, {30.4})
+        for a, d in zip(antes, depois):
+            self.assertEqual((a["call"], a["put"]), (d["call"], d["put"]))
+            self.assertGreater(d["call_delta"], a["call_delta"])
+            self.assertNotEqual(d["be_pct_up"], a["be_pct_up"])
+
+    def test_outro_dia_nao_reaproveita(self):
+        self._rodar(_cadeia_oplab(), 30.0)
+        self.hoje = date(2026, 10, 20)
+        self._rodar(_cadeia_oplab(), 30.0)
+        self.assertEqual(self.sc._base_par.call_count, 4)
@@ -1,13 +1,21 @@
 from django.urls import path
 from .views import long_straddle
-from . import views
+from . import views, views_api
 
 
 urlpatterns = [
     path("", long_straddle, name="app_home"),
     path("ls/", long_straddle, name="ls"),
     path("long/", long_straddle, name="long_straddle"),
+    path("ls/stream/", views.long_straddle_stream, name="ls_stream"),
     path("sair/", views.sair, name="logout"),
     path("planos/", views.planos, name="planos"),
+    path("warmer/status/", views.cache_warmer_status, name="cache_warmer_status"),
+
+    # API JSON v1 (ETag/304, Cache-Control pelo pregão)
+    path("api/v1/screener/<str:ticker>/", views_api.screener, name="api_screener"),
+    path("api/v1/simulacao/<str:ticker>/", views_api.simulacao, name="api_simulacao"),
+    path("api/v1/iv/<str:ticker>/", views_api.iv_decisao, name="api_iv_decisao"),
+    path("api/v1/earnings-crush/", views_api.earnings_crush, name="api_earnings_crush"),
 
 ]
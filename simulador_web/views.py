@@ -2,38 +2,42 @@
 from django.shortcuts import render
 from core.cache_keys import ls_cache_key
 from core.lock import acquire_lock, release_lock
-from simulacoes.long_straddle import simular_long_straddle
-from simulacoes.black_scholes import black_scholes, implied_vol
-from core.app_core import atualizar_e_screener_atm_2venc
-from services.api import buscar_detalhes_opcao, get_spot_ativo_oficial
+# simulacoes.*, services.api e core.app_core (numpy/requests) são importados
+# dentro da view: o URLconf carrega este módulo no 1º request de cada worker
 from simulador_web.models import PlanAssetList
 from asgiref.sync import sync_to_async
 from django.contrib.auth import logout
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.forms.models import model_to_dict
 from django.utils import timezone
 from django.http import JsonResponse
 from simulador_web.models import Lead
 from simulador_web.domain.iv_atm_decision import build_iv_decisao
-from simulador_web.domain.iv_atm_metrics import get_iv_ultimos_dias
-from simulador_web.models import IvAtmHistorico
-from simulador_web.models import IvAtmHistorico, EarningsDate
-from datetime import timedelta
-from simulador_web.repositories.iv_atm_repository import get_iv_atm_por_data
+from simulador_web.domain import ls_linhas
+from simulador_web.domain.ls_linhas import (
+    LOT_MIN,
+    base_ls_key as _base_ls_key,
+    guardar_base_ls as _guardar_base_ls,
+    ls_cache as _ls_cache,
+    to_float as _to_float,
+)
+from simulador_web.domain.iv_atm_metrics import formatar_iv_ultimos_dias
+from simulador_web.repositories.earnings_crush_repository import aget_earnings_crush
+from simulador_web.repositories.earnings_repository import aget_earnings_ultimo_proximo
+from simulador_web.repositories.iv_atm_repository import aget_iv_atm_ultimos
 
 
 import json
 import asyncio
 
 from .utils import subscription_required
-import os
 
 
 def landing(request):
     return render(request, "simulador_web/landing.html")
 
 
-LOT_MIN = 100
 DEFAULT_TOTAL_LOT = 10000
 
 # Lista padrão de ativos (20 mais líquidos aprox.)
@@ -45,26 +49,6 @@ LISTA_ATIVOS_PADRAO = [
 ]
 
 
-def fmt_brl(v):
-    """
-    Formatação pt-BR sem símbolo de moeda.
-    Ex: 5931.5 -> "5.931,50"
-    """
-    try:
-        return f"{float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "0,00"
-
-
-def _to_float(v, default=0.0):
-    try:
-        if v is None:
-            return default
-        return float(v)
-    except Exception:
-        return default
-
-
 def _parse_total_lot(v, default=DEFAULT_TOTAL_LOT):
     try:
         x = int(float(v))
@@ -76,21 +60,6 @@ def _parse_total_lot(v, default=DEFAULT_TOTAL_LOT):
     return int(m)
 
 
-def _round_lots(call_raw, put_raw, total):
-    c = int(call_raw // LOT_MIN) * LOT_MIN
-    p = int(put_raw // LOT_MIN) * LOT_MIN
-    rem = total - (c + p)
-    while rem >= LOT_MIN:
-        frac_c = (call_raw - c)
-        frac_p = (put_raw - p)
-        if frac_c >= frac_p:
-            c += LOT_MIN
-        else:
-            p += LOT_MIN
-        rem -= LOT_MIN
-    return c, p
-
-
 def home(request):
     return render(request, "simulador_web/home.html")
 
@@ -102,8 +71,7 @@ def home(request):
 # LONG STRADDLE – VIEW PRINCIPAL (COM CACHE COMPLETO)
 # =========================================================
 
-# cache local (global no módulo)
-_ls_cache = {}
+# cache local: ls_linhas.ls_cache (também gravado pelo core.cache_warmer)
 
 
 async def acquire_lock_async(key):
@@ -126,15 +94,10 @@ def _redirect_landing_inactive(request):
     return redirect("/accounts/login/")
 
 
-@subscription_required
-async def long_straddle(request):
-
-    # =====================================================
-    # BLOQUEIO DEFINITIVO: expirada / blocked / inválida
-    # (antes de qualquer execução, cache, lock ou API)
-    # =====================================================
+def _bloqueio_assinatura(request, proximo):
+    """Redirect se a assinatura não permite usar o LS (senão None)."""
     if not request.user.is_authenticated:
-        return redirect("/accounts/login/?next=/app/ls/")
+        return redirect(f"/accounts/login/?next={proximo}")
 
     sub = getattr(request.user, "subscription", None)
 
@@ -152,6 +115,61 @@ async def long_straddle(request):
     if hasattr(sub, "is_active") and not sub.is_active():
         return _redirect_landing_inactive(request)
 
+    return None
+
+
+async def _contexto_pos_calculo(request, ativo, user_plan):
+    """
+    Contexto que não entra no cálculo: earnings último/próximo, IV crush do
+    último earnings (linha da tabela EarningsIvCrush), IV dos últimos 10
+    pregões e decisão por IV (PRO). As leituras são independentes: async ORM
+    em paralelo (asyncio.gather). Devolve (extras do contexto, iv_decisao).
+    """
+    pro = user_plan == "pro"
+    hoje = timezone.localdate()
+
+    async def _valor(v=None):
+        return v
+
+    earnings, crush, ultimos_iv, iv_decisao = await asyncio.gather(
+        aget_earnings_ultimo_proximo(ativo, hoje) if ativo else _valor((None, None)),
+        aget_earnings_crush(ativo, hoje) if pro and ativo else _valor(),
+        aget_iv_atm_ultimos(ativo, dias=10) if pro and ativo else _valor([]),
+        asyncio.to_thread(build_iv_decisao, request, ativo) if pro else _valor(),
+    )
+    earnings_last, earnings_next = earnings
+
+    iv_earnings = None
+    if pro and ativo and earnings_last:
+        if crush is not None and crush.earnings_date == earnings_last.earnings_date:
+            iv_earnings = {"d1": crush.iv_d1, "d0": crush.iv_d0, "p1": crush.iv_p1}
+        else:
+            # tabela ainda sem o evento: a página sai sem o bloco; o recálculo
+            # fica com os signals / ingestão / manage.py recalcular_earnings_crush
+            print(f"[EARNINGS-CRUSH] {ativo} sem linha para {earnings_last.earnings_date}", flush=True)
+
+    # dicts em vez de instâncias: o contexto vai para o _ls_cache (e para o snapshot)
+    extras = {
+        "earnings_last": model_to_dict(earnings_last) if earnings_last else None,
+        "earnings_next": model_to_dict(earnings_next) if earnings_next else None,
+        "iv_earnings": iv_earnings,
+        "earnings_crush": model_to_dict(crush) if iv_earnings else None,
+        "iv_dias": formatar_iv_ultimos_dias(ultimos_iv),
+    }
+    return extras, iv_decisao
+
+
+@subscription_required
+async def long_straddle(request):
+
+    # =====================================================
+    # BLOQUEIO DEFINITIVO: expirada / blocked / inválida
+    # (antes de qualquer execução, cache, lock ou API)
+    # =====================================================
+    bloqueio = _bloqueio_assinatura(request, "/app/ls/")
+    if bloqueio:
+        return bloqueio
+
     # 🔒 EVITAR EXECUÇÃO AUTOMÁTICA (HEAD / GET VAZIO)
     if request.method == "HEAD":
         contexto = {}
@@ -198,12 +216,14 @@ async def long_straddle(request):
     )
 
     import time
+    from core.cache_ttl import expira_em
+
+    # validade de cada entrada vem da política de TTL (pregão B3): curta com
+    # mercado aberto, até a próxima pré-abertura com mercado fechado
     now_ts = time.time()
-    ttl_ls = 600  # segundos de TTL do Long Straddle
 
-    global _ls_cache
     cached = _ls_cache.get(cache_key)
-    if cached and now_ts - cached["ts"] <= ttl_ls:
+    if cached and now_ts < cached["expira"]:
         contexto = dict(cached["data"])
         if user_plan == "pro":
             contexto["iv_decisao"] = await asyncio.to_thread(
@@ -252,286 +272,46 @@ async def long_straddle(request):
 
     try:
         # ------------------------------------------------------
-        # 1) DEFINIR QUAIS ATIVOS SERÃO PROCESSADOS
-        # ------------------------------------------------------
-        if ativo:
-            tickers = [ativo]
-        else:
-            tickers = await get_tickers_for_user(request.user)
-        # ------------------------------------------------------
-        # 2) RODAR SCREENER ATM PARA CADA TICKER (ASSÍNCRONO)
+        # 1–4) BASE DO CÁLCULO — independe de crush, lote e BE máx.
+        #      (cacheada à parte: mudar esses campos não refaz
+        #       screener, spot, detalhes por opção nem inversão de IV)
         # ------------------------------------------------------
+        base_key = _base_ls_key(ativo, horizonte, num_vencimentos, user_plan)
+        base = _ls_cache.get(base_key)
 
-        async def run_screener(tkr):
-            return await asyncio.to_thread(atualizar_e_screener_atm_2venc, tkr, False)
-
-        linhas_atm = []
-        resultados = await asyncio.gather(*[run_screener(t) for t in tickers], return_exceptions=True)
-
-        for tkr, res in zip(tickers, resultados):
-            if isinstance(res, Exception):
-                continue
-            atm_tkr = (res or {}).get("atm", []) or []
-            for row in atm_tkr:
-                r = dict(row)
-                r["ticker"] = tkr
-                linhas_atm.append(r)
-
-        if not linhas_atm:
-            raise ValueError("Nenhuma linha ATM retornada pelo screener.")
-
-        linhas_atm.sort(key=lambda r: r.get("ticker", ""))
-
-        # ------------------------------------------------------
-        # 3) SPOT OFICIAL
-        # ------------------------------------------------------
-        from services.api import get_spot_ativo_oficial
-
-        spot_uni = None
-        spots_oficiais = {}
-
-        if len(tickers) == 1:
-            try:
-                spot_uni = get_spot_ativo_oficial(tickers[0])
-            except:
-                spot_uni = None
-            if spot_uni is None and linhas_atm:
-                spot_uni = _to_float(linhas_atm[0].get("spot"))
-            spot_uni = _to_float(spot_uni) if spot_uni else 0.0
-            if spot_uni:
-                spots_oficiais[tickers[0]] = spot_uni
+        if base and now_ts < base["expira"]:
+            linhas_atm = [dict(r) for r in base["data"]["linhas_atm"]]
+            matrizes_crush = base["data"]["matrizes_crush"]
+            spot_uni = base["data"]["spot_uni"]
         else:
-            for tkr in tickers:
-                try:
-                    so = get_spot_ativo_oficial(tkr)
-                    if so is not None:
-                        spots_oficiais[tkr] = _to_float(so)
-                except:
-                    continue
-
-        for r in linhas_atm:
-            tkr = r.get("ticker")
-            if tkr in spots_oficiais:
-                r["spot_oficial"] = spots_oficiais[tkr]
+            # 1) ativos → 2) screener ATM (em paralelo) → 3) spot oficial
+            # → 4) D+1 parte fixa (prêmio de mercado, BE, IV de mercado e
+            #    matriz de preços/deltas por crush 0–50%)
+            if ativo:
+                tickers = [ativo]
+            else:
+                tickers = await get_tickers_for_user(request.user)
+
+            dados = await asyncio.to_thread(ls_linhas.montar_base_ls, tickers, horizonte)
+            _guardar_base_ls(base_key, dados, now_ts)
+            linhas_atm = dados["linhas_atm"]
+            matrizes_crush = dados["matrizes_crush"]
+            spot_uni = dados["spot_uni"]
 
         # ------------------------------------------------------
-        # 4) D+1 + CRUSH IV (mesma lógica Flet)
+        # 4.1) D+1 + CRUSH IV — só consulta a matriz (sem API/BS)
         # ------------------------------------------------------
-        from simulacoes.black_scholes import black_scholes, implied_vol
-        from services.api import buscar_detalhes_opcao
-        import os
-
         if horizonte == "D+1" and linhas_atm:
-
-            # >>> AJUSTE D+1 (LOG / MID / BS)
-            # Logs ativados por padrão em ambiente local.
-            # Para desligar explicitamente: export LS_D1_LOG=0
-            log_d1 = os.getenv("LS_D1_LOG", "1") == "1"
-
-            def _px_ref(d):
-                """
-                Preço de referência para mercado:
-                - Se bid>0 e ask>0 => MID
-                - Senão => fallback (ask/last/close/bid)
-                Retorna: (preco, src, bid, ask)
-                """
-                b = _to_float(d.get("bid"))
-                a = _to_float(d.get("ask"))
-                last = _to_float(d.get("last"))
-                close = _to_float(d.get("close"))
-
-                if b > 0 and a > 0:
-                    return (b + a) / 2.0, "MID", b, a
-
-                if a > 0:
-                    return a, "ASK", b, a
-                if last > 0:
-                    return last, "LAST", b, a
-                if close > 0:
-                    return close, "CLOSE", b, a
-                if b > 0:
-                    return b, "BID", b, a
-                return 0.0, "ZERO", b, a
-
-            def _implied_or_min(preco, S, K, r, T, kind):
-                try:
-                    iv = implied_vol(preco, S, K, r, 0.0, T, kind)
-                    return max(0.0001, iv) if iv else 0.0001
-                except:
-                    return 0.0001
-
-            def _T_years(days_val):
-                try:
-                    dias = max(1, int(_to_float(days_val, 1)))
-                    return dias / 252.0
-                except:
-                    return 1 / 252.0
-
-            crush = crush_iv
-            f = max(0.0, 1.0 - crush / 100.0)
-            r_aa = _to_float(os.getenv("SELIC_AA", "10.0")) / 100.0
-
-            detalhes_cache = {}
-
-            for r in linhas_atm:
-                call_sym = r.get("call")
-                put_sym = r.get("put")
-                if not call_sym or not put_sym:
-                    continue
-
-                try:
-                    if call_sym in detalhes_cache:
-                        cd = detalhes_cache[call_sym]
-                    else:
-                        cd = buscar_detalhes_opcao(call_sym)
-                        detalhes_cache[call_sym] = cd
-
-                    if put_sym in detalhes_cache:
-                        pd = detalhes_cache[put_sym]
-                    else:
-                        pd = buscar_detalhes_opcao(put_sym)
-                        detalhes_cache[put_sym] = pd
-
-                    if spot_uni and spot_uni > 0:
-                        S = spot_uni
-                    else:
-                        S = _to_float(r.get("spot_oficial") or cd.get("spot_price") or pd.get("spot_price"))
-
-                    Kc = _to_float(cd.get("strike"))
-                    Kp = _to_float(pd.get("strike"))
-
-                    Tc = _T_years(cd.get("days_to_maturity"))
-                    Tp = _T_years(pd.get("days_to_maturity"))
-
-                    # D+1 => reduz 1 dia útil
-                    Tc1 = max(Tc - 1/252.0, 1e-6)
-                    Tp1 = max(Tp - 1/252.0, 1e-6)
-
-                    Pc_mkt, src_c, bid_c, ask_c = _px_ref(cd)
-                    Pp_mkt, src_p, bid_p, ask_p = _px_ref(pd)
-
-                    if log_d1:
-                        print(f"[D+1][PX][CALL] {call_sym} | bid={bid_c:.4f} | ask={ask_c:.4f} | src={src_c} | px={Pc_mkt:.4f}", flush=True)
-                        print(f"[D+1][PX][PUT ] {put_sym} | bid={bid_p:.4f} | ask={ask_p:.4f} | src={src_p} | px={Pp_mkt:.4f}", flush=True)
-
-                    # IV de mercado (a partir do preço de mercado)
-                    sig_c = _implied_or_min(Pc_mkt, S, Kc, r_aa, Tc, "CALL")
-                    sig_p = _implied_or_min(Pp_mkt, S, Kp, r_aa, Tp, "PUT")
-
-                    # IV pós-crush para o cenário D+1
-                    sig_c1 = max(1e-4, sig_c * f)
-                    sig_p1 = max(1e-4, sig_p * f)
-
-                    # BS do cenário (para delta/greeks), mas prêmio exibido vem do mercado (px_ref)
-                    bs_c = black_scholes(S, Kc, r_aa, 0.0, sig_c1, Tc1, "CALL") or {}
-                    bs_p = black_scholes(S, Kp, r_aa, 0.0, sig_p1, Tp1, "PUT") or {}
-
-                    d_c = bs_c.get("delta")
-                    d_p = bs_p.get("delta")
-
-                    if log_d1:
-                        print(f"[D+1][BS][CALL] {call_sym} | IV_mkt={sig_c:.4f} | IV_crush={sig_c1:.4f} | delta={d_c}", flush=True)
-                        print(f"[D+1][BS][PUT ] {put_sym} | IV_mkt={sig_p:.4f} | IV_crush={sig_p1:.4f} | delta={d_p}", flush=True)
-
-                    # Prêmios exibidos no D+1 = preço de mercado (MID quando possível)
-                    r["call_premio"] = Pc_mkt
-                    r["put_premio"] = Pp_mkt
-                    prem_total = Pc_mkt + Pp_mkt
-                    r["premium_total"] = prem_total
-
-                    # BE coerente com o prêmio exibido (corrige bug Pc1/Pp1 inexistentes)
-                    r["be_down"] = round(Kp - prem_total, 4)
-                    r["be_up"] = round(Kc + prem_total, 4)
-
-                    # Atualiza deltas para D+1 (sem depender do screener)
-                    if d_c is not None:
-                        r["call_delta"] = round(_to_float(d_c), 4)
-                    if d_p is not None:
-                        r["put_delta"] = round(_to_float(d_p), 4)
-
-                    S = r["spot"]  # usa o mesmo spot do screener ATM
-
-                except:
-                    continue
-
-            aviso_horizonte = f"Cálculo D+1 aplicado com Crush IV de {crush_iv:.1f}%."
-            # <<< FIM AJUSTE D+1
+            aviso_horizonte = ls_linhas.aplicar_crush(linhas_atm, matrizes_crush, crush_iv)
         else:
             aviso_horizonte = None
 
         # ------------------------------------------------------
         # 5) LOTES, CUSTO, BE%
-        # ------------------------------------------------------
-        linhas_enriquecidas = []
-        for r in linhas_atm:
-            delta_c = r.get("call_delta")
-            delta_p = r.get("put_delta")
-
-            w_call = abs(_to_float(delta_p)) if delta_p is not None else 1.0
-            w_put = abs(_to_float(delta_c)) if delta_c is not None else 1.0
-            soma = w_call + w_put
-
-            if soma == 0:
-                continue
-
-            raw_call = lote_total * (w_call / soma)
-            raw_put = lote_total - raw_call
-
-            qty_call, qty_put = _round_lots(raw_call, raw_put, lote_total)
-
-            call_premio = _to_float(r.get("call_premio"))
-            put_premio = _to_float(r.get("put_premio"))
-            custo_oper = qty_call * call_premio + qty_put * put_premio
-
-            r = dict(r)
-            r["qty_call"] = qty_call
-            r["qty_put"] = qty_put
-
-            # ✅ Substituição mínima: remove locale e mantém padrão R$ 5.931,50
-            r["custo_operacao"] = fmt_brl(custo_oper)
-
-            if r.get("spot_oficial") is not None:
-                spot_ref = _to_float(r["spot_oficial"])
-            elif spot_uni:
-                spot_ref = spot_uni
-            else:
-                spot_ref = _to_float(r.get("spot"))
-
-            be_down_val = r.get("be_down")
-            be_up_val = r.get("be_up")
-
-            if spot_ref and spot_ref > 0:
-                r["be_pct_down"] = ((be_down_val / spot_ref) - 1.0) * 100 if be_down_val else None
-                r["be_pct_up"] = ((be_up_val / spot_ref) - 1.0) * 100 if be_up_val else None
-            else:
-                r["be_pct_down"] = None
-                r["be_pct_up"] = None
-
-            linhas_enriquecidas.append(r)
-
-        # ------------------------------------------------------
         # 6) FILTROS
         # ------------------------------------------------------
-        if be_max_pct is not None:
-            linhas_enriquecidas = [
-                r for r in linhas_enriquecidas
-                if (
-                    r.get("be_pct_down") is not None and abs(r["be_pct_down"]) <= be_max_pct
-                ) or (
-                    r.get("be_pct_up") is not None and abs(r["be_pct_up"]) <= be_max_pct
-                )
-            ]
-
-        if num_vencimentos in ("1", "2"):
-            max_rows = 2 if num_vencimentos == "1" else 4
-            agrupado = {}
-            for r in linhas_enriquecidas:
-                agrupado.setdefault(r["ticker"], []).append(r)
-
-            linhas_final = []
-            for tkr, rows in agrupado.items():
-                linhas_final.extend(rows[:max_rows])
-            linhas_enriquecidas = linhas_final
+        linhas_enriquecidas = ls_linhas.enriquecer_lotes(linhas_atm, lote_total, spot_uni)
+        linhas_enriquecidas = ls_linhas.filtrar(linhas_enriquecidas, be_max_pct, num_vencimentos)
 
         if not linhas_enriquecidas:
             raise ValueError("Nenhuma opção após filtros.")
@@ -539,74 +319,25 @@ async def long_straddle(request):
         # ------------------------------------------------------
         # 6.1) ORDENAÇÃO POR MENOR BE% + REDUÇÃO (APENAS PLANO PRO)
         # ------------------------------------------------------
-
         if user_plan == "pro":
-
-            def _be_pct_min(r):
-                vals = []
-                if r.get("be_pct_down") is not None:
-                    vals.append(abs(r["be_pct_down"]))
-                if r.get("be_pct_up") is not None:
-                    vals.append(abs(r["be_pct_up"]))
-                return min(vals) if vals else float("inf")
-
-            # Sempre ordenar por menor BE%
-            linhas_enriquecidas.sort(key=_be_pct_min)
-
-            # Consulta FULL (sem ativo): manter apenas 1 LS por ticker
-            if not ativo:
-                agrupado = {}
-                for r in linhas_enriquecidas:
-                    agrupado.setdefault(r["ticker"], []).append(r)
-
-                linhas_finais = []
-
-                for tkr, rows in agrupado.items():
-
-                    # 🔎 LOG — CANDIDATOS
-                    print(f"[LS-RANK][CANDIDATOS] {tkr}", flush=True)
-                    for r in rows:
-                        print(
-                            f"  call={r.get('call')} put={r.get('put')} | "
-                            f"venc={r.get('due_date')} | "
-                            f"be_pct_down={r.get('be_pct_down'):.4f} "
-                            f"be_pct_up={r.get('be_pct_up'):.4f} | "
-                            f"be_pct_min={_be_pct_min(r):.4f}",
-                            flush=True
-                        )
-
-                    # vencedor = menor BE%
-                    vencedor = rows[0]
-                    linhas_finais.append(vencedor)
-
-                    # 🏆 LOG — ESCOLHIDO
-                    print(
-                        f"[LS-RANK][ESCOLHIDO] {tkr} | "
-                        f"call={vencedor.get('call')} put={vencedor.get('put')} | "
-                        f"be_pct_min={_be_pct_min(vencedor):.4f}",
-                        flush=True
-                    )
-
-                linhas_enriquecidas = linhas_finais
+            linhas_enriquecidas = ls_linhas.ranquear_pro(linhas_enriquecidas, ativo)
 
         # ------------------------------------------------------
         # 7) SIMULAÇÃO FINAL
         # ------------------------------------------------------
-        from services.api import buscar_detalhes_opcao
-        from simulacoes.long_straddle import simular_long_straddle
-
-        primeira = linhas_enriquecidas[0]
-        call0 = buscar_detalhes_opcao(primeira["call"])
-        put0 = buscar_detalhes_opcao(primeira["put"])
-        resultado = simular_long_straddle(call0, put0, renderizar=False)
+        # todas as linhas numa passada (prêmios do screener, sem API); vão
+        # para o contexto cacheado e o template troca de linha no cliente
+        from simulacoes.long_straddle import simular_long_straddle_batch
 
+        simulacoes_ls = simular_long_straddle_batch(linhas_enriquecidas)
         if spot_uni:
-            resultado["spot"] = float(spot_uni)
-        else:
-            resultado["spot"] = _to_float(primeira.get("spot_oficial") or primeira.get("spot"))
+            for sim in simulacoes_ls:
+                sim["spot"] = float(spot_uni)
+        resultado = simulacoes_ls[0]
 
         contexto = {
             "resultado": resultado,
+            "simulacoes_ls": simulacoes_ls,
             "erro": None,
             "ativo": ativo,
             "spot_oficial": spot_uni if spot_uni else None,
@@ -622,6 +353,7 @@ async def long_straddle(request):
     except Exception as ex:
         contexto = {
             "resultado": None,
+            "simulacoes_ls": None,
             "erro": str(ex),
             "ativo": ativo,
             "spot_oficial": None,
@@ -638,96 +370,141 @@ async def long_straddle(request):
         await release_lock_async(cache_key)
 
     # ---------------------------------------------------------
-    # INJETAR IV DECISÃO (FORÇADO)
+    # ENRIQUECIMENTO PÓS-CÁLCULO — FORA DO CACHE DO CÁLCULO
+    # (earnings, IV no último earnings, IV dos últimos dias, decisão IV)
     # ---------------------------------------------------------
-    if user_plan == "pro":
-        contexto["iv_decisao"] = await asyncio.to_thread(
-            build_iv_decisao, request, ativo
-        )
-    else:
-        contexto["iv_decisao"] = None
-
+    extras, iv_decisao = await _contexto_pos_calculo(request, ativo, user_plan)
+    contexto.update(extras)
 
     # ---------------------------------------------------------
-    # INJETAR EARNINGS (ÚLTIMO / PRÓXIMO) — FORA DO CACHE
+    # SALVAR RESULTADO FINAL NO CACHE
     # ---------------------------------------------------------
-    earnings_last = None
-    earnings_next = None
+    contexto_cache = dict(contexto)
+    contexto_cache["iv_decisao"] = None  # nunca cachear IV decisão
 
-    if ativo:
-        hoje = timezone.localdate()
+    salvo_ts = time.time()
+    _ls_cache[cache_key] = {
+        "ts": salvo_ts,
+        "expira": expira_em("ls", salvo_ts),
+        "data": contexto_cache
+    }
 
-        earnings_last = await sync_to_async(
-            lambda: EarningsDate.objects
-            .filter(ticker=ativo, earnings_date__lte=hoje)
-            .order_by("-earnings_date")
-            .first()
-        )()
+    contexto["iv_decisao"] = iv_decisao
+    return render(request, "simulador_web/long_straddle.html", contexto)
 
-        earnings_next = await sync_to_async(
-            lambda: EarningsDate.objects
-            .filter(ticker=ativo, earnings_date__gte=hoje)
-            .order_by("earnings_date")
-            .first()
-        )()
 
-    contexto["earnings_last"] = earnings_last
-    contexto["earnings_next"] = earnings_next
+# =========================================================
+# LONG STRADDLE – MODO STREAMING (SSE)
+# =========================================================
+def _sse(evento, dados):
+    from django.core.serializers.json import DjangoJSONEncoder
 
-    # ---------------------------------------------------------
-    # IV NO ÚLTIMO EARNINGS (D-1 / D0 / D+1) — FORA DO CACHE
-    # ---------------------------------------------------------
-    iv_earnings = None
+    return f"event: {evento}\ndata: {json.dumps(dados, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n"
 
-    if user_plan == "pro" and ativo and earnings_last:
-        d0 = earnings_last.earnings_date
-        d1 = d0 - timedelta(days=1)
-        p1 = d0 + timedelta(days=1)
 
-        iv_earnings = {
-            "d1": await sync_to_async(get_iv_atm_por_data)(ativo, d0, "ANTERIOR"),
-            "d0": await sync_to_async(get_iv_atm_por_data)(ativo, d0, "EXATA"),
-            "p1": await sync_to_async(get_iv_atm_por_data)(ativo, d0, "POSTERIOR"),
-        }
+async def _eventos_ls(tickers, params):
+    """
+    Um evento "ativo" por ticker assim que o screener + enriquecimento dele
+    terminam (ordem de chegada), "erro" para os que falharem e um "resumo"
+    final com o ranking de todos.
+    """
+    import time
+    from core.app_core import atualizar_e_screener_atm_2venc
+
+    t0 = time.perf_counter()
+    unico = len(tickers) == 1
+
+    async def _ativo(tkr):
+        try:
+            res = await asyncio.to_thread(atualizar_e_screener_atm_2venc, tkr, False)
+            out = await asyncio.to_thread(ls_linhas.linhas_ls_ativo, tkr, res, unico=unico, **params)
+            return tkr, out, None
+        except Exception as e:
+            return tkr, None, str(e)
+
+    tarefas = [asyncio.ensure_future(_ativo(t)) for t in tickers]
+    ranking, falhas = [], []
+    primeira = None
+    try:
+        yield _sse("inicio", {"tickers": tickers})
+        for fut in asyncio.as_completed(tarefas):
+            tkr, out, erro = await fut
+            seg = round(time.perf_counter() - t0, 3)
+            if erro or not out["linhas"]:
+                falhas.append(tkr)
+                yield _sse("erro", {"ticker": tkr, "erro": erro or "Nenhuma linha LS para o ativo.", "segundos": seg})
+                continue
+            if primeira is None:
+                primeira = seg
+            ranking.extend(
+                {"ticker": tkr, "call": r.get("call"), "put": r.get("put"),
+                 "due_date": r.get("due_date"), "be_pct_min": ls_linhas.be_pct_min(r)}
+                for r in out["linhas"]
+            )
+            yield _sse("ativo", dict(out, ticker=tkr, segundos=seg))
+    finally:
+        for t in tarefas:
+            t.cancel()
 
-    contexto["iv_earnings"] = iv_earnings
+    if params["user_plan"] == "pro":
+        ranking.sort(key=lambda x: x["be_pct_min"])
+    else:
+        ranking.sort(key=lambda x: x["ticker"])
+    for x in ranking:
+        if x["be_pct_min"] == float("inf"):
+            x["be_pct_min"] = None
 
-    # ---------------------------------------------------------
-    # INJETAR IV ÚLTIMOS DIAS (D-1 até D-10) — FORA DO CACHE
-    # ---------------------------------------------------------
-    if user_plan == "pro" and ativo:
+    yield _sse("resumo", {
+        "tickers": len(tickers),
+        "ok": len(tickers) - len(falhas),
+        "falhas": falhas,
+        "ranking": ranking,
+        "primeira_linha_s": primeira,
+        "segundos": round(time.perf_counter() - t0, 3),
+    })
 
-        iv_dias = await sync_to_async(
-            lambda: get_iv_ultimos_dias(
-                IvAtmHistorico.objects.filter(ticker=ativo),
-                dias=10
-            )
-        )()
 
-        contexto["iv_dias"] = iv_dias
-    else:
-        contexto["iv_dias"] = []
+@subscription_required
+async def long_straddle_stream(request):
+    """
+    Mesmos parâmetros de long_straddle, resposta em text/event-stream: cada
+    ativo chega assim que fica pronto, em vez de esperar o asyncio.gather
+    de todos (um ativo lento não segura a lista inteira). Sem cache de
+    página; o screener e a cadeia continuam cacheados.
+    """
+    from django.http import StreamingHttpResponse
 
-    # ---------------------------------------------------------
-    # SALVAR RESULTADO FINAL NO CACHE
-    # ---------------------------------------------------------
-    contexto_cache = dict(contexto)
-    contexto_cache["iv_decisao"] = None  # nunca cachear IV decisão
+    bloqueio = _bloqueio_assinatura(request, "/app/ls/")
+    if bloqueio:
+        return bloqueio
 
-    _ls_cache[cache_key] = {
-        "ts": time.time(),
-        "data": contexto_cache
+    ativo = (request.GET.get("ativo") or "").upper().strip()
+    be_max_pct_raw = request.GET.get("be_max_pct")
+    params = {
+        "horizonte": request.GET.get("horizonte") or "Vencimento",
+        "crush_iv": _to_float(request.GET.get("crush_iv") or "10", 10.0),
+        "lote_total": _parse_total_lot(request.GET.get("lote_total") or str(DEFAULT_TOTAL_LOT), DEFAULT_TOTAL_LOT),
+        "be_max_pct": float(be_max_pct_raw) if be_max_pct_raw else None,
+        "num_vencimentos": request.GET.get("num_vencimentos", "1"),
+        "user_plan": request.user.subscription.plan,
+        "ativo": ativo,
     }
+    tickers = [ativo] if ativo else await get_tickers_for_user(request.user)
 
-    # >>> IV HISTÓRICA (FORA DO CACHE) <<<
-    if user_plan == "pro":
-        contexto["iv_decisao"] = await asyncio.to_thread(
-            build_iv_decisao, request, ativo
-        )
-    else:
-        contexto["iv_decisao"] = None
+    resp = StreamingHttpResponse(_eventos_ls(tickers, params), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"
+    return resp
 
-    return render(request, "simulador_web/long_straddle.html", contexto)
+
+def cache_warmer_status(request):
+    """JSON (staff) com a idade do último refresh do warmer por ativo."""
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return JsonResponse({"erro": "acesso restrito"}, status=403)
+
+    from core.cache_warmer import estado_warmer
+
+    return JsonResponse(estado_warmer(), json_dumps_params={"ensure_ascii": False})
 
 
 def sair(request):
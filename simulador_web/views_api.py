@@ -0,0 +1,228 @@
+# simulador_web/views_api.py
+"""
+API JSON (v1) do screener, da simulação de um par, da decisão por IV e do
+ranking de IV crush nos earnings.
+
+Para polling barato (template, cliente Flet):
+- ETag / Last-Modified derivados da versão dos dados (maior `time` da
+  cadeia, ver services.api.versao_cadeia) → 304 sem corpo quando nada mudou
+- Cache-Control com o TTL da sessão B3 (core.cache_ttl)
+- JSON compacto; as linhas do screener vão em colunas + valores
+
+Rotas em simulador_web/urls.py (prefixo api/v1/).
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+
+from core.cache_ttl import ttl
+from simulador_web.domain import ls_linhas
+
+API_VERSAO = 1
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+def _erro(msg, status):
+    return JsonResponse({"erro": msg}, status=status, json_dumps_params={"ensure_ascii": False})
+
+
+def _acesso(request, *, pro=False):
+    """JsonResponse de erro se o usuário não pode usar a API (senão None)."""
+    if not request.user.is_authenticated:
+        return _erro("não autenticado", 401)
+    sub = getattr(request.user, "subscription", None)
+    if not sub or not sub.is_active():
+        return _erro("assinatura inativa", 403)
+    if pro and sub.plan != "pro":
+        return _erro("disponível no plano PRO", 403)
+    return None
+
+
+def _hash(*partes) -> str:
+    return hashlib.blake2b(repr(partes).encode(), digest_size=8).hexdigest()
+
+
+def _last_modified(versao):
+    # versão numérica = epoch ms da última cotação da cadeia
+    try:
+        return int(versao) // 1000
+    except (TypeError, ValueError):
+        return None
+
+
+def _resposta(request, dados, *, etag, categoria, modificado=None):
+    """
+    JSON compacto com ETag/Last-Modified/Cache-Control; 304 se o cliente já
+    tem essa versão (If-None-Match / If-Modified-Since).
+    """
+    etag = f'"{etag}"'
+    resp = HttpResponse(content_type="application/json")
+    resp["ETag"] = etag
+    resp["Cache-Control"] = f"private, max-age={ttl(categoria)}"
+    if modificado:
+        from django.utils.http import http_date
+
+        resp["Last-Modified"] = http_date(modificado)
+
+    cond = get_conditional_response(request, etag=etag, last_modified=modificado, response=resp)
+    if cond is not resp:
+        return cond  # 304/412 (o Django copia ETag, Last-Modified e Cache-Control)
+
+    resp.content = json.dumps(dados, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":"))
+    return resp
+
+
+def _tabela(linhas):
+    colunas = list(dict.fromkeys(k for r in linhas for k in r))
+    return {"colunas": colunas, "linhas": [[r.get(c) for c in colunas] for r in linhas]}
+
+
+def _screener(ticker):
+    from core.app_core import atualizar_e_screener_atm_2venc
+
+    return atualizar_e_screener_atm_2venc(ticker, False) or {}
+
+
+# ------------------------------------------------------------
+# Endpoints
+# ------------------------------------------------------------
+@require_GET
+def screener(request, ticker):
+    """Linhas ATM dos 2 próximos vencimentos do ativo."""
+    negado = _acesso(request)
+    if negado:
+        return negado
+
+    ticker = ticker.upper().strip()
+    res = _screener(ticker)
+    if not res.get("atm"):
+        return _erro(f"sem linhas ATM para {ticker}", 404)
+
+    versao = res.get("versao") or _hash(res["atm"])
+    dados = {
+        "v": API_VERSAO,
+        "ticker": ticker,
+        "versao": versao,
+        "due_dates": res.get("due_dates", []),
+        **_tabela(res["atm"]),
+    }
+    return _resposta(
+        request, dados,
+        etag=f"scr-{ticker}-{versao}",
+        categoria="screener",
+        modificado=_last_modified(res.get("versao")),
+    )
+
+
+@require_GET
+def simulacao(request, ticker):
+    """
+    Long straddle de um par do screener: ?call=&put= (padrão: o mais ATM
+    do 1º vencimento) e &lote_total= (lotes pelo delta, como na tela).
+    """
+    negado = _acesso(request)
+    if negado:
+        return negado
+
+    from simulacoes.long_straddle import simular_long_straddle_batch
+    from simulador_web.views import DEFAULT_TOTAL_LOT, _parse_total_lot
+
+    ticker = ticker.upper().strip()
+    call = (request.GET.get("call") or "").upper().strip()
+    put = (request.GET.get("put") or "").upper().strip()
+    lote_total = _parse_total_lot(request.GET.get("lote_total") or DEFAULT_TOTAL_LOT)
+
+    res = _screener(ticker)
+    linhas = ls_linhas.linhas_do_screener(ticker, res)
+    if call or put:
+        linhas = [r for r in linhas if (not call or r.get("call") == call) and (not put or r.get("put") == put)]
+    if not linhas:
+        return _erro("par não encontrado no screener", 404)
+
+    linha = ls_linhas.enriquecer_lotes(linhas[:1], lote_total, None)
+    if not linha:
+        return _erro("par sem deltas para dividir o lote", 422)
+    linha = linha[0]
+
+    versao = res.get("versao") or _hash(linhas[0])
+    dados = {
+        "v": API_VERSAO,
+        "ticker": ticker,
+        "versao": versao,
+        "linha": linha,
+        "simulacao": simular_long_straddle_batch([linha])[0],
+    }
+    return _resposta(
+        request, dados,
+        etag=f"sim-{ticker}-{versao}-{_hash(linha['call'], linha['put'], lote_total)}",
+        categoria="ls",
+        modificado=_last_modified(res.get("versao")),
+    )
+
+
+@require_GET
+def iv_decisao(request, ticker):
+    """Decisão LS por IV (IV atual × percentis históricos). Plano PRO."""
+    negado = _acesso(request, pro=True)
+    if negado:
+        return negado
+
+    from simulador_web.domain.iv_atm_decision import build_iv_decisao
+
+    ticker = ticker.upper().strip()
+    decisao = build_iv_decisao(request, ticker)
+    if not decisao:
+        return _erro("ticker inválido", 400)
+
+    dados = {"v": API_VERSAO, "ticker": ticker, "decisao": decisao}
+    corpo = json.dumps(decisao, cls=DjangoJSONEncoder, sort_keys=True)
+    return _resposta(
+        request, dados,
+        etag=f"iv-{ticker}-{_hash(corpo)}",
+        categoria="iv_decisao",
+    )
+
+
+@require_GET
+def earnings_crush(request):
+    """
+    Ranking por IV crush médio nos últimos earnings (tabela EarningsIvCrush):
+    último evento de cada ativo; ?tickers=PETR4,VALE3 restringe. Plano PRO.
+    """
+    negado = _acesso(request, pro=True)
+    if negado:
+        return negado
+
+    from simulador_web.repositories.earnings_crush_repository import ranking_earnings_crush
+
+    tickers = [t for t in (request.GET.get("tickers") or "").upper().split(",") if t.strip()]
+    linhas = [
+        {
+            "ticker": r.ticker,
+            "earnings_date": r.earnings_date,
+            "crush_pct": r.crush_pct,
+            "move_pct": r.move_pct,
+            "move_implicito_pct": r.move_implicito_pct,
+            "eventos_media": r.eventos_media,
+            "crush_medio_pct": r.crush_medio_pct,
+            "move_medio_pct": r.move_medio_pct,
+            "razao_move_media": r.razao_move_media,
+            "atualizado_em": r.atualizado_em,
+        }
+        for r in ranking_earnings_crush(tickers or None)
+    ]
+
+    atualizado = max((r["atualizado_em"] for r in linhas), default=None)
+    dados = {"v": API_VERSAO, "tickers": tickers, **_tabela(linhas)}
+    return _resposta(
+        request, dados,
+        etag=f"crush-{_hash(tickers, atualizado, len(linhas))}",
+        categoria="iv_decisao",
+        modificado=int(atualizado.timestamp()) if atualizado else None,
+    )
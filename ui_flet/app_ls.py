@@ -11,12 +11,12 @@ try:
 except Exception:
     pass
 
+import base64
 import flet as ft
-from typing import Dict, Any, List
+from typing import Dict, Any
 
-from services.api import buscar_detalhes_opcao
-from simulacoes.long_straddle import simular_long_straddle
-from core.app_core import atualizar_e_screener_atm_2venc
+# services.api / simulacoes / core.app_core (requests, numpy, Django cache)
+# são importados nos handlers: a janela abre antes de carregar o motor
 
 
 # ---------------- Helpers ----------------
@@ -54,14 +54,10 @@ def preco_compra_premio(leg: Dict[str, Any]) -> float:
     if bid > 0: return bid
     return 0.0
 
-def gerar_malha_precos(centro: float, n_pontos: int = 101, largura: float = 0.4) -> List[float]:
-    if centro <= 0: centro = 10.0
-    pmin = max(0.0, centro * (1 - largura))
-    pmax = centro * (1 + largura)
-    passo = (pmax - pmin) / (n_pontos - 1)
-    return [round(pmin + i * passo, 2) for i in range(n_pontos)]
-
 def fallback_res(call: Dict[str, Any], put: Dict[str, Any]) -> Dict[str, Any]:
+    from simulacoes.base import OptionLeg
+    from simulacoes.estrategias import LONG_STRADDLE
+
     strike_call = to_float(call.get("strike"))
     strike_put  = to_float(put.get("strike"))
     premio_call = preco_compra_premio(call)
@@ -70,26 +66,20 @@ def fallback_res(call: Dict[str, Any], put: Dict[str, Any]) -> Dict[str, Any]:
     spot = to_float(call.get("spot_price") or put.get("spot_price"))
     venc = call.get("due_date") or put.get("due_date") or ""
 
-    custo_total = (premio_call + premio_put) * cs
-    be_down     = round(strike_put  - (premio_call + premio_put), 2)
-    be_up       = round(strike_call + (premio_call + premio_put), 2)
-
-    centro = spot or ((strike_call + strike_put)/2 if (strike_call and strike_put) else (strike_call or strike_put or 10.0))
-    precos = gerar_malha_precos(centro)
-
-    payoff = []
-    for px in precos:
-        lucro_call = max(0.0, px - strike_call) * cs
-        lucro_put  = max(0.0, strike_put - px) * cs
-        payoff.append(lucro_call + lucro_put - custo_total)
+    pernas = {
+        "call": OptionLeg(call.get("symbol", "CALL"), "CALL", strike_call, premium=premio_call, contract_size=cs),
+        "put": OptionLeg(put.get("symbol", "PUT"), "PUT", strike_put, premium=premio_put, contract_size=cs),
+    }
+    # malha adaptativa (limites ±40% do spot + strikes + BEs)
+    res = LONG_STRADDLE.simulate(pernas, spot=spot)
 
     return {
-        "estrategia": "Long Straddle",
-        "precos": precos,
-        "payoff": payoff,
+        "estrategia": res.estrategia,
+        "precos": res.precos,
+        "payoff": res.payoff,
         "spot": spot,
-        "be_down": be_down,
-        "be_up": be_up,
+        "be_down": round(strike_put - (premio_call + premio_put), 2),
+        "be_up": round(strike_call + (premio_call + premio_put), 2),
         "vencimento": venc,
     }
 
@@ -249,6 +239,9 @@ def build_simulador_panel(page):
         status_txt.value = f"Simulando {call_symbol} x {put_symbol}..."
         page.update()
         try:
+            from services.api import buscar_detalhes_opcao
+            from simulacoes.long_straddle import simular_long_straddle
+
             call = buscar_detalhes_opcao(call_symbol)
             put  = buscar_detalhes_opcao(put_symbol)
             try:
@@ -258,17 +251,13 @@ def build_simulador_panel(page):
             except Exception:
                 res = fallback_res(call, put)
 
-            from viz.payoff import plotar_payoff
-            fig, _ = plotar_payoff(
-                res["precos"], res["payoff"], res.get("spot"),
-                res.get("be_down"), res.get("be_up"),
-                call.get("symbol",""), put.get("symbol",""),
-                res.get("vencimento",""),
-                estrategia_nome=res.get("estrategia","Long Straddle"),
-                mostrar=False, fig_size=(6.0, 3.6), dpi=120, font_scale=0.95
+            from viz.render import renderizar_resultado
+            png = renderizar_resultado(
+                res, formato="png",
+                call_ticker=call.get("symbol",""), put_ticker=put.get("symbol",""),
+                fig_size=(6.0, 3.6), dpi=120, font_scale=0.95
             )
-            from flet.matplotlib_chart import MatplotlibChart
-            chart_container.content = MatplotlibChart(fig)
+            chart_container.content = ft.Image(src_base64=base64.b64encode(png).decode("ascii"))
             status_txt.value = "Simulação concluída."
             page.update()
         except Exception as ex:
@@ -291,6 +280,8 @@ def build_simulador_panel(page):
             page.update()
             return
         try:
+            from services.api import buscar_detalhes_opcao
+
             call = buscar_detalhes_opcao(call_symbol)
             put  = buscar_detalhes_opcao(put_symbol)
 
@@ -593,6 +584,8 @@ def build_screener_panel(page):
             page.update()
 
             # screener ATM com refresh forçado
+            from core.app_core import atualizar_e_screener_atm_2venc
+
             t1 = time.perf_counter()
             print(f"[{exec_id}] BEFORE atualizar_e_screener_atm_2venc(refresh=True)", flush=True)
             res = atualizar_e_screener_atm_2venc(t, refresh=False)
@@ -1,7 +1,6 @@
 # viz/payoff.py
 import math
 from typing import Iterable, Tuple, Optional
-from matplotlib.ticker import FuncFormatter
 
 def _fmt_brl(y, _pos=None):
     # Formata número como BRL: R$ 1.234,56
@@ -18,7 +17,16 @@ def _safe_vline(ax, x, **kwargs):
         return
     ax.axvline(x, **kwargs)
 
-def plotar_payoff(
+def titulo_payoff(estrategia_nome: str, call_ticker: str = "", put_ticker: str = "", vencimento: str = "") -> str:
+    titulo_tickers = f"{call_ticker} / {put_ticker}".strip(" /")
+    if titulo_tickers and vencimento:
+        return f"{estrategia_nome} – {titulo_tickers} – Venc.: {vencimento}"
+    if titulo_tickers:
+        return f"{estrategia_nome} – {titulo_tickers}"
+    return f"{estrategia_nome}"
+
+def desenhar_payoff(
+    ax,
     precos: Iterable[float],
     resultados: Iterable[float],
     preco_ativo: Optional[float] = None,
@@ -29,28 +37,10 @@ def plotar_payoff(
     vencimento: str = "",
     *,
     estrategia_nome: str = "Long Straddle",
-    salvar_em: Optional[str] = None,
-    mostrar: bool = True,
-    fig_size: Tuple[float, float] = (5.5, 3.2),  # menor por padrão
-    dpi: int = 120,
     font_scale: float = 0.9
 ):
-    """
-    Plota a curva de P&L de uma estratégia de opções.
-
-    - mostrar=True: usa pyplot e abre janela (CLI/terminal).
-    - mostrar=False: cria uma Figure "headless" (sem abrir janela), ideal para Flet.
-
-    Retorna: (fig, ax)
-    """
-    # Criação da figure
-    if mostrar:
-        import matplotlib.pyplot as plt  # backend interativo só quando precisa
-        fig, ax = plt.subplots(figsize=fig_size, dpi=dpi)
-    else:
-        from matplotlib.figure import Figure  # headless (sem janela)
-        fig = Figure(figsize=fig_size, dpi=dpi)
-        ax = fig.add_subplot(111)
+    """Desenha a curva de P&L num Axes já existente (usado também por viz.render)."""
+    from matplotlib.ticker import FuncFormatter
 
     # Garantir listas
     precos = list(precos or [])
@@ -66,13 +56,7 @@ def plotar_payoff(
     _safe_vline(ax, be_superior, color="blue",   linestyle="--", linewidth=1, label="BE Superior")
 
     # Título
-    titulo_tickers = f"{call_ticker} / {put_ticker}".strip(" /")
-    if titulo_tickers and vencimento:
-        titulo = f"{estrategia_nome} – {titulo_tickers} – Venc.: {vencimento}"
-    elif titulo_tickers:
-        titulo = f"{estrategia_nome} – {titulo_tickers}"
-    else:
-        titulo = f"{estrategia_nome}"
+    titulo = titulo_payoff(estrategia_nome, call_ticker, put_ticker, vencimento)
 
     # Fontes
     fs_title  = 12 * font_scale
@@ -98,6 +82,46 @@ def plotar_payoff(
 
     ax.legend(fontsize=fs_legend)
 
+def plotar_payoff(
+    precos: Iterable[float],
+    resultados: Iterable[float],
+    preco_ativo: Optional[float] = None,
+    be_inferior: Optional[float] = None,
+    be_superior: Optional[float] = None,
+    call_ticker: str = "",
+    put_ticker: str = "",
+    vencimento: str = "",
+    *,
+    estrategia_nome: str = "Long Straddle",
+    salvar_em: Optional[str] = None,
+    mostrar: bool = True,
+    fig_size: Tuple[float, float] = (5.5, 3.2),  # menor por padrão
+    dpi: int = 120,
+    font_scale: float = 0.9
+):
+    """
+    Plota a curva de P&L de uma estratégia de opções.
+
+    - mostrar=True: usa pyplot e abre janela (CLI/terminal).
+    - mostrar=False: cria uma Figure "headless" (sem abrir janela), ideal para Flet.
+
+    Retorna: (fig, ax)
+    """
+    # Criação da figure
+    if mostrar:
+        import matplotlib.pyplot as plt  # backend interativo só quando precisa
+        fig, ax = plt.subplots(figsize=fig_size, dpi=dpi)
+    else:
+        from matplotlib.figure import Figure  # headless (sem janela)
+        fig = Figure(figsize=fig_size, dpi=dpi)
+        ax = fig.add_subplot(111)
+
+    desenhar_payoff(
+        ax, precos, resultados, preco_ativo, be_inferior, be_superior,
+        call_ticker, put_ticker, vencimento,
+        estrategia_nome=estrategia_nome, font_scale=font_scale,
+    )
+
     # Ajuste de layout e salvar (sem abrir janela)
     try:
         fig.tight_layout()
@@ -0,0 +1,195 @@
+# viz/render.py
+"""
+Serviço de renderização de gráficos de payoff (headless, com cache).
+
+- matplotlib só é importado na primeira renderização "mpl", sempre com o
+  canvas Agg (não muda o backend global; plotar_payoff(mostrar=True) continua
+  abrindo janela no CLI)
+- Figure/Axes são reaproveitados por template (tamanho, dpi): cada render
+  limpa o Axes e redesenha, sem criar Figure nova
+- bytes PNG/SVG ficam num LRU chaveado por (pernas, malha, estilo)
+- motor "svg" (padrão para SVG) não usa matplotlib: viz.svg.svg_payoff
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from viz.payoff import desenhar_payoff
+from viz.svg import svg_payoff
+
+MAX_ITENS = 128
+FORMATOS = ("svg", "png")
+MIME = {"svg": "image/svg+xml", "png": "image/png"}
+
+_lock = threading.Lock()
+_cache: "OrderedDict[Tuple, bytes]" = OrderedDict()
+_templates: Dict[Tuple, Any] = {}
+_stats = {"hits": 0, "misses": 0}
+
+
+# ------------------------------------------------------------
+# Chave
+# ------------------------------------------------------------
+def _chave_pernas(legs) -> Tuple:
+    if not legs:
+        return ()
+    return tuple(
+        (l.type, float(l.strike), int(getattr(l, "quantity", 1)), float(getattr(l, "premium", 0.0) or 0.0),
+         int(l.contract_size), int(getattr(l, "days_to_maturity", 0)))
+        for l in legs
+    )
+
+
+def _chave_malha(precos, resultados) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.asarray(precos, dtype=np.float64).tobytes())
+    h.update(b"|")
+    h.update(np.asarray(resultados, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+# ------------------------------------------------------------
+# LRU
+# ------------------------------------------------------------
+def _cache_get(chave) -> Optional[bytes]:
+    with _lock:
+        v = _cache.get(chave)
+        if v is None:
+            _stats["misses"] += 1
+            return None
+        _cache.move_to_end(chave)
+        _stats["hits"] += 1
+        return v
+
+
+def _cache_put(chave, valor: bytes):
+    with _lock:
+        _cache[chave] = valor
+        _cache.move_to_end(chave)
+        while len(_cache) > MAX_ITENS:
+            _cache.popitem(last=False)
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
+        _stats["hits"] = _stats["misses"] = 0
+
+
+def estatisticas_cache() -> Dict[str, int]:
+    with _lock:
+        return {"itens": len(_cache), **_stats}
+
+
+# ------------------------------------------------------------
+# matplotlib (Agg) com template reaproveitado
+# ------------------------------------------------------------
+def _template(fig_size: Tuple[float, float], dpi: int):
+    """(fig, ax, lock) por tamanho/dpi; criado uma vez por processo."""
+    chave = (tuple(fig_size), int(dpi))
+    with _lock:
+        t = _templates.get(chave)
+        if t is None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+
+            fig = Figure(figsize=fig_size, dpi=dpi)
+            FigureCanvasAgg(fig)
+            t = (fig, fig.add_subplot(111), threading.Lock())
+            _templates[chave] = t
+        return t
+
+
+def _render_mpl(formato: str, fig_size, dpi, args, kwargs) -> bytes:
+    fig, ax, lock = _template(fig_size, dpi)
+    with lock:  # Figure não é thread-safe
+        ax.clear()
+        desenhar_payoff(ax, *args, **kwargs)
+        try:
+            fig.tight_layout()
+        except Exception:
+            pass
+        buf = io.BytesIO()
+        fig.savefig(buf, format=formato, dpi=dpi)
+    return buf.getvalue()
+
+
+# ------------------------------------------------------------
+# API
+# ------------------------------------------------------------
+def renderizar_payoff(
+    precos: Iterable[float],
+    resultados: Iterable[float],
+    preco_ativo: Optional[float] = None,
+    be_inferior: Optional[float] = None,
+    be_superior: Optional[float] = None,
+    call_ticker: str = "",
+    put_ticker: str = "",
+    vencimento: str = "",
+    *,
+    estrategia_nome: str = "Long Straddle",
+    formato: str = "svg",
+    motor: Optional[str] = None,
+    legs: Optional[Sequence] = None,
+    fig_size: Tuple[float, float] = (5.5, 3.2),
+    dpi: int = 120,
+    font_scale: float = 0.9,
+) -> bytes:
+    """
+    Bytes do gráfico de P&L (mesmos argumentos de plotar_payoff).
+
+    - formato: "svg" ou "png"
+    - motor: "svg" (puro, sem matplotlib; só formato svg) ou "mpl".
+      Padrão: "svg" para SVG e "mpl" para PNG.
+    - legs: pernas da estrutura (opcional), entram na chave do cache
+    """
+    formato = (formato or "svg").lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato!r} (use svg ou png)")
+    motor = motor or ("svg" if formato == "svg" else "mpl")
+    if motor not in ("svg", "mpl"):
+        raise ValueError(f"Motor inválido: {motor!r} (use svg ou mpl)")
+    if motor == "svg" and formato != "svg":
+        raise ValueError("Motor svg só gera formato svg.")
+
+    precos = list(precos or [])
+    resultados = list(resultados or [])
+    args = (precos, resultados, preco_ativo, be_inferior, be_superior, call_ticker, put_ticker, vencimento)
+    estilo = (motor, formato, tuple(fig_size), int(dpi), float(font_scale), estrategia_nome,
+              preco_ativo, be_inferior, be_superior, call_ticker, put_ticker, vencimento)
+    chave = (_chave_pernas(legs), _chave_malha(precos, resultados), estilo)
+
+    dados = _cache_get(chave)
+    if dados is not None:
+        return dados
+
+    kwargs = {"estrategia_nome": estrategia_nome, "font_scale": font_scale}
+    if motor == "svg":
+        largura, altura = int(fig_size[0] * dpi), int(fig_size[1] * dpi)
+        dados = svg_payoff(*args, largura=largura, altura=altura, **kwargs).encode("utf-8")
+    else:
+        dados = _render_mpl(formato, fig_size, dpi, args, kwargs)
+
+    _cache_put(chave, dados)
+    return dados
+
+
+def renderizar_resultado(res: Dict[str, Any], formato: str = "svg", **kwargs) -> bytes:
+    """Atalho para o dict de simular_long_straddle (renderizar=False)."""
+    return renderizar_payoff(
+        res.get("precos") or [],
+        res.get("payoff") or [],
+        res.get("spot"),
+        res.get("be_down"),
+        res.get("be_up"),
+        kwargs.pop("call_ticker", ""),
+        kwargs.pop("put_ticker", ""),
+        res.get("vencimento", ""),
+        estrategia_nome=res.get("estrategia", "Long Straddle"),
+        formato=formato,
+        **kwargs,
+    )
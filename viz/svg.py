@@ -0,0 +1,134 @@
+# viz/svg.py
+"""
+Renderizador SVG puro (sem matplotlib) para a curva de P&L.
+
+Cobre o caso comum do Long Straddle/Strangle: uma curva, linha de zero,
+spot e break-evens, eixos com rótulos em R$. Saída é texto SVG pronto para
+embutir no HTML ou servir como image/svg+xml.
+"""
+import math
+from typing import Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+from viz.payoff import _fmt_brl, titulo_payoff
+
+COR_CURVA = "#1f77b4"
+COR_SPOT = "orange"
+COR_BE_INF = "green"
+COR_BE_SUP = "blue"
+
+
+def _valido(x) -> bool:
+    try:
+        return x is not None and math.isfinite(float(x))
+    except (TypeError, ValueError):
+        return False
+
+
+def _ticks(lo: float, hi: float, n: int = 5) -> List[float]:
+    """Ticks "redondos" (1, 2, 2.5, 5 × 10^k) cobrindo [lo, hi]."""
+    if hi <= lo:
+        return [lo]
+    bruto = (hi - lo) / max(1, n)
+    mag = 10 ** math.floor(math.log10(bruto))
+    passo = next(m * mag for m in (1, 2, 2.5, 5, 10) if m * mag >= bruto)
+    ini = math.ceil(lo / passo) * passo
+    return [ini + i * passo for i in range(int((hi - ini) / passo + 1e-9) + 1)]
+
+
+def svg_payoff(
+    precos: Iterable[float],
+    resultados: Iterable[float],
+    preco_ativo: Optional[float] = None,
+    be_inferior: Optional[float] = None,
+    be_superior: Optional[float] = None,
+    call_ticker: str = "",
+    put_ticker: str = "",
+    vencimento: str = "",
+    *,
+    estrategia_nome: str = "Long Straddle",
+    largura: int = 660,
+    altura: int = 384,
+    font_scale: float = 0.9,
+) -> str:
+    """Mesmo conteúdo de viz.payoff.plotar_payoff, em SVG."""
+    xs = [float(x) for x in (precos or [])]
+    ys = [float(y) for y in (resultados or [])]
+
+    fs = 12 * font_scale
+    m_esq, m_dir, m_topo, m_base = 86, 16, 30, 42
+    w = largura - m_esq - m_dir
+    h = altura - m_topo - m_base
+
+    x_min, x_max = (min(xs), max(xs)) if xs else (0.0, 1.0)
+    if x_max == x_min:
+        x_min, x_max = x_min - 1.0, x_max + 1.0
+    y_min, y_max = (min(ys), max(ys)) if ys else (-1.0, 1.0)
+    if y_min == y_max:
+        y_min, y_max = y_min - 1.0, y_max + 1.0
+    pad = (y_max - y_min) * 0.10 or 1.0
+    y_min, y_max = y_min - pad, y_max + pad
+
+    px = lambda x: m_esq + (x - x_min) / (x_max - x_min) * w
+    py = lambda y: m_topo + (y_max - y) / (y_max - y_min) * h
+
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{largura}" height="{altura}" '
+        f'viewBox="0 0 {largura} {altura}" font-family="sans-serif">',
+        f'<rect width="{largura}" height="{altura}" fill="white"/>',
+        f'<text x="{largura / 2:.1f}" y="{m_topo - 10}" font-size="{fs:.1f}" text-anchor="middle">'
+        f'{escape(titulo_payoff(estrategia_nome, call_ticker, put_ticker, vencimento))}</text>',
+    ]
+
+    # grade + rótulos
+    fs_tick = 9 * font_scale
+    for t in _ticks(y_min, y_max):
+        y = py(t)
+        out.append(f'<line x1="{m_esq}" y1="{y:.1f}" x2="{m_esq + w}" y2="{y:.1f}" stroke="#000" stroke-opacity="0.12"/>')
+        out.append(f'<text x="{m_esq - 6}" y="{y + 3:.1f}" font-size="{fs_tick:.1f}" text-anchor="end">{escape(_fmt_brl(t))}</text>')
+    for t in _ticks(x_min, x_max, 6):
+        x = px(t)
+        out.append(f'<line x1="{x:.1f}" y1="{m_topo}" x2="{x:.1f}" y2="{m_topo + h}" stroke="#000" stroke-opacity="0.12"/>')
+        out.append(f'<text x="{x:.1f}" y="{m_topo + h + 14}" font-size="{fs_tick:.1f}" text-anchor="middle">{t:g}</text>')
+    out.append(f'<rect x="{m_esq}" y="{m_topo}" width="{w}" height="{h}" fill="none" stroke="#000" stroke-width="0.8"/>')
+
+    fs_label = 10 * font_scale
+    out.append(f'<text x="{m_esq + w / 2:.1f}" y="{altura - 8}" font-size="{fs_label:.1f}" text-anchor="middle">Preço do Ativo</text>')
+    out.append(f'<text transform="translate(12 {m_topo + h / 2:.1f}) rotate(-90)" font-size="{fs_label:.1f}" text-anchor="middle">Resultado (R$)</text>')
+
+    # zero
+    if y_min <= 0 <= y_max:
+        y0 = py(0)
+        out.append(f'<line x1="{m_esq}" y1="{y0:.1f}" x2="{m_esq + w}" y2="{y0:.1f}" stroke="black" stroke-dasharray="4 3"/>')
+
+    # linhas verticais
+    legenda = [("P&L", COR_CURVA, "")]
+    for x, cor, traco, rotulo in (
+        (preco_ativo, COR_SPOT, "", "Preço do Ativo (Atual)"),
+        (be_inferior, COR_BE_INF, "4 3", "BE Inferior"),
+        (be_superior, COR_BE_SUP, "4 3", "BE Superior"),
+    ):
+        if not _valido(x) or not (x_min <= float(x) <= x_max):
+            continue
+        xv = px(float(x))
+        dash = f' stroke-dasharray="{traco}"' if traco else ""
+        out.append(f'<line x1="{xv:.1f}" y1="{m_topo}" x2="{xv:.1f}" y2="{m_topo + h}" stroke="{cor}"{dash}/>')
+        legenda.append((rotulo, cor, traco))
+
+    # curva
+    if xs:
+        pts = " ".join(f"{px(x):.1f},{py(y):.1f}" for x, y in zip(xs, ys))
+        out.append(f'<polyline points="{pts}" fill="none" stroke="{COR_CURVA}" stroke-width="1.5"/>')
+
+    # legenda
+    fs_leg = 9 * font_scale
+    lx, ly = m_esq + w - 150, m_topo + 8
+    out.append(f'<rect x="{lx - 6}" y="{ly - 4}" width="152" height="{len(legenda) * 14 + 4}" fill="white" fill-opacity="0.8" stroke="#ccc"/>')
+    for i, (rotulo, cor, traco) in enumerate(legenda):
+        y = ly + 6 + i * 14
+        dash = f' stroke-dasharray="{traco}"' if traco else ""
+        out.append(f'<line x1="{lx}" y1="{y}" x2="{lx + 18}" y2="{y}" stroke="{cor}" stroke-width="1.5"{dash}/>')
+        out.append(f'<text x="{lx + 24}" y="{y + 3}" font-size="{fs_leg:.1f}">{escape(rotulo)}</text>')
+
+    out.append("</svg>")
+    return "\n".join(out)
@@ -159,6 +159,18 @@ SESSION_COOKIE_AGE = 60 * 60 * 2  # 2 horas
 SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
+# --------------------------------------------------
+# Cache (LocMemCache padrão: um cache por processo)
+# --------------------------------------------------
+# Com gunicorn + N workers cada worker tem o próprio cache em memória.
+# - CACHE_WARMER=1: warmer do screener e da base do LS (core.cache_warmer).
+#   Só um processo por host aquece (flock em CACHE_WARMER_LOCK), para não
+#   multiplicar as chamadas à OPLAB; só a memória dele fica quente
+# - CHAIN_SHARED=1: cadeias compartilhadas entre os workers via /dev/shm
+#   (services.chain_shared) — os demais workers não rebuscam a cadeia
+# - CACHE_SNAPSHOT=1: entradas quentes sobrevivem a restart (core.cache_snapshot)
+#   em CACHE_SNAPSHOT_PATH (obrigatório; pasta 0700 do usuário do processo)
+# Para todos os workers quentes, configure CACHES com um backend compartilhado.
 
 # =========================
 # Mercado Pago — Produção